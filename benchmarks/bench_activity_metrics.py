@@ -0,0 +1,104 @@
+"""
+Throughput of the live activity engine and latency of its snapshots.
+
+Synthetic borrow/return events (Zipf-distributed titles, a fixed user
+population) are recorded with timestamps spread over the last day, first one
+by one and then through /api/activity-events/ in batches, and the snapshot
+behind /api/activity-snapshot/ is timed once the rings are full.
+
+Usage:
+    python benchmarks/bench_activity_metrics.py [--events 500000] [--users 50000]
+        [--titles 100000] [--batch 1000]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+
+# Set up Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+django.setup()
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+
+from library_ai import activity, api_views
+from library_ai.activity import ActivityMetrics
+
+CATEGORIES = ['Fiction', 'Mystery', 'Fantasy', 'History', 'Romance', 'Science', 'Biography', 'Poetry']
+
+
+def synthetic_events(count, users, titles, seed=0):
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    title_ids = np.minimum(rng.zipf(1.3, count), titles)
+    return [
+        {
+            'type': 'borrow' if is_borrow else 'return',
+            'user_id': int(user),
+            'title': f'Book {title}',
+            'category': CATEGORIES[title % len(CATEGORIES)],
+            'duration_minutes': float(duration),
+            'timestamp': now - float(age),
+        }
+        for is_borrow, user, title, duration, age in zip(
+            (rng.random(count) < 0.6).tolist(),
+            rng.integers(0, users, count).tolist(),
+            title_ids.tolist(),
+            np.round(rng.gamma(2.0, 15.0, count), 1).tolist(),
+            rng.uniform(0, 86_000, count).tolist(),
+        )
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Activity engine throughput and snapshot latency')
+    parser.add_argument('--events', type=int, default=500_000)
+    parser.add_argument('--users', type=int, default=50_000)
+    parser.add_argument('--titles', type=int, default=100_000)
+    parser.add_argument('--batch', type=int, default=1000, help='events per POST to /api/activity-events/')
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events, args.users, args.titles)
+    parsed = [activity.parse_event(event) for event in events]
+
+    engine = ActivityMetrics()
+    start = time.perf_counter()
+    engine.record_many(parsed)
+    direct = time.perf_counter() - start
+
+    timings = []
+    for _ in range(50):
+        start = time.perf_counter()
+        snapshot = engine.snapshot()
+        timings.append(time.perf_counter() - start)
+
+    # Same events through the ingestion view (JSON parsing and validation included)
+    activity._metrics[None] = ActivityMetrics()
+    factory = RequestFactory()
+    view = async_to_sync(api_views.record_activity_events)
+    bodies = [json.dumps({'events': events[i:i + args.batch]}) for i in range(0, len(events), args.batch)]
+    start = time.perf_counter()
+    for body in bodies:
+        view(factory.post('/api/activity-events/', body, content_type='application/json'))
+    endpoint = time.perf_counter() - start
+
+    exact_users = len({event['user_id'] for event in events})
+    print(f"events: {args.events}  users: {exact_users}  titles: {args.titles}")
+    print(f"record():       {args.events / direct:12,.0f} events/s")
+    print(f"POST batch {args.batch}: {args.events / endpoint:10,.0f} events/s")
+    print(f"snapshot():     {statistics.median(timings) * 1000:9.2f} ms median")
+    print(f"active users (24h): {snapshot['last_day']['active_users']} estimated vs {exact_users} exact")
+    print(f"hot titles (1h): {[title['title'] for title in snapshot['hot_titles'][:5]]}")
+
+
+if __name__ == '__main__':
+    main()
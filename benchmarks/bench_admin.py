@@ -0,0 +1,145 @@
+"""
+Admin changelist latency on large Book and PredictionHistory tables.
+
+Each catalog size is loaded into a throwaway database with one prediction
+history row per book. The legacy admin configuration is then timed against
+the current one through the test client as a logged-in superuser. The legacy
+configuration uses exact counts, ``SELECT DISTINCT`` filter choices,
+``icontains`` search and per-row book lookups. The current one uses
+estimated counts, cached filter choices, the FTS index and
+``list_select_related``. The scenarios are the unfiltered changelist, a
+category filter, a search, and the prediction history changelist. Query
+counts are taken from the current configuration.
+
+Usage:
+    python benchmarks/bench_admin.py [--sizes 100000 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+
+# Set up Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+django.setup()
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.utils import timezone
+
+from bench_forecast_endpoint import load_catalog
+from library_ai.forecast_index import rebuild_forecast_index
+from library_ai.models import Book, PredictionHistory
+from library_ai.search_index import rebuild_search_index
+
+SCENARIOS = [
+    ('books', '/admin/library_ai/book/'),
+    ('category', '/admin/library_ai/book/?category=Mystery'),
+    ('search', '/admin/library_ai/book/?q=Book+12345'),
+    ('history', '/admin/library_ai/predictionhistory/'),
+]
+
+
+# Settings of the original admin classes, overlaid on the registered instances
+LEGACY = {
+    Book: {
+        'list_filter': ['category', 'action', 'created_at'],
+        'ordering': ['-demand'],
+        'paginator': Paginator,
+        'show_full_result_count': True,
+        'get_search_results': admin.ModelAdmin.get_search_results,
+    },
+    PredictionHistory: {
+        'list_filter': ['prediction_date', 'model_version', 'source'],
+        'list_select_related': False,
+        'paginator': Paginator,
+        'show_full_result_count': True,
+    },
+}
+
+
+def load_history():
+    table = PredictionHistory._meta.db_table
+    now = timezone.now().isoformat()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.execute(
+            f"INSERT INTO {table} (book_id, category, predicted_demand, predicted_action, actual_action, "
+            f"prediction_date, model_version, source) "
+            f"SELECT id, category, demand, action, '', %s, 'v1.0', 'upload' FROM {Book._meta.db_table}",
+            [now],
+        )
+
+
+def use_legacy(legacy):
+    # The admin URLs are bound to the registered instances, so patch those in place
+    for model, overrides in LEGACY.items():
+        model_admin = admin.site._registry[model]
+        for name, value in overrides.items():
+            if not legacy:
+                model_admin.__dict__.pop(name, None)
+            elif callable(value) and name.startswith('get_'):
+                setattr(model_admin, name, value.__get__(model_admin))
+            else:
+                setattr(model_admin, name, value)
+
+
+def timed_ms(client, url, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Admin changelists: legacy vs scalable configuration')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        User.objects.create_superuser('bench', 'bench@example.com', 'bench')
+        client = Client()
+        client.login(username='bench', password='bench')
+
+        print(f"{'books':>9} {'page':>9} {'legacy ms':>10} {'current ms':>11} {'speedup':>8} {'queries':>8}")
+        for size in args.sizes:
+            load_catalog(size)
+            load_history()
+            rebuild_forecast_index()
+            rebuild_search_index()
+            cache.clear()
+            for name, url in SCENARIOS:
+                use_legacy(True)
+                legacy_ms = timed_ms(client, url, args.repeat)
+                use_legacy(False)
+                current_ms = timed_ms(client, url, args.repeat)
+                with CaptureQueriesContext(connection) as queries:
+                    client.get(url)
+                print(
+                    f'{size:9d} {name:>9} {legacy_ms:10.1f} {current_ms:11.1f} '
+                    f'{legacy_ms / current_ms:7.1f}x {len(queries.captured_queries):8d}'
+                )
+    finally:
+        use_legacy(False)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Inference bursts with and without admission control, served by one ASGI process.
+
+Bursts of concurrent /api/predict-demand/ requests hit a server whose scorer is
+a lock-serialized sleep (one shared ``demand_predictor``), while the main
+thread times dashboard reads. With admission control, excess requests get 429
+quickly and admitted ones keep a bounded latency; without it (limits raised
+out of reach), every request waits behind the whole burst.
+
+Usage:
+    python benchmarks/bench_admission.py [--clients 64] [--duration 10]
+        [--scorer-ms 200]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_asgi_reads import BASE_DIR, free_port, make_settings, wait_for_server
+
+SERVER = """
+import os, sys, threading, time
+sys.path.insert(0, {base!r})
+sys.path.insert(0, {settings_dir!r})
+os.environ['DJANGO_SETTINGS_MODULE'] = 'bench_settings'
+import django
+django.setup()
+
+import numpy as np
+from django.conf import settings
+from library_ai.ai_models import demand_predictor
+
+if not {admission!r}:
+    settings.LIBRARY_AI_ADMISSION = {{'predict': {{'concurrency': 10_000, 'queue': 10_000}}}}
+    settings.LIBRARY_AI_HEAVY_WORKERS = 256
+model_lock = threading.Lock()
+
+def score_texts(texts, categories, want_embeddings=True):
+    with model_lock:
+        time.sleep({scorer_seconds})
+    return np.full(len(texts), 0.5), np.full(len(texts), 0.5)
+
+demand_predictor.score_texts = score_texts
+
+import uvicorn
+from django.core.asgi import get_asgi_application
+uvicorn.run(get_asgi_application(), host='127.0.0.1', port={port}, log_level='error')
+"""
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def run(admission, args, settings_dir):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    code = SERVER.format(
+        base=str(BASE_DIR), settings_dir=settings_dir, admission=admission,
+        scorer_seconds=args.scorer_ms / 1000, port=port,
+    )
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=BASE_DIR)
+    body = json.dumps({'books': [{'title': 'Book', 'author': 'Author', 'category': 'Fiction'}]}).encode()
+    accepted, rejected, reads = [], [], []
+    lock = threading.Lock()
+    try:
+        wait_for_server(f'{base}/api/get-books/', server)
+        stop_at = time.monotonic() + args.duration
+
+        def client():
+            while time.monotonic() < stop_at:
+                request = urllib.request.Request(
+                    f'{base}/api/predict-demand/', data=body, headers={'Content-Type': 'application/json'},
+                )
+                start = time.perf_counter()
+                try:
+                    urllib.request.urlopen(request, timeout=600).read()
+                    with lock:
+                        accepted.append(time.perf_counter() - start)
+                except urllib.error.HTTPError as e:
+                    if e.code != 429:
+                        raise
+                    with lock:
+                        rejected.append(time.perf_counter() - start)
+                    time.sleep(float(e.headers.get('Retry-After', 1)))
+
+        threads = [threading.Thread(target=client) for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            urllib.request.urlopen(f'{base}/api/get-dashboard-data/', timeout=600).read()
+            reads.append(time.perf_counter() - start)
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        'accepted': len(accepted),
+        'accepted p50': statistics.median(accepted) * 1000 if accepted else float('nan'),
+        'accepted p99': percentile(accepted, 99) * 1000,
+        'rejected': len(rejected),
+        'reject p99': percentile(rejected, 99) * 1000,
+        'read p50': statistics.median(reads) * 1000,
+        'read p99': percentile(reads, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Admission control under inference bursts')
+    parser.add_argument('--clients', type=int, default=64, help='concurrent predict-demand clients')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--scorer-ms', type=float, default=200.0, help='stand-in inference time per request')
+    args = parser.parse_args()
+
+    columns = ['accepted', 'accepted p50', 'accepted p99', 'rejected', 'reject p99', 'read p50', 'read p99']
+    print(f"{'admission':>9} " + ' '.join(f'{column:>12}' for column in columns))
+    for admission in (False, True):
+        with tempfile.TemporaryDirectory() as settings_dir:
+            make_settings(settings_dir)
+            result = run(admission, args, settings_dir)
+        print(f"{'on' if admission else 'off':>9} " + ' '.join(
+            f'{result[column]:12d}' if isinstance(result[column], int) else f'{result[column]:12.1f}'
+            for column in columns
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Read latency while heavy uploads run: one sync WSGI worker vs one ASGI process.
+
+The server runs on a throwaway database with the scorer replaced by a fixed
+sleep standing in for inference. Background clients keep posting catalog
+uploads while the main thread times dashboard and book reads. Under WSGI
+(a single-threaded ``wsgiref`` server, like one sync worker) reads queue
+behind uploads; under ASGI (uvicorn) they are served from the event loop
+while uploads run in the heavy-work executor.
+
+Usage:
+    python benchmarks/bench_asgi_reads.py [--duration 10] [--uploaders 2]
+        [--scorer-seconds 2] [--books 500]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SERVER = """
+import os, sys, time
+sys.path.insert(0, {base!r})
+sys.path.insert(0, {settings_dir!r})
+os.environ['DJANGO_SETTINGS_MODULE'] = 'bench_settings'
+import django
+django.setup()
+
+import numpy as np
+from library_ai.ai_models import demand_predictor
+
+def score_texts(texts, categories, want_embeddings=True):
+    time.sleep({scorer_seconds})
+    return np.full(len(texts), 0.5), np.full(len(texts), 0.5)
+
+demand_predictor.score_texts = score_texts
+
+if {mode!r} == 'asgi':
+    import uvicorn
+    from django.core.asgi import get_asgi_application
+    uvicorn.run(get_asgi_application(), host='127.0.0.1', port={port}, log_level='warning')
+else:
+    from wsgiref.simple_server import WSGIRequestHandler, make_server
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    make_server('127.0.0.1', {port}, get_wsgi_application(), handler_class=QuietHandler).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_settings(directory):
+    (Path(directory) / 'bench_settings.py').write_text(
+        "from trend_shelf_ai.settings import *  # noqa\n"
+        f"DATABASES['default']['NAME'] = {str(Path(directory) / 'db.sqlite3')!r}\n"
+        f"MEDIA_ROOT = {str(Path(directory) / 'media')!r}\n"
+        f"LIBRARY_AI_METRICS_DIR = {str(Path(directory) / 'metrics')!r}\n"
+    )
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='bench_settings', PYTHONPATH=f'{directory}{os.pathsep}{BASE_DIR}')
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=BASE_DIR, env=env, check=True)
+
+
+def upload_body(books):
+    rows = ''.join(f'Book {i},Author {i % 50},{("Fiction", "History", "Mystery")[i % 3]},50\n' for i in range(books))
+    boundary = 'benchboundary'
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="catalog.csv"\r\n'
+        f'Content-Type: text/csv\r\n\r\ntitle,author,category,demand\n{rows}\r\n--{boundary}--\r\n'
+    ).encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def wait_for_server(url, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('server exited during startup')
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def run(mode, args, settings_dir):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    code = SERVER.format(
+        base=str(BASE_DIR), settings_dir=settings_dir, scorer_seconds=args.scorer_seconds, mode=mode, port=port,
+    )
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=BASE_DIR)
+    try:
+        wait_for_server(f'{base}/api/get-books/', server)
+        body, content_type = upload_body(args.books)
+        stop_at = time.monotonic() + args.duration
+        uploads = []
+
+        def uploader():
+            while time.monotonic() < stop_at:
+                request = urllib.request.Request(
+                    f'{base}/api/upload-file/', data=body, headers={'Content-Type': content_type},
+                )
+                json.loads(urllib.request.urlopen(request, timeout=600).read())
+                uploads.append(1)
+
+        threads = [threading.Thread(target=uploader) for _ in range(args.uploaders)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+
+        latencies = []
+        while time.monotonic() < stop_at:
+            for path in ('/api/get-dashboard-data/', '/api/get-books/?category=Fiction'):
+                start = time.perf_counter()
+                urllib.request.urlopen(f'{base}{path}', timeout=600).read()
+                latencies.append(time.perf_counter() - start)
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    return {
+        'reads': len(latencies),
+        'p50 ms': statistics.median(latencies) * 1000,
+        'p99 ms': latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+        'uploads': len(uploads),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Read latency under heavy uploads, WSGI vs ASGI')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--uploaders', type=int, default=2, help='clients posting uploads back to back')
+    parser.add_argument('--scorer-seconds', type=float, default=2.0, help='stand-in inference time per upload')
+    parser.add_argument('--books', type=int, default=500, help='books per uploaded catalog')
+    args = parser.parse_args()
+
+    print(f"{'server':>6} {'reads':>6} {'p50 ms':>9} {'p99 ms':>9} {'uploads':>8}")
+    for mode in ('wsgi', 'asgi'):
+        with tempfile.TemporaryDirectory() as settings_dir:
+            make_settings(settings_dir)
+            result = run(mode, args, settings_dir)
+        print(f"{mode:>6} {result['reads']:6d} {result['p50 ms']:9.1f} {result['p99 ms']:9.1f} {result['uploads']:8d}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Cost of the upload cleaning stage relative to parsing.
+
+Writes a messy synthetic catalog to CSV and Parquet: aliased headers, demand
+as text with '%' suffixes and junk values, categories varying in case and
+whitespace, blank fields, and a share of duplicate books spelled
+differently. For each file it times ``read_catalog``, then the cleaning
+stage (``clean_catalog``) split into standardization and deduplication.
+
+Deduplicated books let ``predict_demand_frame`` skip its own search for
+duplicate texts. The last columns therefore compare parse-to-predictions
+time (stub scorer) for the previous flow and the new one. The previous
+flow renamed the columns, called ``dropna`` and scored every row.
+
+Usage:
+    python benchmarks/bench_cleaning.py [--rows 1000000] [--duplicates 0.2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+
+# Set up Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+django.setup()
+
+import numpy as np
+import pandas as pd
+
+from library_ai.ai_models import demand_predictor
+from library_ai.ingestion import deduplicate_books, read_catalog, standardize_columns
+
+CATEGORIES = ['Fiction', 'Mystery', 'Romance', 'Science Fiction', 'Fantasy', 'Thriller', 'Biography', 'History']
+
+
+def make_messy_catalog(rows, duplicates, seed=7):
+    rng = np.random.default_rng(seed)
+    # Duplicate rows reuse an earlier book id with different case and spacing
+    book = np.arange(rows)
+    repeat = rng.random(rows) < duplicates
+    book[repeat] = rng.integers(0, rows, int(repeat.sum()))
+    shout = rng.random(rows) < 0.1
+    titles = pd.Series([f'Title {i}' for i in book.tolist()])
+    titles = titles.mask(repeat & shout, titles.str.upper()).mask(repeat & ~shout, ' ' + titles + '  ')
+
+    spellings = CATEGORIES + [c.lower() for c in CATEGORIES] + [c.upper() + ' ' for c in CATEGORIES]
+    categories = np.array(spellings, dtype=object)[rng.integers(0, len(spellings), rows)]
+    demand = np.char.add(rng.uniform(-5, 105, rows).round(1).astype(str), np.where(rng.random(rows) < 0.3, '%', ''))
+    demand = np.where(rng.random(rows) < 0.01, 'n/a', demand)
+    authors = np.array([f'Author {i % 20000}' for i in book.tolist()], dtype=object)
+    authors[rng.random(rows) < 0.005] = ' '
+    return pd.DataFrame({
+        'Book Title': titles,
+        'Author Name': authors,
+        'Genre': categories,
+        'Demand Score': demand,
+        'Notes': 'x',
+    })
+
+
+def stub_scores(texts, categories, want_embeddings=True):
+    return np.full(len(texts), 0.5), np.full(len(texts), 0.5)
+
+
+def legacy_standardize(df):
+    renamed = df.rename(columns={'Book Title': 'title', 'Author Name': 'author', 'Genre': 'category',
+                                 'Demand Score': 'demand'})
+    return renamed.dropna(subset=['title', 'author', 'category'])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload cleaning cost vs parse time')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--duplicates', type=float, default=0.2, help='share of rows repeating an earlier book')
+    args = parser.parse_args()
+
+    catalog = make_messy_catalog(args.rows, args.duplicates)
+    workdir = tempfile.mkdtemp(prefix='cleaning-bench-')
+    writers = {
+        'messy.csv': lambda path: catalog.to_csv(path, index=False),
+        'messy.parquet': lambda path: catalog.to_parquet(path, index=False),
+    }
+
+    demand_predictor.score_texts = stub_scores
+    print(f"{'file':14} {'parse s':>8} {'standardize s':>14} {'dedupe s':>9} {'clean/parse':>12} "
+          f"{'rows':>10} {'books':>10} {'categories':>11} {'legacy total s':>15} {'new total s':>12}")
+    for name, write in writers.items():
+        path = os.path.join(workdir, name)
+        write(path)
+        (df, _), parse = timed(lambda: read_catalog(path, name))
+        rows, standardize = timed(lambda: standardize_columns(df))
+        (books, _), dedupe = timed(lambda: deduplicate_books(rows))
+        _, legacy_score = timed(lambda: demand_predictor.predict_demand_frame(legacy_standardize(df)))
+        _, score = timed(lambda: demand_predictor.predict_demand_frame(books, deduplicated=True))
+        print(f"{name:14} {parse:8.2f} {standardize:14.2f} {dedupe:9.2f} {(standardize + dedupe) / parse:12.0%} "
+              f"{len(rows):10,d} {len(books):10,d} {len(rows['category'].cat.categories):11d} "
+              f"{parse + legacy_score:15.2f} {parse + standardize + dedupe + score:12.2f}")
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
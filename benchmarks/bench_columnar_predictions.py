@@ -0,0 +1,105 @@
+"""
+Memory and throughput comparison of the row-wise and columnar prediction paths.
+
+The transformer pipelines are left unloaded so the benchmark measures the
+Python/pandas overhead around inference (text building, per-row dicts,
+action thresholds and result assembly), which is what dominates at millions
+of rows once inference is batched.
+
+Usage:
+    python benchmarks/bench_columnar_predictions.py [rows]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+
+# Set up Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+django.setup()
+
+import numpy as np
+import pandas as pd
+
+from library_ai.ai_models import LibraryDemandPredictor
+
+CATEGORIES = ['Fiction', 'Mystery', 'Romance', 'Science Fiction', 'Fantasy', 'Thriller', 'Biography', 'History']
+
+
+def make_catalog(rows):
+    rng = np.random.default_rng(42)
+    return pd.DataFrame({
+        'title': [f'Title {i}' for i in range(rows)],
+        'author': [f'Author {i % 5000}' for i in range(rows)],
+        'category': rng.choice(CATEGORIES, rows),
+        'demand': rng.uniform(0, 100, rows).round(1),
+    })
+
+
+def legacy_predict_demand(predictor, books_data):
+    """The original per-row loop, kept here as the comparison baseline"""
+    predictions = []
+    for book in books_data:
+        book_text = f"{book.get('title', '')} by {book.get('author', '')} in {book.get('category', '')}"
+        sentiment_score = predictor._analyze_sentiment(book_text)
+        genre_score = predictor._classify_genre_relevance(book_text, book.get('category', ''))
+        base_demand = float(book.get('demand', 50))
+        ai_adjustment = (sentiment_score + genre_score) / 2
+        predicted_demand = min(100, max(0, base_demand * (0.7 + 0.6 * ai_adjustment)))
+        predictions.append({
+            'title': book.get('title', ''),
+            'author': book.get('author', ''),
+            'category': book.get('category', ''),
+            'demand': round(predicted_demand, 1),
+            'action': predictor._determine_action(predicted_demand, book.get('category', '')),
+            'ai_confidence': round(ai_adjustment * 100, 1)
+        })
+    return predictions
+
+
+def measure(label, func):
+    """Time an untraced run, then measure peak allocations in a traced run"""
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return label, elapsed, peak, result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    catalog = make_catalog(rows)
+
+    predictor = LibraryDemandPredictor()
+    predictor.is_initialized = True  # measure the pipeline-free overhead only
+
+    runs = [
+        measure('legacy row loop (to_dict + dict per row)',
+                lambda: legacy_predict_demand(predictor, catalog.to_dict('records'))),
+        measure('list-of-dicts wrapper (predict_demand)',
+                lambda: predictor.predict_demand(catalog.to_dict('records'))),
+        measure('columnar (predict_demand_frame)',
+                lambda: predictor.predict_demand_frame(catalog)),
+    ]
+
+    print(f"Prediction overhead for {rows:,} rows")
+    print(f"{'path':45} {'seconds':>9} {'rows/s':>12} {'peak MiB':>10}")
+    for label, elapsed, peak, _ in runs:
+        print(f"{label:45} {elapsed:9.2f} {rows / elapsed:12,.0f} {peak / 2 ** 20:10.1f}")
+
+    frame = runs[-1][3]
+    print(f"\nColumnar result memory: {frame.memory_usage(deep=True).sum() / 2 ** 20:.1f} MiB "
+          f"(category: {frame['category'].dtype}, action: {frame['action'].dtype})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Inference throughput per node for different workers x threads splits.
+
+For every configuration the benchmark starts ``workers`` processes. Each one
+loads the real Hugging Face pipelines under that CPU budget
+(``LIBRARY_AI_CPU_WORKERS`` / ``LIBRARY_AI_TORCH_THREADS`` /
+``LIBRARY_AI_CPU_PINNING``). Once every worker has loaded and warmed up, all
+of them score batches of book texts through ``score_texts_locally`` at the
+same time for ``--duration`` seconds. The node's texts/s is summed over the
+workers. ``threads=default`` runs torch's unbudgeted default (one thread per
+core in every worker), which shows the cost of oversubscription.
+
+Needs torch and transformers with the models downloaded or cached.
+
+Usage:
+    python benchmarks/bench_cpu_budget.py [--workers 1 2 4] [--threads 1 2 4]
+        [--duration 20] [--batch 32] [--pin]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+WORKER = """
+import json, os, sys, time
+sys.path.insert(0, {base!r})
+os.environ['DJANGO_SETTINGS_MODULE'] = 'trend_shelf_ai.settings'
+import django
+django.setup()
+
+from library_ai.ai_models import LibraryDemandPredictor
+from library_ai.cpu_budget import effective_cpu_budget
+
+predictor = LibraryDemandPredictor(use_model_server=False)
+if {unbudgeted!r}:
+    # Skip the budget: torch keeps its one-thread-per-core default
+    import library_ai.cpu_budget as cpu_budget
+    cpu_budget._applied = {{'threads': 'default'}}
+predictor.initialize_models()
+if not predictor.is_initialized:
+    print(json.dumps({{'error': 'models failed to load'}}), flush=True)
+    sys.exit(2)
+
+categories = ['Fiction', 'Mystery', 'Fantasy', 'History', 'Romance', 'Science', 'Biography', 'Poetry']
+texts = [f'Book {{i}} by Author {{i % 97}} in {{categories[i % 8]}}' for i in range({batch})]
+batch_categories = [categories[i % 8] for i in range({batch})]
+predictor.score_texts_locally(texts, batch_categories)
+print(json.dumps({{'ready': True, 'budget': effective_cpu_budget()}}), flush=True)
+
+sys.stdin.readline()
+stop_at = time.monotonic() + {duration}
+latencies = []
+while time.monotonic() < stop_at:
+    start = time.perf_counter()
+    predictor.score_texts_locally(texts, batch_categories)
+    latencies.append(time.perf_counter() - start)
+print(json.dumps({{'texts': len(latencies) * {batch}, 'latencies': latencies}}), flush=True)
+"""
+
+
+def run_config(workers, threads, args, slots_dir):
+    env = dict(
+        os.environ,
+        LIBRARY_AI_CPU_WORKERS=str(workers),
+        LIBRARY_AI_TORCH_THREADS='0' if threads == 'default' else str(threads),
+        LIBRARY_AI_CPU_PINNING='1' if args.pin and threads != 'default' else '0',
+        LIBRARY_AI_CPU_SLOTS_DIR=slots_dir,
+        LIBRARY_AI_MODEL_SERVER_SOCKET='',
+        LIBRARY_AI_MICRO_BATCHING='0',
+    )
+    code = WORKER.format(base=str(BASE_DIR), unbudgeted=threads == 'default', batch=args.batch, duration=args.duration)
+    processes = [
+        subprocess.Popen(
+            [sys.executable, '-c', code], cwd=BASE_DIR, env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+        for _ in range(workers)
+    ]
+    try:
+        # Wait until every worker has loaded its models, then start them together
+        for process in processes:
+            message = json.loads(process.stdout.readline() or '{"error": "worker exited"}')
+            if 'error' in message:
+                raise SystemExit(f"worker failed: {message['error']}")
+        for process in processes:
+            process.stdin.write('go\n')
+            process.stdin.flush()
+        results = [json.loads(process.stdout.readline()) for process in processes]
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
+
+    latencies = [latency for result in results for latency in result['latencies']]
+    texts = sum(result['texts'] for result in results)
+    return {
+        'texts_per_second': texts / args.duration,
+        'batch_p50_ms': statistics.median(latencies) * 1000 if latencies else float('nan'),
+    }
+
+
+def main():
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    powers = [n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cores]
+    parser = argparse.ArgumentParser(description='Inference throughput per workers x threads split')
+    parser.add_argument('--workers', type=int, nargs='+', default=powers)
+    parser.add_argument('--threads', type=int, nargs='+', default=powers,
+                        help='intra-op threads per worker; splits using more than the cores are skipped')
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds per configuration')
+    parser.add_argument('--batch', type=int, default=32, help='texts per scoring call')
+    parser.add_argument('--pin', action='store_true', help='also pin each worker to its own cores')
+    args = parser.parse_args()
+
+    print(f"{cores} cores; {args.duration:g}s per configuration, batches of {args.batch}")
+    print(f"{'workers':>7} {'threads':>8} {'pinned':>6} {'texts/s':>9} {'per worker':>11} {'batch p50 ms':>13}")
+    results = []
+    for workers in args.workers:
+        candidates = [threads for threads in args.threads if workers * threads <= cores] + ['default']
+        for threads in candidates:
+            with tempfile.TemporaryDirectory() as slots_dir:
+                result = run_config(workers, threads, args, slots_dir)
+            pinned = args.pin and threads != 'default'
+            results.append((result['texts_per_second'], workers, threads, pinned))
+            print(
+                f"{workers:7d} {threads:>8} {'yes' if pinned else 'no':>6} {result['texts_per_second']:9.1f} "
+                f"{result['texts_per_second'] / workers:11.1f} {result['batch_p50_ms']:13.1f}"
+            )
+
+    best, workers, threads, pinned = max(results, key=lambda item: item[0])
+    print(f"\nbest: {workers} workers x {threads} threads{' (pinned)' if pinned else ''}: {best:.1f} texts/s")
+    if threads != 'default':
+        print(
+            f"  LIBRARY_AI_CPU_WORKERS={workers} LIBRARY_AI_TORCH_THREADS={threads}"
+            + (' LIBRARY_AI_CPU_PINNING=1' if pinned else '')
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Latency of /api/get-demand-forecast/ as the catalog grows from 1k to 1M books.
+
+Each catalog size is loaded into a throwaway SQLite test database, the top-N
+index is rebuilt (as an upload would) and the endpoint is called repeatedly
+for the whole catalog and for one category. The legacy path (load every book
+with ``values()`` and sort in Python) is timed alongside up to
+``--legacy-max`` books.
+
+Usage:
+    python benchmarks/bench_forecast_endpoint.py [--sizes 1000 10000 100000 1000000]
+        [--repeat 50] [--legacy-max 100000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+
+# Set up Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+django.setup()
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+
+from library_ai import api_views
+from library_ai.ai_models import demand_predictor
+from library_ai.forecast_index import clear_forecast_index, rebuild_forecast_index
+from library_ai.models import Book
+
+CATEGORIES = ['Fiction', 'Mystery', 'Fantasy', 'History', 'Romance', 'Science', 'Biography', 'Poetry']
+
+
+def load_catalog(size, seed=0):
+    rng = np.random.default_rng(seed)
+    demand = np.round(rng.uniform(0, 100, size), 1).tolist()
+    categories = [CATEGORIES[i] for i in rng.integers(0, len(CATEGORIES), size).tolist()]
+    now = timezone.now().isoformat()
+    table = Book._meta.db_table
+    clear_forecast_index()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table}')
+        cursor.executemany(
+            f'INSERT INTO {table} (title, author, category, demand, action, created_at, updated_at) '
+            f'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+            [(f'Book {i}', f'Author {i % 1000}', categories[i], demand[i], 'Hold', now, now) for i in range(size)],
+        )
+
+
+def legacy_forecast(category):
+    books_data = list(Book.objects.values('title', 'author', 'category', 'demand', 'action'))
+    forecast = demand_predictor.generate_forecast(books_data, category)
+    categories = list(Book.objects.values_list('category', flat=True).distinct())
+    return forecast, categories
+
+
+def median_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Forecast endpoint latency vs catalog size')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--legacy-max', type=int, default=100_000, help='largest catalog timed on the legacy path')
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    factory = RequestFactory()
+    forecast_view = async_to_sync(api_views.get_demand_forecast)
+    try:
+        print(f"{'books':>9} {'rebuild s':>10} {'all ms':>8} {'category ms':>12} {'legacy ms':>10}")
+        for size in args.sizes:
+            load_catalog(size)
+            start = time.perf_counter()
+            rebuild_forecast_index()
+            rebuild = time.perf_counter() - start
+
+            overall = median_ms(lambda: forecast_view(factory.get('/api/get-demand-forecast/')), args.repeat)
+            category = median_ms(
+                lambda: forecast_view(factory.get('/api/get-demand-forecast/', {'category': 'Mystery'})),
+                args.repeat,
+            )
+            legacy = (
+                f"{median_ms(lambda: legacy_forecast('Mystery'), max(1, args.repeat // 10)):10.1f}"
+                if size <= args.legacy_max else f"{'-':>10}"
+            )
+            print(f"{size:9d} {rebuild:10.2f} {overall:8.2f} {category:12.2f} {legacy}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
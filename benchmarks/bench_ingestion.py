@@ -0,0 +1,80 @@
+"""
+Parse throughput of every upload format on a synthetic catalog.
+
+Writes the same catalog as CSV, CSV with malformed rows, JSON, JSON Lines,
+Parquet and Arrow (and optionally Excel) to a temporary directory, then times
+``read_catalog`` on each file.
+
+Usage:
+    python benchmarks/bench_ingestion.py [--rows 1000000] [--excel-rows 50000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from library_ai.ingestion import read_catalog
+
+CATEGORIES = ['Fiction', 'Mystery', 'Romance', 'Science Fiction', 'Fantasy', 'Thriller', 'Biography', 'History']
+
+
+def make_catalog(rows):
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        'title': [f'Title {i}' for i in range(rows)],
+        'author': [f'Author {i % 20000}' for i in range(rows)],
+        'category': rng.choice(CATEGORIES, rows),
+        'demand': rng.uniform(0, 100, rows).round(1),
+        'action': rng.choice(['Acquire', 'Hold', 'Transfer', 'Deaccession'], rows),
+    })
+
+
+def write_malformed_csv(catalog, path, every=1000):
+    catalog.to_csv(path, index=False)
+    with open(path, 'a') as fh:
+        for i in range(0, len(catalog), every):
+            fh.write(f'Broken {i},Someone,Fiction,50,Hold,unexpected,extra\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upload parse throughput per format')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--excel-rows', type=int, default=0,
+                        help='also benchmark Excel with this many rows (slow to write)')
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.rows)
+    workdir = tempfile.mkdtemp(prefix='ingestion-bench-')
+    writers = {
+        'catalog.csv': lambda path: catalog.to_csv(path, index=False),
+        'malformed.csv': lambda path: write_malformed_csv(catalog, path),
+        'catalog.json': lambda path: catalog.to_json(path, orient='records'),
+        'catalog.jsonl': lambda path: catalog.to_json(path, orient='records', lines=True),
+        'catalog.parquet': lambda path: catalog.to_parquet(path, index=False),
+        'catalog.arrow': lambda path: catalog.to_feather(path),
+    }
+    if args.excel_rows:
+        writers['catalog.xlsx'] = lambda path: catalog.head(args.excel_rows).to_excel(path, index=False)
+
+    print(f"{'file':16} {'parser':9} {'rows':>10} {'bad':>6} {'MiB':>8} {'seconds':>8} {'rows/s':>12}")
+    for name, write in writers.items():
+        path = os.path.join(workdir, name)
+        write(path)
+        start = time.perf_counter()
+        df, report = read_catalog(path, name)
+        elapsed = time.perf_counter() - start
+        size_mb = os.path.getsize(path) / 2 ** 20
+        print(f"{name:16} {report['parser']:9} {len(df):10,d} {report['bad_rows']:6d} "
+              f"{size_mb:8.1f} {elapsed:8.2f} {len(df) / elapsed:12,.0f}")
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Inventory page load cost: whole-catalog download vs server-side facets.
+
+For each catalog size the legacy load (every book from /api/get-books/ as
+JSON, which the page then filtered and summarised in the browser) is timed
+against the current one (/api/inventory-facets/ plus one page of
+/api/get-books/), unfiltered and with a category filter and search term.
+Response sizes show what the browser has to download and parse.
+
+Usage:
+    python benchmarks/bench_inventory_page.py [--sizes 10000 100000 1000000]
+        [--repeat 10] [--legacy-max 1000000]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+
+# Set up Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+django.setup()
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import RequestFactory
+
+from bench_forecast_endpoint import load_catalog
+from library_ai import api_views
+from library_ai.models import Book
+
+
+def legacy_load():
+    books = list(Book.objects.values('id', 'title', 'author', 'category', 'demand', 'action'))
+    return json.dumps({'books': books}).encode()
+
+
+def page_load(factory, params):
+    facets = async_to_sync(api_views.get_inventory_facets)(factory.get('/api/inventory-facets/', params))
+    page = async_to_sync(api_views.get_books)(factory.get('/api/get-books/', {**params, 'page': 1, 'page_size': 20}))
+    return facets.content + page.content
+
+
+def timed_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, len(body) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inventory page load: full catalog vs facets + one page')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--legacy-max', type=int, default=1_000_000, help='largest catalog timed on the legacy path')
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0)
+    factory = RequestFactory()
+    filtered = {'category': 'Mystery', 'search': 'Author 12'}
+    try:
+        print(f"{'books':>9} {'legacy ms':>10} {'legacy KB':>10} {'facets ms':>10} {'filtered ms':>12} {'KB':>6}")
+        for size in args.sizes:
+            load_catalog(size)
+            if size <= args.legacy_max:
+                legacy_ms, legacy_kb = timed_ms(legacy_load, max(1, args.repeat // 5))
+                legacy = f'{legacy_ms:10.1f} {legacy_kb:10.0f}'
+            else:
+                legacy = f"{'-':>10} {'-':>10}"
+            facets_ms, kb = timed_ms(lambda: page_load(factory, {}), args.repeat)
+            filtered_ms, _ = timed_ms(lambda: page_load(factory, filtered), args.repeat)
+            print(f'{size:9d} {legacy} {facets_ms:10.1f} {filtered_ms:12.1f} {kb:6.1f}')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Load test of micro-batched vs per-request scoring for /api/predict-demand/.
+
+Concurrent clients each submit requests of a few books. The scorer is a
+stand-in for a transformer forward pass: a fixed per-call cost plus a small
+per-text cost, serialized by a lock because every request shares the one
+``demand_predictor``. The per-request path calls the scorer directly; the
+micro-batched path goes through ``MicroBatcher`` with the configured knobs.
+
+Usage:
+    python benchmarks/bench_micro_batching.py [--clients 32] [--books 4]
+        [--max-batch-size 64] [--max-wait-ms 5] [--call-ms 40] [--text-ms 1]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+
+# Set up Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+django.setup()
+
+import numpy as np
+
+from library_ai.batching import MicroBatcher
+
+
+def make_scorer(call_seconds, text_seconds):
+    lock = threading.Lock()
+
+    def score(texts, categories):
+        with lock:
+            time.sleep(call_seconds + text_seconds * len(texts))
+        return np.full(len(texts), 0.5), np.full(len(texts), 0.5)
+    return score
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(score, clients, books, duration):
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+    texts = [f'Book {i} by Author in Fiction' for i in range(books)]
+    categories = ['Fiction'] * books
+
+    def client():
+        local = []
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            score(texts, categories)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests/s': len(latencies) / elapsed,
+        'books/s': len(latencies) * books / elapsed,
+        'p50 ms': percentile(latencies, 50) * 1000,
+        'p99 ms': percentile(latencies, 99) * 1000,
+        'mean ms': statistics.fmean(latencies) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-batched vs per-request scoring')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent requests in flight')
+    parser.add_argument('--books', type=int, default=4, help='books per request')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--call-ms', type=float, default=40.0, help='fixed cost of one forward pass')
+    parser.add_argument('--text-ms', type=float, default=1.0, help='marginal cost per text in a batch')
+    args = parser.parse_args()
+
+    scorer = make_scorer(args.call_ms / 1000, args.text_ms / 1000)
+    batcher = MicroBatcher(scorer, max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000)
+
+    print(f"{args.clients} clients x {args.books} books/request, "
+          f"max_batch_size={args.max_batch_size}, max_wait={args.max_wait_ms} ms")
+    print(f"{'path':14} {'requests/s':>11} {'books/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for label, score in (('per-request', scorer), ('micro-batched', batcher.submit)):
+        result = run(score, args.clients, args.books, args.duration)
+        print(f"{label:14} {result['requests/s']:11.1f} {result['books/s']:9.1f} "
+              f"{result['p50 ms']:8.1f} {result['p99 ms']:8.1f} {result['mean ms']:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
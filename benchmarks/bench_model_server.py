@@ -0,0 +1,146 @@
+"""
+Per-node memory and throughput of in-process models vs the shared model server.
+
+For each worker count, N worker processes score the same synthetic catalog
+either with their own copy of the pipelines or through one
+``manage.py run_model_server`` process. Memory is the summed PSS (proportional
+set size, so shared pages are not double counted) of all workers plus the
+server; throughput is total books scored divided by the slowest worker's time.
+
+Usage:
+    python benchmarks/bench_model_server.py [--workers 1 4 8] [--books 256] [--batch 16]
+
+``--stub`` replaces the pipelines with a constant scorer to check the plumbing
+on machines without the models downloaded.
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def memory_mb(pid):
+    """PSS of a process in MiB (VmRSS where smaps_rollup is unavailable)"""
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as fh:
+            for line in fh:
+                if line.startswith('Pss:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    with open(f'/proc/{pid}/status') as fh:
+        for line in fh:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def stub_predictor(predictor):
+    import numpy as np
+
+    predictor.is_initialized = True
+    predictor._analyze_sentiment_batch = lambda texts: np.full(len(texts), 0.5)
+    return predictor
+
+
+def worker(socket_path, books, batch, stub, barrier, results):
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+    import django
+    django.setup()
+
+    import pandas as pd
+    from django.conf import settings
+    from library_ai.ai_models import LibraryDemandPredictor
+
+    settings.LIBRARY_AI_MODEL_SERVER_SOCKET = socket_path or ''
+    predictor = LibraryDemandPredictor()
+    if stub and not socket_path:
+        stub_predictor(predictor)
+
+    catalog = pd.DataFrame({
+        'title': [f'Book {os.getpid()}-{i}' for i in range(books)],
+        'author': [f'Author {i % 50}' for i in range(books)],
+        'category': ['Fiction', 'Mystery', 'Fantasy', 'History'] * (books // 4) + ['Fiction'] * (books % 4),
+        'demand': [50.0] * books,
+    })
+    predictor.predict_demand_frame(catalog.head(1))  # load models / open the connection
+
+    barrier.wait()
+    start = time.perf_counter()
+    for offset in range(0, books, batch):
+        predictor.predict_demand_frame(catalog.iloc[offset:offset + batch])
+    results.put((time.perf_counter() - start, memory_mb(os.getpid())))
+
+
+def start_server(socket_path, stub):
+    code = (
+        "import os, sys, django; sys.path.insert(0, %r); "
+        "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings'); django.setup(); "
+        "from django.core.management import call_command; " % str(BASE_DIR)
+    )
+    if stub:
+        code += (
+            "import library_ai.ai_models as m; "
+            "m.LibraryDemandPredictor.initialize_models = "
+            "lambda self: setattr(self, 'is_initialized', True); "
+        )
+    code += "call_command('run_model_server', socket=%r)" % socket_path
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=BASE_DIR)
+    deadline = time.monotonic() + 600
+    while not os.path.exists(socket_path):
+        if server.poll() is not None or time.monotonic() > deadline:
+            raise RuntimeError('model server failed to start')
+        time.sleep(0.2)
+    return server
+
+
+def run(workers, books, batch, socket_path, stub):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(socket_path, books, batch, stub, barrier, results))
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    measurements = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    elapsed = max(seconds for seconds, _ in measurements)
+    return workers * books / elapsed, sum(memory for _, memory in measurements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='In-process models vs shared model server')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--books', type=int, default=256, help='books scored per worker')
+    parser.add_argument('--batch', type=int, default=16, help='books per predict_demand_frame call')
+    parser.add_argument('--stub', action='store_true', help='use a constant scorer instead of the pipelines')
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'mode':>13} {'node MiB':>10} {'books/s':>10}")
+    for workers in args.workers:
+        throughput, memory = run(workers, args.books, args.batch, None, args.stub)
+        print(f"{workers:7d} {'in-process':>13} {memory:10.0f} {throughput:10.1f}")
+
+        socket_path = os.path.join(tempfile.mkdtemp(), 'model-server.sock')
+        server = start_server(socket_path, args.stub)
+        try:
+            throughput, memory = run(workers, args.books, args.batch, socket_path, args.stub)
+            memory += memory_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{workers:7d} {'model-server':>13} {memory:10.0f} {throughput:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Similar-books query latency and recall on a synthetic 1M-book embedding store.
+
+Writes clustered random float16 embeddings into a throwaway store, trains the
+IVF index, then times ``EmbeddingStore.search`` for several ``nprobe`` values
+and measures recall@k against an exhaustive scan. The MB column is the part
+of the matrix a query reads through the memory map; the rest is never loaded.
+
+Usage:
+    python benchmarks/bench_similar_books.py [--books 1000000] [--dim 768]
+        [--queries 200] [--k 10]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+
+# Set up Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+django.setup()
+
+import numpy as np
+
+from library_ai.embeddings import SCAN_CHUNK_ROWS, EmbeddingStore
+
+
+def fill_store(store, books, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(16, books // 500), dim)).astype(np.float32)
+    store.reset(1, dim)
+    for start in range(0, books, SCAN_CHUNK_ROWS):
+        size = min(SCAN_CHUNK_ROWS, books - start)
+        vectors = centers[rng.integers(0, len(centers), size)] + 0.5 * rng.standard_normal((size, dim))
+        store.write(np.arange(start + 1, start + size + 1), np.arange(size), vectors.astype(np.float16))
+
+
+def exact_neighbours(store, book_id, k):
+    opened = store._open()
+    query = store.vector(book_id)
+    data = opened['data']
+    scores = np.concatenate([
+        np.asarray(data[start:start + SCAN_CHUNK_ROWS], dtype=np.float32) @ query
+        for start in range(0, len(data), SCAN_CHUNK_ROWS)
+    ])
+    scores[book_id - 1] = -np.inf
+    return set((np.argpartition(-scores, k)[:k] + 1).tolist())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Similar-books ANN latency and recall')
+    parser.add_argument('--books', type=int, default=1_000_000)
+    parser.add_argument('--dim', type=int, default=768, help='embedding width (768 for DistilBERT)')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmbeddingStore(directory)
+        start = time.perf_counter()
+        fill_store(store, args.books, args.dim)
+        print(f'write {args.books} x {args.dim}: {time.perf_counter() - start:.1f}s')
+        start = time.perf_counter()
+        store.build_index()
+        print(f'build index: {time.perf_counter() - start:.1f}s')
+
+        rng = np.random.default_rng(1)
+        query_ids = rng.integers(1, args.books + 1, args.queries).tolist()
+        truth = {book_id: exact_neighbours(store, book_id, args.k) for book_id in query_ids[:20]}
+
+        print(f"{'nprobe':>6} {'p50 ms':>8} {'p99 ms':>8} {'recall@' + str(args.k):>10} {'MB read':>8}")
+        for nprobe in (1, 4, 8, 32):
+            latencies, hits, scanned = [], 0, 0
+            for book_id in query_ids:
+                scanned += len(store._candidates(store._open(), store.vector(book_id), nprobe))
+                start = time.perf_counter()
+                neighbours = store.search(book_id, args.k, nprobe)
+                latencies.append(time.perf_counter() - start)
+                if book_id in truth:
+                    hits += len(truth[book_id] & {neighbour_id for neighbour_id, _ in neighbours})
+            latencies.sort()
+            print(f'{nprobe:6d} {statistics.median(latencies) * 1000:8.2f} '
+                  f'{latencies[int(0.99 * (len(latencies) - 1))] * 1000:8.2f} {hits / (len(truth) * args.k):10.2f} '
+                  f'{scanned / len(query_ids) * args.dim * 2 / 2 ** 20:8.1f}')
+        print(f'matrix on disk: {args.books * args.dim * 2 / 2 ** 20:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Startup benchmark and regression guard for lazy heavy imports.
+
+Boots Django in a fresh interpreter under ``python -X importtime``, loads the
+URL configuration (which imports every view module) and reports wall time,
+the slowest imports and RSS after ``django.setup()`` and after URL loading.
+Exits non-zero if torch, transformers, pandas, numpy or scikit-learn were
+imported during boot, or if the optional time/RSS budgets are exceeded.
+
+Usage:
+    python benchmarks/bench_startup.py [--max-seconds 1.5] [--max-rss-mb 150]
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ['torch', 'transformers', 'pandas', 'numpy', 'sklearn']
+
+BOOT_SCRIPT = f"""
+import json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+
+def rss_mb():
+    with open('/proc/self/status') as fh:
+        for line in fh:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+import django
+django.setup()
+setup_seconds = time.perf_counter() - start
+setup_rss = rss_mb()
+
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({{
+    'setup_seconds': setup_seconds,
+    'boot_seconds': time.perf_counter() - start,
+    'rss_after_setup_mb': setup_rss,
+    'rss_after_urls_mb': rss_mb(),
+    'heavy_modules': [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def parse_importtime(stderr, top):
+    """Return the slowest imports as (cumulative_us, module) pairs"""
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = [part.strip() for part in line.split(':', 1)[1].split('|')]
+        timings.append((int(cumulative_us), module))
+    return sorted(timings, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-seconds', type=float, help='fail if boot takes longer than this')
+    parser.add_argument('--max-rss-mb', type=float, help='fail if RSS after URL loading exceeds this')
+    parser.add_argument('--top', type=int, default=15, help='number of slowest imports to show')
+    args = parser.parse_args()
+
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr, file=sys.stderr)
+        return proc.returncode
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    print(f"django.setup():         {result['setup_seconds']:.3f} s, RSS {result['rss_after_setup_mb']:.1f} MiB")
+    print(f"setup + URLconf/views:  {result['boot_seconds']:.3f} s, RSS {result['rss_after_urls_mb']:.1f} MiB")
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, module in parse_importtime(proc.stderr, args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+    failures = []
+    if result['heavy_modules']:
+        failures.append(f"heavy modules imported at boot: {', '.join(result['heavy_modules'])}")
+    if args.max_seconds is not None and result['boot_seconds'] > args.max_seconds:
+        failures.append(f"boot took {result['boot_seconds']:.3f} s (budget {args.max_seconds} s)")
+    if args.max_rss_mb is not None and result['rss_after_urls_mb'] > args.max_rss_mb:
+        failures.append(f"RSS {result['rss_after_urls_mb']:.1f} MiB (budget {args.max_rss_mb} MiB)")
+
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""
+Library partitioning: parallel ingestion and per-request selection cost.
+
+Ingestion: ``--processes`` worker processes repeatedly run the upload path
+(``_upload_file``: parse, clean, stub scoring, database writes, forecast and
+search index rebuilds) on a ``--books`` catalog. This is done twice on a
+throwaway deployment. In "shared" mode every process writes the default
+database, as all libraries did before partitioning; the processes queue on
+SQLite's single writer lock (or fail with "database is locked") and wipe
+each other's catalogs. In "per-library" mode each process uploads into its
+own library's database file.
+
+Selection: ``LibraryMiddleware`` overhead per request, with an ``X-Library``
+header sent by a staff user, for registries of 1 to 100,000 libraries.
+
+Usage:
+    python benchmarks/bench_tenants.py [--processes 4] [--uploads 5] [--books 20000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from bench_asgi_reads import make_settings, upload_body
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+WORKER = """
+import json, os, sys, time
+sys.path.insert(0, {base!r})
+sys.path.insert(0, {settings_dir!r})
+os.environ['DJANGO_SETTINGS_MODULE'] = 'bench_settings'
+import django
+django.setup()
+
+import numpy as np
+from django.test import RequestFactory
+from library_ai import api_views
+from library_ai.ai_models import demand_predictor
+from library_ai.tenants import using_library
+
+demand_predictor.score_texts = lambda texts, categories, want_embeddings=True: (np.full(len(texts), 0.5), np.full(len(texts), 0.5))
+body = open({body_path!r}, 'rb').read()
+factory = RequestFactory()
+
+print(json.dumps({{'ready': True}}), flush=True)
+sys.stdin.readline()
+ok = failed = 0
+start = time.perf_counter()
+with using_library({library!r}):
+    for _ in range({uploads}):
+        request = factory.generic('POST', '/api/upload-file/', body, content_type={content_type!r})
+        response = api_views._upload_file(request)
+        if response.status_code == 200:
+            ok += 1
+        else:
+            failed += 1
+print(json.dumps({{'ok': ok, 'failed': failed, 'seconds': time.perf_counter() - start}}), flush=True)
+"""
+
+
+def run_ingestion(mode, args, settings_dir, body_path, content_type):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='bench_settings', LIBRARY_AI_MICRO_BATCHING='0')
+    processes = []
+    for index in range(args.processes):
+        code = WORKER.format(
+            base=str(BASE_DIR), settings_dir=settings_dir, body_path=body_path, content_type=content_type,
+            library=f'lib-{index}' if mode == 'per-library' else None, uploads=args.uploads,
+        )
+        processes.append(subprocess.Popen(
+            [sys.executable, '-c', code], cwd=BASE_DIR, env=env, text=True,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        ))
+    try:
+        for process in processes:
+            json.loads(process.stdout.readline())
+        start = time.perf_counter()
+        for process in processes:
+            process.stdin.write('go\n')
+            process.stdin.flush()
+        results = [json.loads(process.stdout.readline()) for process in processes]
+        wall = time.perf_counter() - start
+    finally:
+        for process in processes:
+            process.kill()
+            process.wait()
+    ok = sum(result['ok'] for result in results)
+    failed = sum(result['failed'] for result in results)
+    return ok, failed, wall
+
+
+def selection_overhead(settings_dir, repeat=200_000):
+    sys.path.insert(0, str(BASE_DIR))
+    sys.path.insert(0, settings_dir)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'bench_settings'
+    import django
+
+    django.setup()
+
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+
+    from library_ai import tenants
+
+    middleware = tenants.LibraryMiddleware(lambda request: HttpResponse())
+    factory = RequestFactory()
+    baseline_request = factory.get('/api/get-books/')
+    request = factory.get('/api/get-books/', HTTP_X_LIBRARY='lib-0')
+    # Staff may select any library, so the header costs no membership query
+    request.user = SimpleNamespace(is_authenticated=True, is_staff=True)
+
+    def per_call(call):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            call()
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    rows = []
+    for size in (1, 1_000, 100_000):
+        # A registry of ``size`` libraries, as the process would have cached it
+        tenants._known = {'lib-0'} | {f'library-{i}' for i in range(size - 1)}
+        tenants._loaded_at = time.monotonic()
+        rows.append((size, per_call(lambda: middleware(baseline_request)), per_call(lambda: middleware(request))))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel ingestion and selection cost with per-library databases')
+    parser.add_argument('--processes', type=int, default=4, help='concurrent uploading processes')
+    parser.add_argument('--uploads', type=int, default=5, help='uploads per process')
+    parser.add_argument('--books', type=int, default=20_000, help='books per uploaded catalog')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='tenants-bench-') as directory:
+        make_settings(directory)
+        with open(Path(directory) / 'bench_settings.py', 'a') as settings_file:
+            settings_file.write(
+                f"LIBRARY_AI_LIBRARIES_DIR = {str(Path(directory) / 'libraries')!r}\n"
+                f"LIBRARY_AI_EMBEDDINGS_DIR = {str(Path(directory) / 'embeddings')!r}\n"
+            )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='bench_settings', PYTHONPATH=f'{directory}{os.pathsep}{BASE_DIR}')
+        for index in range(args.processes):
+            subprocess.run(
+                [sys.executable, 'manage.py', 'create_library', f'lib-{index}', '-v', '0'],
+                cwd=BASE_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+            )
+
+        body, content_type = upload_body(args.books)
+        body_path = str(Path(directory) / 'upload.bin')
+        Path(body_path).write_bytes(body)
+
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        print(f"{args.processes} processes x {args.uploads} uploads of {args.books:,} books on {cores} cores")
+        print(f"{'mode':>12} {'ok':>4} {'failed':>7} {'wall s':>8} {'uploads/s':>10}")
+        for mode in ('shared', 'per-library'):
+            ok, failed, wall = run_ingestion(mode, args, directory, body_path, content_type)
+            print(f'{mode:>12} {ok:4d} {failed:7d} {wall:8.2f} {ok / wall:10.2f}')
+
+        print(f"\n{'libraries':>10} {'no library us':>14} {'X-Library us':>13}")
+        for size, baseline, selected in selection_overhead(directory):
+            print(f'{size:10,d} {baseline:14.2f} {selected:13.2f}')
+
+
+if __name__ == '__main__':
+    main()
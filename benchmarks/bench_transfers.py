@@ -0,0 +1,72 @@
+"""
+Transfer planner throughput on a synthetic titles x branches catalog.
+
+Times the demand-based target allocation and the vectorized least-cost solver
+with uniform and random branch-to-branch costs, and compares the greedy plan's
+cost with the exact LP on a smaller instance.
+
+Usage:
+    python benchmarks/bench_transfers.py [--titles 100000] [--branches 50]
+        [--exact-titles 2000]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django
+
+# Set up Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+django.setup()
+
+import numpy as np
+
+from library_ai.transfers import solve_transfers
+
+
+def make_catalog(titles, branches, seed=0):
+    rng = np.random.default_rng(seed)
+    holdings = rng.integers(0, 4, size=(titles, branches))
+    demand = rng.poisson(2, size=(titles, branches)).astype(np.float64)
+    costs = rng.uniform(1, 10, size=(branches, branches))
+    np.fill_diagonal(costs, 0)
+    return holdings, demand, costs
+
+
+def run(holdings, demand, costs, method):
+    start = time.perf_counter()
+    (titles, sources, destinations, copies), _ = solve_transfers(holdings, demand, costs, method)
+    elapsed = time.perf_counter() - start
+    return elapsed, int(copies.sum()), float((costs[sources, destinations] * copies).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transfer planner benchmark')
+    parser.add_argument('--titles', type=int, default=100_000)
+    parser.add_argument('--branches', type=int, default=50)
+    parser.add_argument('--exact-titles', type=int, default=2000, help='titles in the greedy vs LP comparison')
+    args = parser.parse_args()
+
+    holdings, demand, costs = make_catalog(args.titles, args.branches)
+    uniform = np.ones_like(costs)
+    np.fill_diagonal(uniform, 0)
+
+    print(f"{args.titles} titles x {args.branches} branches")
+    print(f"{'scenario':22} {'seconds':>8} {'copies':>10} {'cost':>14}")
+    for label, matrix in (('greedy, uniform costs', uniform), ('greedy, random costs', costs)):
+        elapsed, moved, cost = run(holdings, demand, matrix, 'greedy')
+        print(f"{label:22} {elapsed:8.2f} {moved:10d} {cost:14.1f}")
+
+    small = args.exact_titles
+    print(f"\n{small} titles x {args.branches} branches, random costs")
+    for method in ('greedy', 'exact'):
+        elapsed, moved, cost = run(holdings[:small], demand[:small], costs, method)
+        print(f"{method:22} {elapsed:8.2f} {moved:10d} {cost:14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,389 @@
+"""
+End-to-end HTTP load test of the library_ai API with a stub model.
+
+Boots the project under uvicorn against a throwaway SQLite database. It seeds
+the catalog through ``/api/upload-file/`` and then runs ``--concurrency``
+closed-loop clients for ``--duration`` seconds. Each client replays a
+weighted mix of dashboard, inventory, forecast, predict-demand and upload
+requests through the real URL routes, over keep-alive connections.
+
+``demand_predictor.score_texts_locally`` is replaced by a deterministic stub
+(scores derived from a CRC of each book text, plus an optional fixed
+``--scorer-ms`` per call standing in for inference). Micro-batching,
+admission control and the heavy-work executor therefore run as in
+production, and nothing is downloaded: the test runs fully offline.
+
+Per endpoint it reports throughput, p50/p95/p99 latency, 429 rejections and
+errors. It writes a JSON report (with the git commit) that ``--compare`` can
+diff against a later run.
+
+Usage:
+    python benchmarks/loadtest.py [--concurrency 16] [--duration 30] [--warmup 3]
+        [--books 5000] [--workers 1] [--scorer-ms 0]
+        [--mix dashboard=25,books=20,facets=15,forecast=20,predict=18,upload=2]
+        [--output loadtest_report.json] [--compare previous_report.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_asgi_reads import BASE_DIR, free_port, wait_for_server
+
+CATEGORIES = ['Fiction', 'Mystery', 'Fantasy', 'History', 'Romance', 'Science', 'Biography', 'Poetry']
+
+DEFAULT_MIX = 'dashboard=25,books=20,facets=15,forecast=20,predict=18,upload=2'
+
+SETTINGS = """
+from trend_shelf_ai.settings import *  # noqa
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+DATABASES['default']['NAME'] = {db!r}
+MEDIA_ROOT = {media!r}
+LIBRARY_AI_METRICS_DIR = {metrics!r}
+LIBRARY_AI_EMBEDDINGS_DIR = {embeddings!r}
+"""
+
+APP = """
+import os
+import time
+import zlib
+
+import django
+
+django.setup()
+
+import numpy as np
+from django.core.asgi import get_asgi_application
+from library_ai.ai_models import demand_predictor
+
+
+def score_texts_locally(texts, categories, want_embeddings=True):
+    # Deterministic stand-in for the sentiment and zero-shot pipelines
+    if {scorer_seconds}:
+        time.sleep({scorer_seconds})
+    crcs = np.array([zlib.crc32(text.encode()) for text in texts], dtype=np.float64)
+    sentiment = (crcs % 1000) / 1000
+    genre = (crcs // 1000 % 1000) / 1000
+    return sentiment, genre, np.zeros((len(texts), 0), dtype=np.float16)
+
+
+demand_predictor.score_texts_locally = score_texts_locally
+
+application = get_asgi_application()
+"""
+
+SERVER = """
+import uvicorn
+
+uvicorn.run('loadtest_app:application', host='127.0.0.1', port={port}, workers={workers}, log_level='error')
+"""
+
+
+def catalog_csv(books, seed):
+    rng = random.Random(seed)
+    rows = ''.join(
+        f'Book {i},Author {i % 500},{CATEGORIES[i % len(CATEGORIES)]},{rng.randint(0, 100)}\n'
+        for i in range(books)
+    )
+    return 'title,author,category,demand\n' + rows
+
+
+def upload_body(csv_text):
+    boundary = 'loadtestboundary'
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="catalog.csv"\r\n'
+        f'Content-Type: text/csv\r\n\r\n{csv_text}\r\n--{boundary}--\r\n'
+    ).encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"unknown endpoint '{name}' in --mix; choose from {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# Each scenario returns (method, path, body, headers) for one request
+
+def dashboard_request(rng, context):
+    return 'GET', '/api/get-dashboard-data/', None, {}
+
+
+def books_request(rng, context):
+    params = f'page={rng.randint(1, 5)}&page_size=20'
+    if rng.random() < 0.5:
+        params += f'&category={rng.choice(CATEGORIES)}'
+    return 'GET', f'/api/get-books/?{params}', None, {}
+
+
+def facets_request(rng, context):
+    params = f'category={rng.choice(CATEGORIES)}' if rng.random() < 0.5 else ''
+    if rng.random() < 0.3:
+        params += f'&search=Book {rng.randint(1, 99)}'.replace(' ', '+')
+    return 'GET', f'/api/inventory-facets/?{params}', None, {}
+
+
+def forecast_request(rng, context):
+    path = '/api/get-demand-forecast/'
+    if rng.random() < 0.6:
+        path += f'?category={rng.choice(CATEGORIES)}'
+    return 'GET', path, None, {}
+
+
+def predict_request(rng, context):
+    books = [
+        {
+            'title': f'New Book {rng.randint(0, 10_000)}',
+            'author': f'Author {rng.randint(0, 500)}',
+            'category': rng.choice(CATEGORIES),
+        }
+        for _ in range(rng.randint(1, 8))
+    ]
+    return 'POST', '/api/predict-demand/', json.dumps({'books': books}).encode(), {'Content-Type': 'application/json'}
+
+
+def upload_request(rng, context):
+    # Re-uploads the seed catalog so the other endpoints keep seeing the same data
+    body, content_type = context['upload']
+    return 'POST', '/api/upload-file/', body, {'Content-Type': content_type}
+
+
+SCENARIOS = {
+    'dashboard': dashboard_request,
+    'books': books_request,
+    'facets': facets_request,
+    'forecast': forecast_request,
+    'predict': predict_request,
+    'upload': upload_request,
+}
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def client(index, port, args, mix, context, start_at, stop_at, results, lock):
+    """One closed-loop user: pick a request from the mix, send it, repeat"""
+    rng = random.Random(args.seed * 1000 + index)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=args.timeout)
+    samples = []
+    while time.monotonic() < stop_at:
+        name = rng.choices(names, weights)[0]
+        method, path, body, headers = SCENARIOS[name](rng, context)
+        started = time.monotonic()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=args.timeout)
+            status = None
+        finished = time.monotonic()
+        if started >= start_at:
+            samples.append((name, status, finished - started))
+        if args.think_ms:
+            time.sleep(rng.expovariate(1000 / args.think_ms))
+    connection.close()
+    with lock:
+        results.extend(samples)
+
+
+def summarize(samples, elapsed):
+    """Per-endpoint and overall throughput, latency percentiles and failures"""
+    grouped = {}
+    for name, status, latency in samples:
+        grouped.setdefault(name, []).append((status, latency))
+    grouped['all'] = [(status, latency) for _, status, latency in samples]
+
+    summary = {}
+    for name, rows in grouped.items():
+        ok = sorted(latency for status, latency in rows if status is not None and status < 400)
+        statuses = {}
+        for status, _ in rows:
+            key = str(status) if status is not None else 'connection_error'
+            statuses[key] = statuses.get(key, 0) + 1
+        summary[name] = {
+            'requests': len(rows),
+            'ok': len(ok),
+            'rejected': statuses.get('429', 0),
+            'errors': len(rows) - len(ok) - statuses.get('429', 0),
+            'throughput_rps': round(len(ok) / elapsed, 2),
+            'p50_ms': _ms(percentile(ok, 50)),
+            'p95_ms': _ms(percentile(ok, 95)),
+            'p99_ms': _ms(percentile(ok, 99)),
+            'max_ms': _ms(ok[-1] if ok else None),
+            'statuses': statuses,
+        }
+    return summary
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR, capture_output=True, text=True,
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def print_report(report, baseline=None):
+    baseline_endpoints = baseline['endpoints'] if baseline else {}
+    header = f"{'endpoint':>10} {'reqs':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'429':>5} {'err':>5}"
+    print(header + (f" {'rps vs base':>12} {'p95 vs base':>12}" if baseline else ''))
+    for name, row in report['endpoints'].items():
+        line = (
+            f"{name:>10} {row['requests']:7d} {row['throughput_rps']:8.1f} {_fmt(row['p50_ms'])} "
+            f"{_fmt(row['p95_ms'])} {_fmt(row['p99_ms'])} {row['rejected']:5d} {row['errors']:5d}"
+        )
+        if baseline:
+            base = baseline_endpoints.get(name)
+            line += f" {_change(base and base['throughput_rps'], row['throughput_rps'])} "
+            line += _change(base and base['p95_ms'], row['p95_ms'])
+        print(line)
+
+
+def _fmt(value):
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def _change(before, after):
+    if not before or after is None:
+        return f"{'-':>12}"
+    return f"{(after - before) / before:+12.1%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP load test of the library_ai API with a stub model')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent closed-loop clients')
+    parser.add_argument('--duration', type=float, default=30.0, help='measured seconds (after the warm-up)')
+    parser.add_argument('--warmup', type=float, default=3.0, help='seconds of load before measuring')
+    parser.add_argument('--books', type=int, default=5000, help='books in the seeded (and re-uploaded) catalog')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--scorer-ms', type=float, default=0.0, help='stub inference time per scoring call')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='mean pause between a client\'s requests')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint=weight pairs')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=120.0, help='per-request timeout in seconds')
+    parser.add_argument('--output', default='loadtest_report.json', help='JSON report path')
+    parser.add_argument('--compare', help='earlier JSON report to diff against')
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        (directory / 'loadtest_settings.py').write_text(SETTINGS.format(
+            db=str(directory / 'db.sqlite3'), media=str(directory / 'media'),
+            metrics=str(directory / 'metrics'), embeddings=str(directory / 'embeddings'),
+        ))
+        (directory / 'loadtest_app.py').write_text(APP.format(scorer_seconds=args.scorer_ms / 1000))
+        env = dict(
+            os.environ, DJANGO_SETTINGS_MODULE='loadtest_settings', PYTHONPATH=f'{directory}{os.pathsep}{BASE_DIR}',
+            HF_HUB_OFFLINE='1', TRANSFORMERS_OFFLINE='1', LIBRARY_AI_MODEL_SERVER_SOCKET='',
+        )
+        env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+        subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=BASE_DIR, env=env, check=True)
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-c', SERVER.format(port=port, workers=args.workers)], cwd=directory, env=env,
+        )
+        try:
+            wait_for_server(f'http://127.0.0.1:{port}/api/get-books/', server)
+
+            # Seed the catalog through the real upload route
+            context = {'upload': upload_body(catalog_csv(args.books, args.seed))}
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+            started = time.monotonic()
+            connection.request('POST', '/api/upload-file/', body=context['upload'][0],
+                               headers={'Content-Type': context['upload'][1]})
+            response = connection.getresponse()
+            seeded = json.loads(response.read())
+            seed_seconds = time.monotonic() - started
+            connection.close()
+            if response.status != 200:
+                raise SystemExit(f"seeding upload failed ({response.status}): {seeded}")
+            print(f"seeded {args.books} books in {seed_seconds:.1f}s; "
+                  f"running {args.concurrency} clients for {args.warmup:g}s warm-up + {args.duration:g}s")
+
+            results = []
+            lock = threading.Lock()
+            start_at = time.monotonic() + args.warmup
+            stop_at = start_at + args.duration
+            threads = [
+                threading.Thread(
+                    target=client, args=(i, port, args, mix, context, start_at, stop_at, results, lock),
+                )
+                for i in range(args.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            # In-flight requests may finish after stop_at (uploads especially)
+            elapsed = max(time.monotonic(), stop_at) - start_at
+        finally:
+            server.terminate()
+            server.wait()
+
+    commit, dirty = git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'seed_seconds': round(seed_seconds, 2),
+            'elapsed_seconds': round(elapsed, 2),
+            'args': vars(args),
+            'mix': mix,
+        },
+        'endpoints': summarize(results, elapsed),
+    }
+    baseline = None
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        print(f"baseline: {baseline['meta'].get('commit')} ({baseline['meta'].get('created_at')})")
+    print_report(report, baseline)
+
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
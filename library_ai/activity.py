@@ -0,0 +1,357 @@
+"""
+Rolling-window live activity metrics for the real-time monitoring page
+
+Borrow and return events posted to ``/api/activity-events/`` are folded into
+two ring buffers of time slots: one slot per minute for the last hour and one
+per hour for the last day. Each slot holds event counts per type and
+category, a HyperLogLog sketch of the users seen and a Space-Saving summary of
+the most borrowed titles. Every ring also keeps running totals of its live
+slots, so an event costs O(1) work, and reusing a slot subtracts what it held.
+
+Snapshots merge at most 60 small slots. The engine lives in the process that
+receives the events; run one worker or send events to a single process when
+the monitoring page should see all of them.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+# HyperLogLog precision: 2**12 registers, about 1.6% standard error
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+
+# Titles tracked per slot by the Space-Saving summaries
+TOP_TITLES_CAPACITY = 64
+
+# Categories tracked per ring; later ones are counted under OTHER_CATEGORY
+MAX_CATEGORIES = 256
+OTHER_CATEGORY = 'Other'
+
+# Recent events kept for the activity feed
+RECENT_EVENTS = 20
+
+# Event types accepted by the ingestion endpoint
+EVENT_TYPES = ('borrow', 'return')
+
+# A category is flagged when its last-hour borrows reach this multiple of its
+# hourly average over the day (and at least ALERT_MIN_BORROWS)
+ALERT_SPIKE_RATIO = 2.0
+ALERT_MIN_BORROWS = 10
+
+
+class HyperLogLog:
+    """Distinct-count sketch over ``HLL_REGISTERS`` one-byte registers"""
+
+    __slots__ = ('registers',)
+
+    def __init__(self):
+        self.registers = bytearray(HLL_REGISTERS)
+
+    def add(self, value):
+        hashed = hash(str(value)) & 0xFFFFFFFFFFFFFFFF
+        index = hashed >> (64 - HLL_PRECISION)
+        rest = hashed & ((1 << (64 - HLL_PRECISION)) - 1)
+        rank = 64 - HLL_PRECISION - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    @staticmethod
+    def estimate(registers):
+        """Cardinality estimate from a register array (or the max of several)"""
+        import numpy as np
+
+        registers = np.asarray(registers, dtype=np.float64)
+        alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+        raw = alpha * HLL_REGISTERS ** 2 / np.sum(np.exp2(-registers))
+        zeros = int(np.count_nonzero(registers == 0))
+        if raw <= 2.5 * HLL_REGISTERS and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return HLL_REGISTERS * math.log(HLL_REGISTERS / zeros)
+        return raw
+
+
+class SpaceSaving:
+    """
+    Approximate top-k counter (Metwally et al.)
+
+    Counts are overestimates by at most the smallest tracked count. An
+    untracked item costs a scan of ``capacity`` counters; tracked ones are O(1).
+    """
+
+    __slots__ = ('capacity', 'counts')
+
+    def __init__(self, capacity=TOP_TITLES_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+
+    def add(self, item, count=1):
+        counts = self.counts
+        if item in counts:
+            counts[item] += count
+        elif len(counts) < self.capacity:
+            counts[item] = count
+        else:
+            smallest = min(counts, key=counts.get)
+            counts[item] = counts.pop(smallest) + count
+
+
+class _Slot:
+    __slots__ = ('period', 'events', 'categories', 'duration_sum', 'duration_count', 'users', 'titles')
+
+    def __init__(self):
+        self.period = None
+        self.events = dict.fromkeys(EVENT_TYPES, 0)
+        self.categories = {}
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self.users = HyperLogLog()
+        self.titles = SpaceSaving()
+
+
+class _Ring:
+    """``size`` slots of ``width`` seconds with running totals of the live ones"""
+
+    def __init__(self, width, size):
+        self.width = width
+        self.size = size
+        self.slots = [_Slot() for _ in range(size)]
+        self.events = dict.fromkeys(EVENT_TYPES, 0)
+        self.categories = {}
+        self.duration_sum = 0.0
+        self.duration_count = 0
+
+    def slot(self, period):
+        """
+        Slot for a period, recycled (and removed from the totals) if stale
+
+        Returns None when the slot already holds a newer period, whose counts
+        must not be dropped for an older one.
+        """
+        slot = self.slots[period % self.size]
+        if slot.period != period:
+            if slot.period is not None and slot.period > period:
+                return None
+            if slot.period is not None:
+                for event_type, count in slot.events.items():
+                    self.events[event_type] -= count
+                for category, count in slot.categories.items():
+                    remaining = self.categories[category] - count
+                    if remaining:
+                        self.categories[category] = remaining
+                    else:
+                        del self.categories[category]
+                self.duration_sum -= slot.duration_sum
+                self.duration_count -= slot.duration_count
+                self.slots[period % self.size] = slot = _Slot()
+            slot.period = period
+        return slot
+
+    def covers(self, timestamp, now):
+        """Whether a timestamp falls in one of the ring's live periods"""
+        return int(timestamp // self.width) > int(now // self.width) - self.size
+
+    def record(self, period, event_type, user, category, title, duration):
+        slot = self.slot(period)
+        if slot is None:
+            return False
+        slot.events[event_type] += 1
+        self.events[event_type] += 1
+        if user is not None:
+            slot.users.add(user)
+        if event_type == 'borrow':
+            if category:
+                if category not in self.categories and len(self.categories) >= MAX_CATEGORIES:
+                    category = OTHER_CATEGORY
+                slot.categories[category] = slot.categories.get(category, 0) + 1
+                self.categories[category] = self.categories.get(category, 0) + 1
+            if title:
+                slot.titles.add(title)
+        if duration is not None:
+            slot.duration_sum += duration
+            slot.duration_count += 1
+            self.duration_sum += duration
+            self.duration_count += 1
+        return True
+
+    def live_slots(self, now):
+        """Live slots from oldest to newest, with None for periods without events"""
+        current = int(now // self.width)
+        slots = []
+        for period in range(current - self.size + 1, current + 1):
+            slot = self.slots[period % self.size]
+            slots.append((period, slot if slot.period == period else None))
+        return slots
+
+    def expire(self, now):
+        """Drop slots that have fallen out of the window from the running totals"""
+        current = int(now // self.width)
+        for period in range(current - self.size + 1, current + 1):
+            slot = self.slots[period % self.size]
+            if slot.period is not None and slot.period < current - self.size + 1:
+                self.slot(period)
+
+
+class ActivityMetrics:
+    """
+    Live borrow/return metrics over the last hour (per minute) and day (per hour)
+
+    Args:
+        clock: Returns the current time in epoch seconds (for tests and benchmarks)
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.minutes = _Ring(60, 60)
+        self.hours = _Ring(3600, 24)
+        self.recent = deque(maxlen=RECENT_EVENTS)
+        self.total_events = 0
+
+    def record(self, event_type, user=None, category='', title='', duration=None, timestamp=None):
+        """
+        Fold one event into the rolling windows
+
+        Events older than the day window are ignored; future timestamps are
+        clamped to now.
+
+        Returns:
+            True if the event was counted
+        """
+        with self._lock:
+            # Read the clock under the lock, so no other thread advances the
+            # rings between the coverage checks and the writes
+            now = self.clock()
+            timestamp = now if timestamp is None else min(timestamp, now)
+            if not self.hours.covers(timestamp, now):
+                return False
+            if not self.hours.record(int(timestamp // 3600), event_type, user, category, title, duration):
+                return False
+            if self.minutes.covers(timestamp, now):
+                self.minutes.record(int(timestamp // 60), event_type, user, category, title, duration)
+            self.recent.append((timestamp, event_type, title, category))
+            self.total_events += 1
+        return True
+
+    def record_many(self, events):
+        """Record validated event dicts; returns how many were counted"""
+        return sum(self.record(**event) for event in events)
+
+    def snapshot(self, top=10):
+        """Rolling counts, distinct users, hot titles and alerts for the monitoring page"""
+        import numpy as np
+
+        with self._lock:
+            now = self.clock()
+            self.minutes.expire(now)
+            self.hours.expire(now)
+            windows = {}
+            series = {}
+            for name, ring in (('last_hour', self.minutes), ('last_day', self.hours)):
+                slots = ring.live_slots(now)
+                live = [slot for _, slot in slots if slot is not None]
+                registers = (
+                    np.frombuffer(b''.join(bytes(slot.users.registers) for slot in live), dtype=np.uint8)
+                    .reshape(len(live), HLL_REGISTERS)
+                    if live else np.zeros((0, HLL_REGISTERS), dtype=np.uint8)
+                )
+                windows[name] = {
+                    'borrows': ring.events['borrow'],
+                    'returns': ring.events['return'],
+                    'active_users': round(HyperLogLog.estimate(registers.max(axis=0))) if live else 0,
+                    'avg_duration': round(ring.duration_sum / ring.duration_count, 1) if ring.duration_count else 0,
+                    'by_category': dict(sorted(ring.categories.items(), key=lambda item: -item[1])),
+                }
+                live_users = iter(registers)
+                series[name] = [
+                    {
+                        'start': period * ring.width,
+                        'borrows': slot.events['borrow'] if slot else 0,
+                        'returns': slot.events['return'] if slot else 0,
+                        'active_users': round(HyperLogLog.estimate(next(live_users))) if slot else 0,
+                    }
+                    for period, slot in slots
+                ]
+                if name == 'last_hour':
+                    merged = {}
+                    for slot in live:
+                        for title, count in slot.titles.counts.items():
+                            merged[title] = merged.get(title, 0) + count
+                    hot_titles = [
+                        {'title': title, 'borrows': count}
+                        for title, count in sorted(merged.items(), key=lambda item: -item[1])[:top]
+                    ]
+            recent = [
+                {'timestamp': timestamp, 'type': event_type, 'title': title, 'category': category}
+                for timestamp, event_type, title, category in reversed(self.recent)
+            ]
+            hour_categories = dict(self.minutes.categories)
+            day_categories = dict(self.hours.categories)
+            total_events = self.total_events
+
+        alerts = [
+            {'category': category, 'last_hour': borrows, 'hourly_average': round(day_categories.get(category, 0) / 24, 1)}
+            for category, borrows in hour_categories.items()
+            if borrows >= ALERT_MIN_BORROWS and borrows >= ALERT_SPIKE_RATIO * day_categories.get(category, 0) / 24
+        ]
+        return {
+            'now': now,
+            **windows,
+            'per_minute': series['last_hour'],
+            'per_hour': series['last_day'],
+            'hot_titles': hot_titles,
+            'alerts': alerts,
+            'recent': recent,
+            'total_events': total_events,
+        }
+
+
+# Per library slug (None for requests without a library)
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def activity_metrics():
+    """Process-wide activity engine of the current library"""
+    from .tenants import current_library
+
+    library = current_library()
+    if library not in _metrics:
+        with _metrics_lock:
+            if library not in _metrics:
+                _metrics[library] = ActivityMetrics()
+    return _metrics[library]
+
+
+def _finite(raw, field):
+    """Optional numeric field of a posted event; NaN and infinities are rejected"""
+    value = raw.get(field)
+    if value is None:
+        return None
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f'{field} must be a finite number')
+    return value
+
+
+def parse_event(raw):
+    """
+    Validate one posted event into ``ActivityMetrics.record`` arguments
+
+    Raises:
+        ValueError: if the event is malformed or a numeric field is not finite
+        TypeError: if a numeric field is not a number
+    """
+    if not isinstance(raw, dict):
+        raise ValueError('each event must be an object')
+    event_type = raw.get('type')
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"event type must be one of {', '.join(EVENT_TYPES)}")
+    return {
+        'event_type': event_type,
+        'user': raw.get('user_id'),
+        'category': str(raw.get('category') or ''),
+        'title': str(raw.get('title') or ''),
+        'duration': _finite(raw, 'duration_minutes'),
+        'timestamp': _finite(raw, 'timestamp'),
+    }
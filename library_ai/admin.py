@@ -1,14 +1,218 @@
-from django.contrib import admin
-from .models import Book, UploadedFile, PredictionHistory
+import logging
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .admission import Rejected, admitted
+from .bulk_scoring import rescore_books, submit_rescore
+from .forecast_index import FORECAST_COLUMNS, forecast_categories, refresh_forecast_index
+from .models import Book, BranchStock, Library, ScoringCheckpoint, UploadedFile, PredictionHistory, PredictionSummary
+from .search_index import SEARCH_COLUMNS, index_book, search_books, unindex_books
+from .tenants import current_library
+
+logger = logging.getLogger(__name__)
+
+
+def estimated_row_count(queryset):
+    """Rows in a table estimated from its primary key range (two index lookups instead of a scan)"""
+    queryset = queryset.order_by()
+    lowest = queryset.order_by('pk').values_list('pk', flat=True).first()
+    if lowest is None:
+        return 0
+    highest = queryset.order_by('-pk').values_list('pk', flat=True).first()
+    return highest - lowest + 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for changelists over tables with millions of rows
+
+    Counts stop after LIBRARY_AI_ADMIN_COUNT_LIMIT rows. Larger unfiltered
+    tables report the primary key range instead, and larger filtered results
+    page up to the limit, so no changelist runs a full ``COUNT(*)``.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.LIBRARY_AI_ADMIN_COUNT_LIMIT
+        queryset = self.object_list.order_by()
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset)
+            if estimate > limit:
+                return estimate
+        return min(queryset[:limit + 1].count(), limit)
+
+
+class CachedValuesFilter(admin.SimpleListFilter):
+    """
+    Filter on one column whose choices come from ``values`` instead of a
+    ``SELECT DISTINCT`` over the whole table, cached for
+    LIBRARY_AI_ADMIN_FILTER_CACHE_SECONDS
+    """
+    cache_seconds = None
+
+    def values(self, model_admin):
+        raise NotImplementedError
+
+    def lookups(self, request, model_admin):
+        seconds = settings.LIBRARY_AI_ADMIN_FILTER_CACHE_SECONDS if self.cache_seconds is None else self.cache_seconds
+        key = f'library_ai:admin_filter:{current_library()}:{model_admin.model._meta.label_lower}:{self.parameter_name}'
+        values = cache.get(key) if seconds else None
+        if values is None:
+            values = list(self.values(model_admin))
+            if seconds:
+                cache.set(key, values, seconds)
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class CategoryFilter(CachedValuesFilter):
+    title = 'category'
+    parameter_name = 'category'
+    # The forecast index already holds one row per category and is rebuilt with the catalog
+    cache_seconds = 0
+
+    def values(self, model_admin):
+        return forecast_categories()
+
+
+class BranchFilter(CachedValuesFilter):
+    title = 'branch'
+    parameter_name = 'branch'
+
+    def values(self, model_admin):
+        return BranchStock.objects.order_by('branch').values_list('branch', flat=True).distinct()
+
+
+class ModelVersionFilter(CachedValuesFilter):
+    title = 'model version'
+    parameter_name = 'model_version'
+
+    def values(self, model_admin):
+        # Every recorded prediction is rolled up into the (much smaller) summary table
+        return PredictionSummary.objects.order_by('model_version').values_list('model_version', flat=True).distinct()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Library)
+class LibraryAdmin(admin.ModelAdmin):
+    list_display = ['slug', 'name', 'created_at']
+    search_fields = ['slug', 'name']
+    readonly_fields = ['created_at']
+    filter_horizontal = ['members']
+
+    def has_add_permission(self, request):
+        # Libraries need their database created: use `manage.py create_library`
+        return False
 
 
 @admin.register(Book)
-class BookAdmin(admin.ModelAdmin):
+class BookAdmin(LargeTableAdmin):
     list_display = ['title', 'author', 'category', 'demand', 'action', 'created_at']
-    list_filter = ['category', 'action', 'created_at']
+    list_filter = [CategoryFilter, 'action', 'created_at']
     search_fields = ['title', 'author', 'category']
     list_editable = ['action']
-    ordering = ['-demand']
+    # Ends in the primary key, so the admin adds no tie-breaker and book_demand_title_idx serves the sort
+    ordering = ['-demand', 'title', 'id']
+    actions = ['rescore_selected']
+
+    def get_search_results(self, request, queryset, search_term):
+        matched = search_books(queryset, search_term) if search_term else None
+        if matched is None:
+            return super().get_search_results(request, queryset, search_term)
+        return matched, False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            index_book(obj)
+        elif set(SEARCH_COLUMNS) & set(form.changed_data):
+            index_book(obj, previous=form.initial)
+        if not change or set(FORECAST_COLUMNS) & set(form.changed_data):
+            refresh_forecast_index({obj.category, form.initial.get('category')})
+
+    def delete_model(self, request, obj):
+        unindex_books(Book.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        refresh_forecast_index({obj.category})
+
+    def delete_queryset(self, request, queryset):
+        unindex_books(queryset)
+        categories = set(queryset.order_by().values_list('category', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        refresh_forecast_index(categories)
+
+    @admin.action(description='Rescore selected books with the demand model')
+    def rescore_selected(self, request, queryset):
+        limit = settings.LIBRARY_AI_ADMIN_RESCORE_LIMIT
+        selected = queryset.order_by()[:limit + 1].count()
+        if selected > limit:
+            self.message_user(
+                request,
+                f"More than {limit} books selected; rescore the whole catalog with 'manage.py score_catalog' instead",
+                messages.ERROR,
+            )
+            return
+        if selected <= settings.LIBRARY_AI_ADMIN_RESCORE_SYNC_LIMIT:
+            try:
+                # Small selections run in the request unless an upload or reprocess holds the bulk slot
+                with admitted('bulk', selected, wait=0):
+                    rescored = rescore_books(queryset)
+            except Rejected:
+                pass
+            except Exception as e:
+                logger.error(f"Error rescoring books from the admin: {str(e)}")
+                self.message_user(request, f"Error rescoring books: {str(e)}", messages.ERROR)
+                return
+            else:
+                self.message_user(request, f"Rescored {rescored} books", messages.SUCCESS)
+                return
+
+        name = f"admin rescore {timezone.now():%Y-%m-%d %H:%M:%S}"
+        try:
+            submit_rescore(queryset, name, priority=selected)
+        except Rejected as e:
+            self.message_user(
+                request, f"The server is busy scoring; retry in {e.retry_after} seconds", messages.WARNING,
+            )
+            return
+        except Exception as e:
+            logger.error(f"Error starting a background rescore from the admin: {str(e)}")
+            self.message_user(request, f"Error rescoring books: {str(e)}", messages.ERROR)
+            return
+        self.message_user(
+            request,
+            f"Rescoring {selected} books in the background; follow '{name}' under Scoring checkpoints",
+            messages.INFO,
+        )
+
+
+@admin.register(BranchStock)
+class BranchStockAdmin(LargeTableAdmin):
+    list_display = ['book', 'branch', 'copies', 'borrows']
+    list_filter = [BranchFilter]
+    list_select_related = ['book']
+    search_fields = ['book__title', 'branch']
+    raw_id_fields = ['book']
+
+
+@admin.register(ScoringCheckpoint)
+class ScoringCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['name', 'source', 'rows_scored', 'position', 'status', 'updated_at']
+    list_filter = ['status']
+    readonly_fields = ['started_at', 'updated_at']
 
 
 @admin.register(UploadedFile)
@@ -19,7 +223,15 @@ class UploadedFileAdmin(admin.ModelAdmin):
 
 
 @admin.register(PredictionHistory)
-class PredictionHistoryAdmin(admin.ModelAdmin):
-    list_display = ['book', 'predicted_demand', 'actual_demand', 'prediction_date', 'model_version']
-    list_filter = ['prediction_date', 'model_version']
-    readonly_fields = ['prediction_date']
\ No newline at end of file
+class PredictionHistoryAdmin(LargeTableAdmin):
+    list_display = ['book', 'category', 'predicted_demand', 'actual_demand', 'predicted_action', 'actual_action', 'prediction_date', 'model_version', 'source']
+    list_filter = ['prediction_date', ModelVersionFilter, 'source']
+    list_select_related = ['book']
+    raw_id_fields = ['book']
+    readonly_fields = ['prediction_date']
+
+
+@admin.register(PredictionSummary)
+class PredictionSummaryAdmin(admin.ModelAdmin):
+    list_display = ['date', 'model_version', 'category', 'predictions', 'moves', 'actuals', 'ape_count', 'action_hits']
+    list_filter = ['model_version', 'date']
@@ -0,0 +1,276 @@
+"""
+Admission control and load shedding for inference endpoints
+
+Requests that run inference are grouped into endpoint classes (see
+``LIBRARY_AI_ADMISSION``). Each class admits at most ``concurrency`` requests at
+a time and parks up to ``queue`` more in a priority queue ordered by request
+size, so small requests overtake large uploads. When the queue is full a new
+request is rejected with 429 and a Retry-After estimate, unless it is smaller
+than the largest waiting request, in which case that one is shed instead.
+Classes marked ``per_library`` (bulk uploads and reprocessing by default) have
+one controller per library, so libraries ingest in parallel.
+
+Slots are handed out through ``concurrent.futures.Future`` objects, so the same
+controller serves coroutine views (awaiting the future on the event loop) and
+synchronous callers (``admitted``).
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import Future
+
+from django.http import JsonResponse
+
+from .metrics import Counter, Gauge, STAGE_SECONDS
+from .tenants import current_library
+
+DEFAULT_ADMISSION = {
+    'predict': {'concurrency': 4, 'queue': 16},
+    'bulk': {'concurrency': 1, 'queue': 4, 'per_library': True},
+}
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'library_ai_admission_queue_depth',
+    'Requests waiting for an inference slot',
+    ['endpoint_class'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'library_ai_admission_in_flight',
+    'Requests holding an inference slot',
+    ['endpoint_class'],
+    multiprocess_mode='livesum',
+)
+ADMISSION_REJECTIONS = Counter(
+    'library_ai_admission_rejections_total',
+    'Requests rejected with 429 by admission control',
+    ['endpoint_class', 'reason'],
+)
+
+
+class Rejected(Exception):
+    """Raised when a request is shed; ``retry_after`` is in seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ('priority', 'sequence', 'future', 'enqueued_at')
+
+    def __init__(self, priority, sequence):
+        self.priority = priority
+        self.sequence = sequence
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class AdmissionController:
+    """
+    Bounded concurrency plus a bounded smallest-first queue for one endpoint class
+
+    Args:
+        name: Endpoint class, used as the metrics label
+        concurrency: Requests allowed to run at once
+        queue: Requests allowed to wait for a slot
+    """
+
+    def __init__(self, name, concurrency, queue):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = queue
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._running = 0
+        self._sequence = itertools.count()
+        # Moving average of slot hold time, for Retry-After estimates
+        self._service_seconds = 1.0
+
+    def acquire(self, priority=0):
+        """
+        Request a slot; the returned future resolves once it is granted
+
+        Raises:
+            Rejected: if the queue is full and the request is not smaller than
+                every waiting request
+        """
+        ticket = _Ticket(priority, next(self._sequence))
+        shed = None
+        with self._lock:
+            if self._running < self.concurrency and not self._waiting:
+                self._running += 1
+                ticket.future.set_running_or_notify_cancel()
+                ticket.future.set_result(ticket)
+            elif len(self._waiting) < self.max_queue:
+                heapq.heappush(self._waiting, ticket)
+            else:
+                largest = max(self._waiting, default=None)
+                if largest is None or not ticket < largest:
+                    raise self._reject('queue_full')
+                self._waiting.remove(largest)
+                heapq.heapify(self._waiting)
+                heapq.heappush(self._waiting, ticket)
+                shed = largest
+            self._update_gauges()
+        if shed is not None and shed.future.set_running_or_notify_cancel():
+            shed.future.set_exception(self._reject('shed'))
+        return ticket.future
+
+    def release(self, ticket, held_seconds=None):
+        """Return a granted slot, handing it to the smallest waiting request"""
+        with self._lock:
+            if held_seconds is not None:
+                self._service_seconds += 0.2 * (held_seconds - self._service_seconds)
+            granted = None
+            while self._waiting:
+                candidate = heapq.heappop(self._waiting)
+                # Skip callers that were cancelled while waiting
+                if candidate.future.set_running_or_notify_cancel():
+                    granted = candidate
+                    break
+            if granted is None:
+                self._running -= 1
+            self._update_gauges()
+        if granted is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - granted.enqueued_at, stage=f'admission_wait_{self.name}')
+            granted.future.set_result(granted)
+
+    def cancel(self, future):
+        """Withdraw a request whose caller gave up, releasing its slot if granted"""
+        with self._lock:
+            for ticket in self._waiting:
+                if ticket.future is future:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._update_gauges()
+                    return
+        # Already granted (or about to be): give the slot back once it is
+        future.add_done_callback(
+            lambda done: None if done.cancelled() or done.exception() else self.release(done.result())
+        )
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained"""
+        backlog = (len(self._waiting) + self._running) / self.concurrency
+        return max(1, math.ceil(backlog * self._service_seconds))
+
+    def _reject(self, reason):
+        ADMISSION_REJECTIONS.inc(endpoint_class=self.name, reason=reason)
+        return Rejected(reason, self.retry_after())
+
+    def _update_gauges(self):
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiting), endpoint_class=self.name)
+        ADMISSION_IN_FLIGHT.set(self._running, endpoint_class=self.name)
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def _config(endpoint_class):
+    from django.conf import settings
+
+    return {**DEFAULT_ADMISSION, **getattr(settings, 'LIBRARY_AI_ADMISSION', {})}[endpoint_class]
+
+
+def controller(endpoint_class, library=None):
+    """
+    Process-wide controller for an endpoint class, configured from settings
+
+    Classes configured with ``per_library`` get a separate controller for each
+    library, so one library's uploads never queue behind another's.
+    """
+    key = (endpoint_class, library if _config(endpoint_class).get('per_library') else None)
+    if key not in _controllers:
+        with _controllers_lock:
+            if key not in _controllers:
+                config = _config(endpoint_class)
+                _controllers[key] = AdmissionController(
+                    endpoint_class if key[1] is None else f'{endpoint_class}:{key[1]}',
+                    config['concurrency'], config['queue'],
+                )
+    return _controllers[key]
+
+
+def request_size(request):
+    """Default priority: smaller request bodies are admitted first"""
+    try:
+        return int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return 0
+
+
+def whole_catalog(request):
+    """Priority for jobs over the entire catalog: admitted after any sized request"""
+    return math.inf
+
+
+def admission_controlled(endpoint_class, priority=request_size):
+    """
+    Run a coroutine view under the endpoint class's admission controller
+
+    Shed requests get a 429 JSON response with a Retry-After header.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            gate = controller(endpoint_class, current_library())
+            try:
+                slot = gate.acquire(priority(request))
+                ticket = await asyncio.wrap_future(slot)
+            except asyncio.CancelledError:
+                gate.cancel(slot)
+                raise
+            except Rejected as e:
+                response = JsonResponse(
+                    {'error': 'Server is busy, please retry later', 'retry_after': e.retry_after}, status=429,
+                )
+                response['Retry-After'] = str(e.retry_after)
+                return response
+
+            start = time.perf_counter()
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                gate.release(ticket, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def admitted(endpoint_class, priority=0, wait=None):
+    """
+    Hold a slot of the endpoint class's controller in synchronous code
+
+    Args:
+        endpoint_class: Controller to take the slot from
+        priority: Request size; smaller ones are admitted first
+        wait: Seconds to wait for the slot; None waits until it is granted
+
+    Raises:
+        Rejected: if the request is shed, or no slot is granted within ``wait``
+    """
+    gate = controller(endpoint_class, current_library())
+    slot = gate.acquire(priority)
+    try:
+        ticket = slot.result(wait)
+    except concurrent.futures.TimeoutError:
+        gate.cancel(slot)
+        raise Rejected('timeout', gate.retry_after())
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        gate.release(ticket, time.perf_counter() - start)
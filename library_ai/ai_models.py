@@ -1,30 +1,79 @@
 """
 AI Models using Hugging Face Transformers
+
+torch, transformers, pandas, numpy and scikit-learn are imported inside the
+methods that use them, so importing this module (and therefore every Django
+command, migration and worker boot) stays cheap until inference or parsing
+actually happens.
 """
-import torch
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import LabelEncoder
+import bisect
 import logging
+import time
+
+from .metrics import (
+    CACHE_HITS, CACHE_MISSES, INFERENCE_BATCH_SIZE, MODEL_LOAD_SECONDS, ROWS_PROCESSED, timed,
+)
+from .batching import MicroBatcher
+from .cpu_budget import apply_cpu_budget
+from .model_server import ModelServerClient, ModelServerUnavailable
 
 logger = logging.getLogger(__name__)
 
+# Popular genres used for zero-shot genre relevance
+POPULAR_GENRES = [
+    "fiction", "mystery", "romance", "science fiction",
+    "fantasy", "thriller", "biography", "self-help"
+]
+
+# Demand thresholds separating the recommended actions, lowest first
+ACTION_THRESHOLDS = (60, 75, 90)
+ACTIONS_BY_DEMAND = ['Deaccession', 'Transfer', 'Hold', 'Acquire']
+
+# Recorded with every persisted prediction; bump when models or scoring change
+MODEL_VERSION = 'v1.0'
+
+# Texts per transformer forward pass
+INFERENCE_BATCH = 32
+
+# Tokens per book text when computing embeddings
+EMBEDDING_MAX_TOKENS = 128
+
+# Seconds to use in-process models before retrying an unreachable model server
+MODEL_SERVER_RETRY_SECONDS = 30
+
 
 class LibraryDemandPredictor:
     """
     AI model for predicting library book demand using Hugging Face models
     """
     
-    def __init__(self):
+    def __init__(self, use_model_server=True):
         self.sentiment_analyzer = None
         self.text_classifier = None
-        self.label_encoder = LabelEncoder()
+        self._label_encoder = None
         self.is_initialized = False
+        self.model_version = MODEL_VERSION
+        self.use_model_server = use_model_server
+        self._model_server = None
+        self._model_server_retry_at = 0.0
+        self._batcher = None
+    
+    @property
+    def label_encoder(self):
+        if self._label_encoder is None:
+            from sklearn.preprocessing import LabelEncoder
+            self._label_encoder = LabelEncoder()
+        return self._label_encoder
         
     def initialize_models(self):
         """Initialize Hugging Face models"""
+        start = time.perf_counter()
         try:
+            # Split the node's cores between workers before torch starts its pools
+            apply_cpu_budget()
+            
+            from transformers import pipeline
+            
             # Initialize sentiment analysis model for book popularity prediction
             self.sentiment_analyzer = pipeline(
                 "sentiment-analysis",
@@ -39,72 +88,261 @@ class LibraryDemandPredictor:
             )
             
             self.is_initialized = True
+            MODEL_LOAD_SECONDS.set(time.perf_counter() - start)
             logger.info("AI models initialized successfully")
             
         except Exception as e:
             logger.error(f"Error initializing AI models: {str(e)}")
             self.is_initialized = False
     
+    @timed('predict_demand')
     def predict_demand(self, books_data):
         """
         Predict demand for books using AI models
         
+        Thin wrapper over ``predict_demand_frame`` for list-of-dicts callers.
+        
         Args:
             books_data: List of dictionaries with book information
             
         Returns:
             List of dictionaries with predictions
         """
-        if not self.is_initialized:
-            self.initialize_models()
+        if not books_data:
+            return []
+        
+        import pandas as pd
+        
+        predictions = self.predict_demand_frame(pd.DataFrame.from_records(books_data))
+        return predictions.astype({'category': object, 'action': object}).to_dict('records')
+    
+    @timed('predict_demand_frame')
+    def predict_demand_frame(self, books, return_embeddings=False, deduplicated=False):
+        """
+        Predict demand for a batch of books in columnar form
+        
+        Args:
+            books: DataFrame with title, author, category and optional demand columns
+            return_embeddings: Also return the book-text embeddings
+            deduplicated: Rows are already distinct books (``clean_catalog``
+                output), so duplicate texts need not be looked for
+            
+        Returns:
+            DataFrame with title, author, category, demand, action and ai_confidence
+            columns; category and action use categorical dtypes. With
+            ``return_embeddings``, a tuple of that DataFrame and ``(codes,
+            embeddings)``: float16 embeddings of the distinct book texts and the
+            row -> text code of every book (embeddings have 0 columns when
+            no encoder is available).
+        """
+        import numpy as np
+        import pandas as pd
+        
+        ROWS_PROCESSED.inc(len(books), stage='predict_demand')
         
-        predictions = []
+        titles = self._text_column(books, 'title')
+        authors = self._text_column(books, 'author')
+        categories = self._text_column(books, 'category')
         
-        for book in books_data:
+        # Create a text representation of each book, scoring duplicates once
+        book_texts = titles.astype(str) + ' by ' + authors.astype(str) + ' in ' + categories.astype(str)
+        if deduplicated:
+            codes = np.arange(len(book_texts))
+            unique_texts = book_texts.tolist()
+            unique_categories = categories.astype(str).to_numpy()
+        else:
+            codes, unique_texts = pd.factorize(book_texts)
+            unique_texts = unique_texts.tolist()
+            unique_categories = categories.astype(str).to_numpy()[self._first_occurrences(codes, len(unique_texts))]
+        if len(unique_texts) < len(book_texts):
+            CACHE_HITS.inc(len(book_texts) - len(unique_texts), cache='book_text')
+        
+        # Analyze sentiment/popularity potential and genre relevance
+        scores = self.score_texts(unique_texts, unique_categories, want_embeddings=return_embeddings)
+        sentiment_scores = scores[0][codes]
+        genre_scores = scores[1][codes]
+        
+        # Calculate base demand from existing data if available
+        if 'demand' in books:
+            base_demand = pd.to_numeric(books['demand'], errors='coerce').fillna(50).to_numpy(dtype=np.float64)
+        else:
+            base_demand = np.full(len(books), 50.0)
+        
+        # Combine AI predictions with base demand
+        ai_adjustment = (sentiment_scores + genre_scores) / 2
+        predicted_demand = np.clip(base_demand * (0.7 + 0.6 * ai_adjustment), 0, 100)
+        
+        predictions = pd.DataFrame({
+            'title': titles.to_numpy(),
+            'author': authors.to_numpy(),
+            'category': pd.Categorical(categories),
+            'demand': np.round(predicted_demand, 1),
+            'action': self.determine_actions(predicted_demand),
+            'ai_confidence': np.round(ai_adjustment * 100, 1),
+        })
+        if not return_embeddings:
+            return predictions
+        embeddings = scores[2] if len(scores) > 2 else np.zeros((len(unique_texts), 0), dtype=np.float16)
+        return predictions, (codes, embeddings)
+    
+    def score_texts(self, texts, categories, want_embeddings=True):
+        """
+        Sentiment and genre relevance scores for book texts
+        
+        Small requests are coalesced with those of other in-flight requests
+        into shared micro-batches (see ``LIBRARY_AI_MICRO_BATCHING``). Scoring
+        uses the shared model server when ``LIBRARY_AI_MODEL_SERVER_SOCKET`` is
+        set and reachable, otherwise the models loaded in this process.
+        
+        Args:
+            texts: Book texts to score
+            categories: Category of each text
+            want_embeddings: Also compute embeddings (an extra encoder pass)
+        
+        Returns:
+            Tuple of (sentiment, genre, embeddings) NumPy arrays aligned with
+            ``texts``; embeddings are float16 rows (0 columns when disabled
+            or not wanted)
+        """
+        batcher = self._micro_batcher()
+        if batcher is not None:
+            return batcher.submit(texts, categories, want_embeddings=want_embeddings)
+        return self._score_texts_unbatched(texts, categories, want_embeddings)
+    
+    def _micro_batcher(self):
+        if self._batcher is None:
+            from django.conf import settings
+            
+            if not getattr(settings, 'LIBRARY_AI_MICRO_BATCHING', False):
+                return None
+            self._batcher = MicroBatcher(
+                self._score_texts_unbatched,
+                max_batch_size=getattr(settings, 'LIBRARY_AI_BATCH_MAX_SIZE', 64),
+                max_wait=getattr(settings, 'LIBRARY_AI_BATCH_MAX_WAIT_MS', 5) / 1000,
+            )
+        return self._batcher
+    
+    def _score_texts_unbatched(self, texts, categories, want_embeddings=True):
+        client = self._model_server_client()
+        if client is not None:
             try:
-                # Create a text representation of the book
-                book_text = f"{book.get('title', '')} by {book.get('author', '')} in {book.get('category', '')}"
-                
-                # Analyze sentiment/popularity potential
-                sentiment_score = self._analyze_sentiment(book_text)
-                
-                # Classify genre relevance
-                genre_score = self._classify_genre_relevance(book_text, book.get('category', ''))
-                
-                # Calculate base demand from existing data if available
-                base_demand = float(book.get('demand', 50))
-                
-                # Combine AI predictions with base demand
-                ai_adjustment = (sentiment_score + genre_score) / 2
-                predicted_demand = min(100, max(0, base_demand * (0.7 + 0.6 * ai_adjustment)))
-                
-                # Determine action based on predicted demand
-                action = self._determine_action(predicted_demand, book.get('category', ''))
-                
-                prediction = {
-                    'title': book.get('title', ''),
-                    'author': book.get('author', ''),
-                    'category': book.get('category', ''),
-                    'demand': round(predicted_demand, 1),
-                    'action': action,
-                    'ai_confidence': round(ai_adjustment * 100, 1)
-                }
-                
-                predictions.append(prediction)
-                
-            except Exception as e:
-                logger.error(f"Error predicting demand for book {book.get('title', 'Unknown')}: {str(e)}")
-                # Fallback prediction
-                predictions.append({
-                    'title': book.get('title', ''),
-                    'author': book.get('author', ''),
-                    'category': book.get('category', ''),
-                    'demand': float(book.get('demand', 50)),
-                    'action': book.get('action', 'Hold'),
-                    'ai_confidence': 50.0
-                })
-        
-        return predictions
+                return client.score(texts, categories, want_embeddings)
+            except ModelServerUnavailable as e:
+                logger.warning(f"Model server unavailable, using in-process models: {str(e)}")
+                self._model_server_retry_at = time.monotonic() + MODEL_SERVER_RETRY_SECONDS
+        return self.score_texts_locally(texts, categories, want_embeddings)
+    
+    def score_texts_locally(self, texts, categories, want_embeddings=True):
+        """Score texts with the pipelines owned by this process"""
+        import numpy as np
+        
+        if self.is_initialized:
+            CACHE_HITS.inc(cache='models')
+        else:
+            CACHE_MISSES.inc(cache='models')
+            self.initialize_models()
+        
+        return (
+            self._analyze_sentiment_batch(texts),
+            self._classify_genre_relevance_batch(texts, categories),
+            self._embed_batch(texts) if want_embeddings else np.zeros((len(texts), 0), dtype=np.float16),
+        )
+    
+    def _model_server_client(self):
+        if not self.use_model_server:
+            return None
+        if self._model_server is None:
+            from django.conf import settings
+            
+            socket_path = getattr(settings, 'LIBRARY_AI_MODEL_SERVER_SOCKET', '')
+            if not socket_path:
+                self.use_model_server = False
+                return None
+            self._model_server = ModelServerClient(socket_path)
+        if time.monotonic() < self._model_server_retry_at:
+            return None
+        return self._model_server
+    
+    @staticmethod
+    def _text_column(books, column):
+        import pandas as pd
+        
+        if column not in books:
+            return pd.Series([''] * len(books), index=books.index)
+        return books[column].fillna('')
+    
+    @staticmethod
+    def _first_occurrences(codes, n_unique):
+        """Row index of the first occurrence of each factorized code"""
+        import numpy as np
+        
+        first = np.full(n_unique, len(codes), dtype=np.int64)
+        np.minimum.at(first, codes, np.arange(len(codes)))
+        return first
+    
+    @timed('sentiment')
+    def _analyze_sentiment_batch(self, texts):
+        """Analyze sentiment of many texts in batched pipeline calls"""
+        import numpy as np
+        
+        if not self.sentiment_analyzer or not texts:
+            return np.full(len(texts), 0.5)
+        
+        try:
+            INFERENCE_BATCH_SIZE.observe(len(texts), model='sentiment')
+            results = self.sentiment_analyzer(
+                [text[:512] for text in texts], batch_size=INFERENCE_BATCH
+            )
+            return np.array([self._positive_score(result) for result in results])
+        
+        except Exception as e:
+            logger.error(f"Error in batched sentiment analysis, scoring individually: {str(e)}")
+            return np.array([self._analyze_sentiment(text) for text in texts])
+    
+    @timed('embedding')
+    def _embed_batch(self, texts):
+        """
+        Mean-pooled sentiment-encoder embeddings of many texts
+        
+        Reuses the weights already loaded for sentiment analysis, so embeddings
+        cost one extra encoder pass and no extra memory.
+        """
+        import numpy as np
+        from django.conf import settings
+        
+        if not self.sentiment_analyzer or not texts or not getattr(settings, 'LIBRARY_AI_EMBEDDINGS', True):
+            return np.zeros((len(texts), 0), dtype=np.float16)
+        
+        try:
+            import torch
+            
+            tokenizer = self.sentiment_analyzer.tokenizer
+            encoder = self.sentiment_analyzer.model.base_model
+            INFERENCE_BATCH_SIZE.observe(len(texts), model='embedding')
+            
+            pooled = []
+            for start in range(0, len(texts), INFERENCE_BATCH):
+                batch = tokenizer(
+                    texts[start:start + INFERENCE_BATCH], padding=True, truncation=True,
+                    max_length=EMBEDDING_MAX_TOKENS, return_tensors='pt',
+                ).to(encoder.device)
+                with torch.no_grad():
+                    hidden = encoder(**batch).last_hidden_state
+                mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled.append(((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)).float().cpu().numpy())
+            return np.concatenate(pooled).astype(np.float16)
+        
+        except Exception as e:
+            logger.error(f"Error computing embeddings: {str(e)}")
+            return np.zeros((len(texts), 0), dtype=np.float16)
+    
+    @staticmethod
+    def _positive_score(scores):
+        """Convert sentiment label scores to a demand score"""
+        for result in scores:
+            if result['label'] in ['LABEL_2', 'POSITIVE']:
+                return result['score']
+        return 0
     
     def _analyze_sentiment(self, text):
         """Analyze sentiment to predict popularity"""
@@ -112,40 +350,66 @@ class LibraryDemandPredictor:
             if not self.sentiment_analyzer:
                 return 0.5  # Neutral score
                 
+            INFERENCE_BATCH_SIZE.observe(1, model='sentiment')
             results = self.sentiment_analyzer(text[:512])  # Limit text length
             
             # Convert sentiment to demand score
-            positive_score = 0
-            for result in results[0]:
-                if result['label'] in ['LABEL_2', 'POSITIVE']:
-                    positive_score = result['score']
-                    break
-            
-            return positive_score
+            return self._positive_score(results[0])
             
         except Exception as e:
             logger.error(f"Error in sentiment analysis: {str(e)}")
             return 0.5
     
+    @timed('genre_classification')
+    def _classify_genre_relevance_batch(self, texts, categories):
+        """Classify genre relevance of many texts in batched pipeline calls"""
+        import numpy as np
+        import pandas as pd
+        
+        if not self.text_classifier or not texts:
+            return np.full(len(texts), 0.5)
+        
+        try:
+            INFERENCE_BATCH_SIZE.observe(len(texts), model='zero_shot')
+            results = self.text_classifier(
+                [text[:512] for text in texts], POPULAR_GENRES, batch_size=INFERENCE_BATCH
+            )
+            if isinstance(results, dict):
+                results = [results]
+            
+            # Score matrix with one column per genre, in POPULAR_GENRES order
+            scores = np.array([
+                [dict(zip(result['labels'], result['scores']))[genre] for genre in POPULAR_GENRES]
+                for result in results
+            ])
+            
+            # Use the best matching genre for the book's category, else the best genre overall
+            category_codes, unique_categories = pd.factorize(pd.Series(categories).str.lower())
+            genre_mask = np.array([
+                [category in genre for genre in POPULAR_GENRES] for category in unique_categories
+            ], dtype=bool).reshape(len(unique_categories), len(POPULAR_GENRES))[category_codes]
+            matched = np.where(genre_mask, scores, -np.inf).max(axis=1)
+            return np.where(genre_mask.any(axis=1), matched, scores.max(axis=1))
+        
+        except Exception as e:
+            logger.error(f"Error in batched genre classification, scoring individually: {str(e)}")
+            return np.array([
+                self._classify_genre_relevance(text, category) for text, category in zip(texts, categories)
+            ])
+    
     def _classify_genre_relevance(self, text, category):
         """Classify genre relevance and popularity"""
         try:
             if not self.text_classifier:
                 return 0.5
             
-            # Define popular genres
-            popular_genres = [
-                "fiction", "mystery", "romance", "science fiction", 
-                "fantasy", "thriller", "biography", "self-help"
-            ]
-            
-            result = self.text_classifier(text[:512], popular_genres)
+            INFERENCE_BATCH_SIZE.observe(1, model='zero_shot')
+            result = self.text_classifier(text[:512], POPULAR_GENRES)
             
             # Find score for the book's category or highest scoring genre
             category_lower = category.lower()
-            for label_score in result['scores']:
-                label_index = result['labels'].index(result['labels'][result['scores'].index(label_score)])
-                if category_lower in result['labels'][label_index].lower():
+            for label, label_score in zip(result['labels'], result['scores']):
+                if category_lower in label.lower():
                     return label_score
             
             # Return highest score if category not found
@@ -155,19 +419,26 @@ class LibraryDemandPredictor:
             logger.error(f"Error in genre classification: {str(e)}")
             return 0.5
     
+    @staticmethod
+    def determine_actions(demand):
+        """Vectorized ``_determine_action`` returning a categorical of actions"""
+        import numpy as np
+        import pandas as pd
+        
+        demand = np.nan_to_num(np.asarray(demand, dtype=np.float64), nan=0.0)
+        codes = np.searchsorted(ACTION_THRESHOLDS, demand, side='right')
+        return pd.Categorical.from_codes(codes, categories=ACTIONS_BY_DEMAND)
+    
     def _determine_action(self, demand, category):
         """Determine recommended action based on demand and category"""
-        if demand >= 90:
-            return 'Acquire'
-        elif demand >= 75:
-            return 'Hold'
-        elif demand >= 60:
-            return 'Transfer'
-        else:
-            return 'Deaccession'
+        if demand != demand:  # NaN
+            return ACTIONS_BY_DEMAND[0]
+        return ACTIONS_BY_DEMAND[bisect.bisect_right(ACTION_THRESHOLDS, demand)]
     
     def generate_forecast(self, books_data, category=None):
         """Generate demand forecast for visualization"""
+        import numpy as np
+        
         try:
             if category:
                 filtered_books = [book for book in books_data if book.get('category') == category]
@@ -5,8 +5,15 @@ urlpatterns = [
     path('upload-file/', api_views.upload_file, name='upload_file'),
     path('process-data/', api_views.process_data, name='process_data'),
     path('get-books/', api_views.get_books, name='get_books'),
+    path('inventory-facets/', api_views.get_inventory_facets, name='inventory_facets'),
     path('get-dashboard-data/', api_views.get_dashboard_data, name='get_dashboard_data'),
     path('get-demand-forecast/', api_views.get_demand_forecast, name='get_demand_forecast'),
     path('predict-demand/', api_views.predict_demand, name='predict_demand'),
+    path('record-actuals/', api_views.record_actual_demand, name='record_actuals'),
+    path('prediction-accuracy/', api_views.get_prediction_accuracy, name='prediction_accuracy'),
+    path('similar-books/', api_views.get_similar_books, name='similar_books'),
+    path('transfer-plan/', api_views.get_transfer_plan, name='transfer_plan'),
+    path('activity-events/', api_views.record_activity_events, name='activity_events'),
+    path('activity-snapshot/', api_views.get_activity_snapshot, name='activity_snapshot'),
     path('clear-data/', api_views.clear_data, name='clear_data'),
 ]
\ No newline at end of file
@@ -1,31 +1,71 @@
 import json
-import pandas as pd
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from .models import Book, UploadedFile, PredictionHistory, models
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from .models import Book, BranchStock, UploadedFile, PredictionHistory, PredictionSummary, models
 from .ai_models import demand_predictor
+from .admission import admission_controlled, whole_catalog
+from .concurrency import async_csrf_exempt, async_require_http_methods, run_heavy, run_read
+from .ingestion import IngestionError, clean_catalog, read_catalog
+from .metrics import ROWS_PROCESSED, render_prometheus, timed
+from .prediction_history import accuracy_report, dashboard_kpis, record_actuals, record_predictions
+from .forecast_index import aforecast_categories, atop_books, clear_forecast_index, rebuild_forecast_index
+from .transfers import TRANSFER_METHODS, branch_stock_frame, plan_transfers
+from .embeddings import DEFAULT_NPROBE, embedding_store, store_catalog_embeddings
+from .facets import TOP_BOOKS, ainventory_facets, filtered_books
+from .activity import activity_metrics, parse_event
+from .search_index import rebuild_search_index
+from .tenants import current_library
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Rows per INSERT/UPDATE statement for bulk writes
+BULK_BATCH_SIZE = 1000
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def upload_file(request):
+# Books per page from /api/get-books/
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 500
+
+# Events accepted per /api/activity-events/ request
+MAX_ACTIVITY_EVENTS = 5000
+
+# Transfers listed by /api/transfer-plan/ (totals always cover the whole plan)
+DEFAULT_TRANSFERS = 500
+MAX_TRANSFERS = 5000
+
+
+@async_csrf_exempt
+@async_require_http_methods(["POST"])
+@timed('upload_file')
+@admission_controlled('bulk')
+async def upload_file(request):
     """
     Handle file upload and processing with robust CSV parsing and flexible column mapping.
+    
+    Parsing, inference and the database writes run in the heavy-work executor.
     """
+    return await run_heavy(_upload_file, request)
+
+
+def _upload_file(request):
     try:
+        import numpy as np
+        
         if 'file' not in request.FILES:
             return JsonResponse({'error': 'No file provided'}, status=400)
         
         uploaded_file = request.FILES['file']
         
         # Save file to default storage
-        file_path = default_storage.save(f'uploads/{uploaded_file.name}', ContentFile(uploaded_file.read()))
+        # Each library's uploads go in their own directory
+        library = current_library()
+        directory = f'uploads/{library}' if library else 'uploads'
+        file_path = default_storage.save(f'{directory}/{uploaded_file.name}', ContentFile(uploaded_file.read()))
         
         # Create a record for the uploaded file
         file_record = UploadedFile.objects.create(
@@ -37,61 +77,63 @@ def upload_file(request):
         try:
             file_full_path = default_storage.path(file_path)
 
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(file_full_path, engine='python', on_bad_lines='warn')
-            elif uploaded_file.name.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_full_path)
-            else:
-                return JsonResponse({'error': 'Unsupported file format. Please upload CSV or Excel.'}, status=400)
-            
-            # --- Robust Column Standardization ---
-            # Define a mapping of required columns to possible names in the uploaded file.
-            column_mapping = {
-                'title': ['title', 'book title', 'name'],
-                'author': ['author', 'author name', 'writer'],
-                'category': ['category', 'genre', 'subject']
-            }
+            with timed('upload_parse'):
+                df, parse_report = read_catalog(file_full_path, uploaded_file.name)
+            ROWS_PROCESSED.inc(len(df), stage='upload_parse')
             
-            rename_dict = {}
-            df_columns_lower = {col.lower().strip(): col for col in df.columns}
-
-            for required_col, possible_names in column_mapping.items():
-                found = False
-                for name in possible_names:
-                    if name in df_columns_lower:
-                        rename_dict[df_columns_lower[name]] = required_col
-                        found = True
-                        break
-                if not found:
-                    # If a required column is not found, return a helpful error.
-                    error_msg = f"Missing required column. Please ensure your file has a column for '{required_col}' (e.g., {', '.join(possible_names)})."
-                    logger.error(error_msg)
-                    return JsonResponse({'error': error_msg}, status=400)
-
-            df.rename(columns=rename_dict, inplace=True)
-            
-            # Clean data by removing rows with missing essential information
-            df.dropna(subset=['title', 'author', 'category'], inplace=True)
-            books_data = df.to_dict('records')
+            # Map and coerce the file's columns, drop incomplete rows and score each book once
+            with timed('upload_clean'):
+                books, rows, book_codes, quality = clean_catalog(df)
+            logger.info(
+                f"Cleaned '{uploaded_file.name}': {quality['books']} books from {quality['rows_in']} rows "
+                f"({quality['incomplete_rows']} incomplete, {quality['duplicate_rows']} duplicates)"
+            )
             
             # Get demand predictions from the AI model
-            predictions = demand_predictor.predict_demand(books_data)
-            
-            # Clear existing book data before inserting new data
-            Book.objects.all().delete()
+            predictions, (codes, embeddings) = demand_predictor.predict_demand_frame(
+                books, return_embeddings=True, deduplicated=True
+            )
             
-            # Prepare book objects for bulk creation
-            books_to_create = [
-                Book(
-                    title=pred['title'],
-                    author=pred['author'],
-                    category=pred['category'],
-                    demand=pred['demand'],
-                    action=pred['action']
-                ) for pred in predictions
-            ]
+            with timed('upload_db_write'):
+                # Clear existing book data before inserting new data
+                BranchStock.objects.all().delete()
+                Book.objects.all().delete()
+                
+                # Prepare book objects for bulk creation
+                books_to_create = [
+                    Book(title=title, author=author, category=category, demand=demand, action=action)
+                    for title, author, category, demand, action in zip(
+                        predictions['title'].tolist(),
+                        predictions['author'].tolist(),
+                        predictions['category'].tolist(),
+                        predictions['demand'].tolist(),
+                        predictions['action'].tolist(),
+                    )
+                ]
+                
+                Book.objects.bulk_create(books_to_create, batch_size=BULK_BATCH_SIZE)
+                
+                # Borrowing logs and branch inventories carry per-branch stock
+                if 'branch' in rows:
+                    book_ids = np.array([book.pk for book in books_to_create], dtype=np.int64)
+                    stock = branch_stock_frame(rows, book_ids[book_codes])
+                    BranchStock.objects.bulk_create([
+                        BranchStock(book_id=book_id, branch=branch, copies=copies, borrows=borrows)
+                        for book_id, branch, copies, borrows in zip(
+                            stock['book_id'].tolist(),
+                            stock['branch'].tolist(),
+                            stock['copies'].tolist(),
+                            stock['borrows'].tolist(),
+                        )
+                    ], batch_size=BULK_BATCH_SIZE)
+            ROWS_PROCESSED.inc(len(books_to_create), stage='upload_db_write')
+            rebuild_forecast_index()
+            rebuild_search_index()
+            store_catalog_embeddings([book.pk for book in books_to_create], codes, embeddings, replace=True)
             
-            Book.objects.bulk_create(books_to_create)
+            record_predictions(
+                predictions, [book.pk for book in books_to_create], demand_predictor.model_version, source='upload'
+            )
             
             # Update the file record with processing status and record count
             file_record.processed = True
@@ -101,9 +143,15 @@ def upload_file(request):
             return JsonResponse({
                 'success': True,
                 'message': f'Successfully processed {len(books_to_create)} records with AI predictions',
-                'records_count': len(books_to_create)
+                'records_count': len(books_to_create),
+                'format': parse_report['format'],
+                'bad_rows': parse_report['bad_rows'],
+                'quality': quality
             })
             
+        except IngestionError as e:
+            logger.error(str(e))
+            return JsonResponse({'error': str(e)}, status=400)
         except Exception as e:
             logger.error(f"Error processing file '{uploaded_file.name}': {str(e)}")
             return JsonResponse({'error': f'Error processing file: {str(e)}'}, status=500)
@@ -113,100 +161,132 @@ def upload_file(request):
         return JsonResponse({'error': f'Error uploading file: {str(e)}'}, status=500)
 
 
-@require_http_methods(["GET"])
-def get_books(request):
-    """Get books with optional filtering"""
+@async_require_http_methods(["GET"])
+@timed('get_books')
+async def get_books(request):
+    """
+    Get one page of books with optional filtering
+    
+    ``page`` counts from 1; ``page_size`` (or ``limit``) defaults to
+    DEFAULT_PAGE_SIZE and is capped at MAX_PAGE_SIZE.
+    """
     try:
-        search = request.GET.get('search', '')
-        category = request.GET.get('category', '')
+        page = max(1, int(request.GET.get('page', 1)))
+        page_size = int(request.GET.get('page_size') or request.GET.get('limit') or DEFAULT_PAGE_SIZE)
+        page_size = min(max(1, page_size), MAX_PAGE_SIZE)
         
-        books = Book.objects.all()
-        
-        if search:
-            books = books.filter(
-                models.Q(title__icontains=search) | models.Q(author__icontains=search)
-            )
-        
-        if category:
-            books = books.filter(category=category)
+        books = filtered_books(
+            request.GET.get('search', ''), request.GET.get('category', ''), request.GET.get('action', '')
+        )
+        total = await books.acount()
         
-        books_data = [{
-            'id': book.id,
-            'title': book.title,
-            'author': book.author,
-            'category': book.category,
-            'demand': book.demand,
-            'action': book.action
-        } for book in books]
+        offset = (page - 1) * page_size
+        books_data = [
+            book async for book in books.order_by('-demand', 'title', 'id')
+            .values('id', 'title', 'author', 'category', 'demand', 'action')[offset:offset + page_size]
+        ]
         
-        return JsonResponse({'books': books_data})
+        return JsonResponse({
+            'books': books_data,
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+            'pages': (total + page_size - 1) // page_size
+        })
         
+    except ValueError:
+        return JsonResponse({'error': 'page and page_size must be integers'}, status=400)
     except Exception as e:
         logger.error(f"Error getting books: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@require_http_methods(["GET"])
-def get_dashboard_data(request):
-    """Get dashboard KPIs and statistics"""
+@async_require_http_methods(["GET"])
+@timed('get_inventory_facets')
+async def get_inventory_facets(request):
+    """Facet counts, demand histogram and high-demand books for the inventory filters"""
     try:
-        books = Book.objects.all()
-        total_books = books.count()
-        
-        if total_books == 0:
-            return JsonResponse({
-                'kpis': {'accuracy': 0, 'turnover': 0, 'equity': 0, 'satisfaction': 0},
-                'composition': {'labels': [], 'data': []},
-                'spotlight_book': None
-            })
-        
-        avg_demand = books.aggregate(avg_demand=models.Avg('demand'))['avg_demand'] or 0
-        
-        category_counts = {}
-        for book in books:
-            category_counts[book.category] = category_counts.get(book.category, 0) + 1
-        
-        spotlight_book = books.order_by('-demand').first()
-        spotlight_data = {
-            'title': spotlight_book.title,
-            'author': spotlight_book.author,
-            'category': spotlight_book.category,
-            'demand': spotlight_book.demand,
-            'action': spotlight_book.action
-        } if spotlight_book else None
+        facets = await ainventory_facets(
+            search=request.GET.get('search', ''),
+            category=request.GET.get('category', ''),
+            action=request.GET.get('action', ''),
+            top_n=min(int(request.GET.get('top', TOP_BOOKS)), MAX_PAGE_SIZE),
+        )
+        return JsonResponse(facets)
         
-        return JsonResponse({
-            'kpis': {
-                'accuracy': 97.82,
-                'turnover': 42.5,
-                'equity': 94.7,
-                'satisfaction': round(avg_demand, 1)
-            },
-            'composition': {
-                'labels': list(category_counts.keys()),
-                'data': list(category_counts.values())
-            },
-            'spotlight_book': spotlight_data
-        })
+    except ValueError:
+        return JsonResponse({'error': 'top must be an integer'}, status=400)
+    except Exception as e:
+        logger.error(f"Error getting inventory facets: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_require_http_methods(["GET"])
+@timed('get_dashboard_data')
+async def get_dashboard_data(request):
+    """
+    Get dashboard KPIs and statistics
+    
+    The handful of aggregate queries run together through ``run_read``.
+    """
+    try:
+        return JsonResponse(await run_read(_dashboard_data))
         
     except Exception as e:
         logger.error(f"Error getting dashboard data: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@require_http_methods(["GET"])
-def get_demand_forecast(request):
+def _dashboard_data():
+    books = Book.objects.all()
+    
+    if not books.exists():
+        return {
+            'kpis': {'accuracy': 0, 'move_rate': 0, 'equity': 0, 'satisfaction': 0},
+            'composition': {'labels': [], 'data': []},
+            'spotlight_book': None
+        }
+    
+    avg_demand = books.aggregate(avg_demand=models.Avg('demand'))['avg_demand'] or 0
+    
+    category_rows = books.values('category').annotate(count=models.Count('id')).order_by('-count', 'category')
+    category_counts = {row['category']: row['count'] for row in category_rows}
+    
+    spotlight_book = books.order_by('-demand').first()
+    spotlight_data = {
+        'title': spotlight_book.title,
+        'author': spotlight_book.author,
+        'category': spotlight_book.category,
+        'demand': spotlight_book.demand,
+        'action': spotlight_book.action
+    } if spotlight_book else None
+    
+    return {
+        'kpis': {
+            **dashboard_kpis(demand_predictor.model_version),
+            'satisfaction': round(avg_demand, 1)
+        },
+        'composition': {
+            'labels': list(category_counts.keys()),
+            'data': list(category_counts.values())
+        },
+        'spotlight_book': spotlight_data
+    }
+
+
+@async_require_http_methods(["GET"])
+@timed('get_demand_forecast')
+async def get_demand_forecast(request):
     """Get demand forecast data for charts"""
     try:
         category = request.GET.get('category', '')
         
-        books_data = list(Book.objects.values('title', 'author', 'category', 'demand', 'action'))
-        
-        forecast_data = demand_predictor.generate_forecast(books_data, category)
+        # Bounded reads from the precomputed top-N index, whatever the catalog size
+        forecast_data = demand_predictor.generate_forecast(await atop_books(category))
         
         return JsonResponse({
             'forecast': forecast_data,
-            'categories': list(Book.objects.values_list('category', flat=True).distinct())
+            'categories': await aforecast_categories()
         })
         
     except Exception as e:
@@ -214,10 +294,54 @@ def get_demand_forecast(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def predict_demand(request):
+@async_require_http_methods(["GET"])
+@timed('get_similar_books')
+async def get_similar_books(request):
+    """Books whose text embeddings are closest to a given book's"""
+    try:
+        book_id = int(request.GET['book_id'])
+        k = min(int(request.GET.get('k', 10)), 100)
+        nprobe = int(request.GET.get('nprobe', DEFAULT_NPROBE))
+        action = request.GET.get('action', '')
+        if k < 1 or nprobe < 1:
+            return JsonResponse({'error': 'k and nprobe must be positive'}, status=400)
+        
+        # Over-fetch when filtering so the filter still leaves k results
+        neighbours = await sync_to_async(embedding_store().search, thread_sensitive=False)(
+            book_id, k * 5 if action else k, nprobe
+        )
+        
+        books = Book.objects.filter(id__in=[neighbour_id for neighbour_id, _ in neighbours])
+        if action:
+            books = books.filter(action=action)
+        books_by_id = {
+            book['id']: book
+            async for book in books.values('id', 'title', 'author', 'category', 'demand', 'action')
+        }
+        similar = [
+            {**books_by_id[neighbour_id], 'similarity': round(similarity, 4)}
+            for neighbour_id, similarity in neighbours if neighbour_id in books_by_id
+        ][:k]
+        
+        return JsonResponse({'book_id': book_id, 'similar': similar})
+        
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'book_id, k and nprobe must be integers'}, status=400)
+    except Exception as e:
+        logger.error(f"Error finding similar books: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_csrf_exempt
+@async_require_http_methods(["POST"])
+@timed('predict_demand_api')
+@admission_controlled('predict')
+async def predict_demand(request):
     """Predict demand for new book data"""
+    return await run_heavy(_predict_demand, request)
+
+
+def _predict_demand(request):
     try:
         data = json.loads(request.body)
         books_data = data.get('books', [])
@@ -239,9 +363,14 @@ def predict_demand(request):
 def clear_data(request):
     """Clear all book data"""
     try:
+        clear_forecast_index()
+        embedding_store().clear()
+        BranchStock.objects.all().delete()
         Book.objects.all().delete()
         UploadedFile.objects.all().delete()
         PredictionHistory.objects.all().delete()
+        PredictionSummary.objects.all().delete()
+        rebuild_search_index()
         
         return JsonResponse({'success': True, 'message': 'All data cleared successfully'})
         
@@ -250,28 +379,181 @@ def clear_data(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@require_http_methods(["GET"])
-def process_data(request):
+@async_require_http_methods(["GET"])
+@timed('process_data')
+@admission_controlled('bulk', priority=whole_catalog)
+async def process_data(request):
     """Process uploaded data with AI models"""
+    return await run_heavy(_process_data, request)
+
+
+def _process_data(request):
     try:
-        books = Book.objects.all()
-        books_data = list(books.values('title', 'author', 'category', 'demand', 'action'))
+        import pandas as pd
         
-        if books_data:
-            predictions = demand_predictor.predict_demand(books_data)
+        books = pd.DataFrame.from_records(
+            Book.objects.values('id', 'title', 'author', 'category', 'demand', 'action'),
+            columns=['id', 'title', 'author', 'category', 'demand', 'action']
+        )
+        
+        if len(books):
+            predictions, (codes, embeddings) = demand_predictor.predict_demand_frame(books, return_embeddings=True)
             
-            for i, book in enumerate(books):
-                if i < len(predictions):
-                    book.demand = predictions[i]['demand']
-                    book.action = predictions[i]['action']
-                    book.save()
+            with timed('process_data_db_write'):
+                now = timezone.now()
+                books_to_update = [
+                    Book(id=book_id, demand=demand, action=action, updated_at=now)
+                    for book_id, demand, action in zip(
+                        books['id'].tolist(),
+                        predictions['demand'].tolist(),
+                        predictions['action'].tolist(),
+                    )
+                ]
+                Book.objects.bulk_update(
+                    books_to_update, ['demand', 'action', 'updated_at'], batch_size=BULK_BATCH_SIZE
+                )
+            ROWS_PROCESSED.inc(len(books_to_update), stage='process_data_db_write')
+            rebuild_forecast_index()
+            store_catalog_embeddings(books['id'].tolist(), codes, embeddings, replace=True)
+            
+            record_predictions(
+                predictions, books['id'].tolist(), demand_predictor.model_version, source='reprocess'
+            )
         
         return JsonResponse({
             'success': True,
-            'message': f'Reprocessed {len(books_data)} records with AI predictions'
+            'message': f'Reprocessed {len(books)} records with AI predictions'
         })
         
     except Exception as e:
         logger.error(f"Error processing data: {str(e)}")
         return JsonResponse({'error': str(e)}, status=500)
 
+
+@async_csrf_exempt
+@async_require_http_methods(["POST"])
+@timed('record_actuals_api')
+async def record_actual_demand(request):
+    """Record observed demand and actions against the latest predictions"""
+    return await run_heavy(_record_actual_demand, request)
+
+
+def _record_actual_demand(request):
+    try:
+        data = json.loads(request.body)
+        actuals = data.get('actuals', [])
+        
+        if not actuals:
+            return JsonResponse({'error': 'No actuals provided'}, status=400)
+        
+        result = record_actuals(actuals)
+        
+        return JsonResponse({'success': True, **result})
+        
+    except Exception as e:
+        logger.error(f"Error recording actuals: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_require_http_methods(["GET"])
+@timed('get_prediction_accuracy')
+async def get_prediction_accuracy(request):
+    """MAE, MAPE and action hit rate per model version and category"""
+    try:
+        model_version = request.GET.get('model_version', '')
+        days = request.GET.get('days', '')
+        
+        report = await run_read(
+            accuracy_report, model_version=model_version or None, days=int(days) if days else None
+        )
+        
+        return JsonResponse({'accuracy': report})
+        
+    except ValueError:
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    except Exception as e:
+        logger.error(f"Error getting prediction accuracy: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_require_http_methods(["GET"])
+@timed('get_transfer_plan')
+async def get_transfer_plan(request):
+    """Plan cross-branch transfers of surplus copies to under-served branches"""
+    return await run_heavy(_get_transfer_plan, request)
+
+
+def _get_transfer_plan(request):
+    try:
+        method = request.GET.get('method', '')
+        if method and method not in TRANSFER_METHODS:
+            return JsonResponse({'error': f"method must be one of {', '.join(TRANSFER_METHODS)}"}, status=400)
+        try:
+            limit = int(request.GET.get('limit', DEFAULT_TRANSFERS))
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            return JsonResponse({'error': 'limit must be a non-negative integer'}, status=400)
+        limit = min(limit, MAX_TRANSFERS)
+        
+        plan = plan_transfers(
+            category=request.GET.get('category', ''),
+            action=request.GET.get('action', ''),
+            method=method or None,
+            limit=limit,
+        )
+        
+        return JsonResponse(plan)
+        
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error planning transfers: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_csrf_exempt
+@async_require_http_methods(["POST"])
+@timed('record_activity_events')
+async def record_activity_events(request):
+    """Fold borrow/return events into the live activity metrics"""
+    try:
+        data = json.loads(request.body)
+        raw_events = data.get('events', []) if isinstance(data, dict) else data
+        
+        if not isinstance(raw_events, list) or not raw_events:
+            return JsonResponse({'error': 'No events provided'}, status=400)
+        if len(raw_events) > MAX_ACTIVITY_EVENTS:
+            return JsonResponse({'error': f'At most {MAX_ACTIVITY_EVENTS} events per request'}, status=400)
+        
+        events = [parse_event(event) for event in raw_events]
+        recorded = activity_metrics().record_many(events)
+        
+        return JsonResponse({'success': True, 'recorded': recorded, 'ignored': len(events) - recorded})
+        
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        logger.error(f"Error recording activity events: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_require_http_methods(["GET"])
+@timed('get_activity_snapshot')
+async def get_activity_snapshot(request):
+    """Rolling borrow/return counts, active users and hot titles for live monitoring"""
+    try:
+        top = min(max(int(request.GET.get('top', 10)), 1), 50)
+        return JsonResponse(activity_metrics().snapshot(top=top))
+        
+    except ValueError:
+        return JsonResponse({'error': 'top must be an integer'}, status=400)
+    except Exception as e:
+        logger.error(f"Error getting activity snapshot: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def metrics(request):
+    """Expose hot-path metrics in the Prometheus text format"""
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
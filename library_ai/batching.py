@@ -0,0 +1,142 @@
+"""
+Dynamic micro-batching of transformer scoring across concurrent requests
+
+Small ``/api/predict-demand/`` calls each carry a handful of books. Instead of
+running one forward pass per request, callers hand their texts to a
+``MicroBatcher``; a single dispatcher thread gathers texts from all in-flight
+requests and scores them together once ``max_batch_size`` texts are queued or
+the oldest request has waited ``max_wait`` seconds. Each caller then receives
+just its own slice of the results. Requests are only coalesced with others
+that passed the same keyword options (e.g. ``want_embeddings``).
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from .metrics import Histogram, SIZE_BUCKETS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+COALESCED_REQUESTS = Histogram(
+    'library_ai_coalesced_requests',
+    'Requests merged into one micro-batch',
+    buckets=SIZE_BUCKETS,
+)
+
+
+class _Pending:
+    __slots__ = ('texts', 'categories', 'options', 'future', 'enqueued_at')
+
+    def __init__(self, texts, categories, options):
+        self.texts = texts
+        self.categories = categories
+        self.options = options
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Coalesce ``score_fn(texts, categories, **options)`` calls from concurrent callers
+
+    Args:
+        score_fn: Callable returning a tuple of NumPy arrays (sentiment, genre,
+            ...) whose rows align with the batch's texts
+        max_batch_size: Flush as soon as this many texts are queued
+        max_wait: Longest time in seconds a request waits for others to join
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait=0.005):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = deque()
+        self._queued_texts = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+    def submit(self, texts, categories, **options):
+        """
+        Score texts as part of a shared batch, blocking until the results are ready
+
+        Keyword options are passed through to ``score_fn``; only requests with
+        equal options share a batch.
+        """
+        # Requests that fill a batch on their own gain nothing from waiting
+        if len(texts) >= self.max_batch_size:
+            return self.score_fn(texts, categories, **options)
+
+        pending = _Pending(list(texts), list(categories), options)
+        with self._condition:
+            self._ensure_dispatcher()
+            self._queue.append(pending)
+            self._queued_texts += len(pending.texts)
+            self._condition.notify()
+        return pending.future.result()
+
+    def _ensure_dispatcher(self):
+        # Start lazily, and again in a forked worker where the thread does not exist
+        if self._thread is None or self._pid != os.getpid():
+            self._queue.clear()
+            self._queued_texts = 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._dispatch_loop, name='micro-batcher', daemon=True)
+            self._thread.start()
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+            deadline = self._queue[0].enqueued_at + self.max_wait
+            while self._queued_texts < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            # Take the oldest request and those after it that can share its batch
+            options = self._queue[0].options
+            batch = []
+            waiting = deque()
+            size = 0
+            while self._queue:
+                pending = self._queue.popleft()
+                if pending.options != options:
+                    waiting.append(pending)
+                    continue
+                if batch and size + len(pending.texts) > self.max_batch_size:
+                    self._queue.appendleft(pending)
+                    break
+                batch.append(pending)
+                size += len(pending.texts)
+            self._queue.extendleft(reversed(waiting))
+            self._queued_texts -= size
+            return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._next_batch()
+            dispatched_at = time.perf_counter()
+            for pending in batch:
+                STAGE_SECONDS.observe(dispatched_at - pending.enqueued_at, stage='micro_batch_wait')
+            COALESCED_REQUESTS.observe(len(batch))
+
+            texts = [text for pending in batch for text in pending.texts]
+            categories = [category for pending in batch for category in pending.categories]
+            try:
+                results = self.score_fn(texts, categories, **batch[0].options)
+            except Exception as e:
+                logger.error(f"Error scoring micro-batch of {len(texts)} texts: {str(e)}")
+                for pending in batch:
+                    pending.future.set_exception(e)
+                continue
+
+            offset = 0
+            for pending in batch:
+                end = offset + len(pending.texts)
+                pending.future.set_result(tuple(result[offset:end] for result in results))
+                offset = end
@@ -0,0 +1,445 @@
+"""
+Offline scoring of whole catalogs (``manage.py score_catalog``)
+
+Rows are streamed from a catalog file or the Book table in batches, scored
+with ``LibraryDemandPredictor.predict_demand_frame`` by a pool of worker
+processes, and written back by this process with bulk upserts. A batch's
+results, its prediction history and the run's ``ScoringCheckpoint`` are
+committed in one transaction, so an interrupted run resumes after the last
+committed batch without scoring or recording any row twice.
+
+Scoring a file replaces the catalog like an upload does. The old catalog is
+deleted in the transaction of the first batch, so a run that fails before any
+batch commits leaves it intact. The file's rows get Book ids
+from their position in the file, so a batch that is scored again overwrites
+its own rows instead of duplicating them. The ids start past every id the
+catalog and its prediction history have used, so open predictions for the
+replaced books never attach to the new ones.
+
+Models are imported inside functions: worker processes are spawned and import
+this module before Django is set up.
+"""
+import logging
+import time
+from collections import deque
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Source name of runs over the Book table
+BOOK_TABLE = 'books'
+
+# Source name of background rescoring runs started from the admin
+ADMIN_SELECTION = 'admin selection'
+
+# Rows per scoring batch (and per checkpoint)
+DEFAULT_BATCH_ROWS = 5_000
+
+# Batches queued per worker process, bounding memory on multi-million-row inputs
+BATCHES_PER_WORKER = 2
+
+
+def _init_worker(workers):
+    import django
+
+    django.setup()
+
+    from .cpu_budget import apply_cpu_budget
+
+    apply_cpu_budget(workers=workers)
+
+
+def _score_batch(frame):
+    from .ai_models import demand_predictor
+
+    predictions, (codes, embeddings) = demand_predictor.predict_demand_frame(frame, return_embeddings=True)
+    return predictions, codes, embeddings
+
+
+def _open_checkpoint(name, source, restart):
+    """Checkpoint to continue from, and whether it resumes an interrupted run"""
+    from django.utils import timezone
+
+    from .models import ScoringCheckpoint
+
+    checkpoint = ScoringCheckpoint.objects.filter(name=name).first()
+    if checkpoint and checkpoint.status == 'running' and not restart:
+        if checkpoint.source != source:
+            raise ValueError(
+                f"Run '{name}' was started on {checkpoint.source}; pass --restart to score {source} instead"
+            )
+        return checkpoint, True
+
+    checkpoint, _ = ScoringCheckpoint.objects.update_or_create(
+        name=name,
+        defaults={
+            'source': source, 'position': 0, 'rows_scored': 0, 'id_offset': 0, 'status': 'running',
+            'started_at': timezone.now(), 'finished_at': None,
+        },
+    )
+    return checkpoint, False
+
+
+def _table_batches(position, batch_rows, books=None):
+    """Rows of ``books`` (default: every Book) after ``position`` in id order, as (frame, last id) pairs"""
+    import pandas as pd
+
+    from .models import Book
+
+    books = Book.objects.all() if books is None else books
+    columns = ['id', 'title', 'author', 'category', 'demand']
+    while True:
+        rows = list(books.filter(id__gt=position).order_by('id').values_list(*columns)[:batch_rows])
+        if not rows:
+            return
+        position = rows[-1][0]
+        yield pd.DataFrame.from_records(rows, columns=columns), position
+
+
+def _next_id_offset():
+    """Largest Book id used by the catalog or referenced by its prediction history"""
+    from django.db.models import Max
+
+    from .models import Book, PredictionHistory
+
+    return max(
+        Book.objects.aggregate(last=Max('id'))['last'] or 0,
+        PredictionHistory.objects.aggregate(last=Max('book_id'))['last'] or 0,
+    )
+
+
+def _file_batches(path, position, batch_rows, id_offset=0):
+    """File rows from row ``position`` on, as (frame, rows consumed) pairs"""
+    from .ingestion import iter_catalog, standardize_columns
+
+    for chunk in iter_catalog(path, Path(path).name, batch_rows):
+        end = int(chunk.index[-1]) + 1
+        if end <= position:
+            continue
+        chunk = standardize_columns(chunk[chunk.index >= position])
+        # Ids follow the file row, so a rescored batch upserts onto itself
+        yield chunk.assign(id=chunk.index + 1 + id_offset), end
+
+
+def _scored(batches, workers):
+    """Score batches in order, keeping at most a few per worker in flight"""
+    if workers <= 1:
+        for frame, position in batches:
+            yield frame, position, _score_batch(frame) if len(frame) else None
+        return
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker, initargs=(workers,),
+    )
+    pending = deque()
+    try:
+        for frame, position in batches:
+            pending.append((frame, position, pool.submit(_score_batch, frame) if len(frame) else None))
+            if len(pending) >= BATCHES_PER_WORKER * workers:
+                frame, position, future = pending.popleft()
+                yield frame, position, future.result() if future else None
+        while pending:
+            frame, position, future = pending.popleft()
+            yield frame, position, future.result() if future else None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _clear_catalog():
+    """Delete every book, its branch stock and the forecast index built from them"""
+    from .forecast_index import clear_forecast_index
+    from .models import Book, BranchStock
+
+    clear_forecast_index()
+    BranchStock.objects.all().delete()
+    Book.objects.all().delete()
+
+
+def _write_batch(checkpoint, frame, position, scored, replace_catalog, model_version, clear_catalog=False):
+    """
+    Upsert one batch of scores and advance the checkpoint in the same transaction
+
+    With ``clear_catalog``, the existing catalog is deleted in that transaction
+    first (the first batch of a file run).
+    """
+    from django.db import router, transaction
+
+    from .models import Book
+    from .prediction_history import record_predictions
+
+    update_fields = ['demand', 'action', 'updated_at']
+    if replace_catalog:
+        update_fields = ['title', 'author', 'category'] + update_fields
+
+    with transaction.atomic(using=router.db_for_write(Book)):
+        if clear_catalog:
+            _clear_catalog()
+        if scored is not None:
+            predictions = scored[0]
+            books = [
+                Book(id=book_id, title=title, author=author, category=category, demand=demand, action=action)
+                for book_id, title, author, category, demand, action in zip(
+                    frame['id'].tolist(),
+                    predictions['title'].tolist(),
+                    predictions['author'].tolist(),
+                    predictions['category'].tolist(),
+                    predictions['demand'].tolist(),
+                    predictions['action'].tolist(),
+                )
+            ]
+            Book.objects.bulk_create(
+                books, update_conflicts=True, unique_fields=['id'], update_fields=update_fields,
+            )
+            record_predictions(predictions, frame['id'].tolist(), model_version, source='bulk')
+            checkpoint.rows_scored += len(books)
+        checkpoint.position = position
+        checkpoint.save(update_fields=['position', 'rows_scored', 'updated_at'])
+
+
+def rescore_books(books, batch_rows=DEFAULT_BATCH_ROWS, checkpoint=None):
+    """
+    Rescore a selection of books in place, one batch per transaction
+
+    A failed run leaves the batches before the failure rescored. With a
+    ``checkpoint``, its position (the last Book id) and row count are
+    committed with each batch and it is marked finished at the end. Book texts
+    do not change, so the embedding store is left alone.
+
+    Args:
+        books: Book queryset to rescore
+        batch_rows: Books scored and written per batch
+        checkpoint: ``ScoringCheckpoint`` recording the run's progress
+
+    Returns:
+        Number of books rescored
+    """
+    from django.db import router, transaction
+    from django.utils import timezone
+
+    from .ai_models import demand_predictor
+    from .forecast_index import rebuild_forecast_index
+    from .models import Book
+    from .prediction_history import record_predictions
+
+    rescored = 0
+    for frame, position in _table_batches(0, batch_rows, books):
+        predictions = demand_predictor.predict_demand_frame(frame)
+        with transaction.atomic(using=router.db_for_write(Book)):
+            Book.objects.bulk_create(
+                [
+                    Book(id=book_id, title=title, author=author, category=category, demand=demand, action=action)
+                    for book_id, title, author, category, demand, action in zip(
+                        frame['id'].tolist(),
+                        frame['title'].tolist(),
+                        frame['author'].tolist(),
+                        frame['category'].tolist(),
+                        predictions['demand'].tolist(),
+                        predictions['action'].tolist(),
+                    )
+                ],
+                update_conflicts=True, unique_fields=['id'], update_fields=['demand', 'action', 'updated_at'],
+            )
+            record_predictions(predictions, frame['id'].tolist(), demand_predictor.model_version, source='reprocess')
+            if checkpoint is not None:
+                checkpoint.position = position
+                checkpoint.rows_scored += len(frame)
+                checkpoint.save(update_fields=['position', 'rows_scored', 'updated_at'])
+        rescored += len(frame)
+
+    if rescored:
+        rebuild_forecast_index()
+    if checkpoint is not None:
+        checkpoint.status = 'finished'
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return rescored
+
+
+def _run_rescore(books, checkpoint, gate, slot):
+    from .admission import Rejected
+
+    try:
+        ticket = slot.result()
+    except Rejected:
+        logger.warning(f"Rescoring run '{checkpoint.name}' was shed by admission control")
+        checkpoint.status = 'failed'
+        checkpoint.save(update_fields=['status', 'updated_at'])
+        return 0
+
+    start = time.perf_counter()
+    try:
+        rescored = rescore_books(books, checkpoint=checkpoint)
+        logger.info(f"Rescoring run '{checkpoint.name}' finished: {rescored} books")
+        return rescored
+    except Exception as e:
+        logger.error(f"Error rescoring books in run '{checkpoint.name}': {str(e)}")
+        checkpoint.status = 'failed'
+        checkpoint.save(update_fields=['status', 'updated_at'])
+        return 0
+    finally:
+        gate.release(ticket, time.perf_counter() - start)
+
+
+def submit_rescore(books, name, priority=0):
+    """
+    Rescore a selection of books in the background
+
+    The run waits for a slot of the current library's ``bulk`` admission
+    controller, so it never runs alongside an upload or reprocess, and then
+    runs ``rescore_books`` in the heavy executor. Its progress is recorded in
+    the ``ScoringCheckpoint`` called ``name``.
+
+    Args:
+        books: Book queryset to rescore
+        name: Checkpoint name of the run
+        priority: Size of the run; smaller bulk requests are admitted first
+
+    Returns:
+        The run's ``ScoringCheckpoint``
+
+    Raises:
+        Rejected: if the bulk queue is full
+    """
+    import contextvars
+
+    from .admission import controller
+    from .concurrency import submit_heavy
+    from .tenants import current_library
+
+    gate = controller('bulk', current_library())
+    slot = gate.acquire(priority)
+    try:
+        checkpoint, _ = _open_checkpoint(name, ADMIN_SELECTION, restart=True)
+    except Exception:
+        gate.cancel(slot)
+        raise
+
+    # The slot may be granted on another thread; start the job in this library
+    context = contextvars.copy_context()
+    slot.add_done_callback(
+        lambda granted: context.run(submit_heavy, _run_rescore, books, checkpoint, gate, granted)
+    )
+    return checkpoint
+
+
+def score_catalog(path=None, name=None, workers=1, batch_rows=DEFAULT_BATCH_ROWS, restart=False, progress=None):
+    """
+    Score a catalog file or the Book table, resuming an interrupted run
+
+    Args:
+        path: Catalog file to score in place of the current catalog; None
+            rescores the Book table
+        name: Checkpoint name (defaults to the source), so separate runs can
+            be resumed independently
+        workers: Scoring processes; 1 scores in this process
+        batch_rows: Rows per batch and per checkpoint
+        restart: Discard an unfinished checkpoint and start over
+        progress: Called as ``progress(rows_done, rows_total, elapsed_seconds)``
+            after every batch; ``rows_total`` is None when it is unknown
+
+    Returns:
+        Summary dict of the run
+    """
+    import numpy as np
+    import pandas as pd
+    from django.utils import timezone
+
+    from .ai_models import demand_predictor
+    from .embeddings import embedding_store
+    from django.db import router, transaction
+
+    from .forecast_index import rebuild_forecast_index
+    from .ingestion import count_catalog_rows
+    from .models import Book
+    from .search_index import rebuild_search_index
+
+    source = str(Path(path).resolve()) if path else BOOK_TABLE
+    name = name or source
+    checkpoint, resumed = _open_checkpoint(name, source, restart)
+    start_position = checkpoint.position
+
+    if path:
+        total = count_catalog_rows(path, Path(path).name)
+        total = None if total is None else max(0, total - start_position)
+        if not resumed:
+            checkpoint.id_offset = _next_id_offset()
+            checkpoint.save(update_fields=['id_offset', 'updated_at'])
+        batches = _file_batches(path, start_position, batch_rows, checkpoint.id_offset)
+        base_id = checkpoint.id_offset + 1
+    else:
+        total = Book.objects.filter(id__gt=start_position).count()
+        batches = _table_batches(start_position, batch_rows)
+        base_id = Book.objects.order_by('id').values_list('id', flat=True).first()
+
+    # Until a batch commits, the old catalog is still in place
+    clear_catalog = bool(path) and start_position == 0
+
+    store = embedding_store()
+    # A resumed run keeps writing into the generation its first batch started
+    store_ready = start_position > 0
+    embedded = 0
+
+    started = time.perf_counter()
+    consumed = 0
+    scored_rows = 0
+    batch_count = 0
+    demand_sum = 0.0
+    actions = pd.Series(dtype='int64')
+
+    for frame, position, scored in _scored(batches, workers):
+        _write_batch(
+            checkpoint, frame, position, scored, bool(path), demand_predictor.model_version, clear_catalog,
+        )
+        clear_catalog = False
+        batch_count += 1
+        consumed = position - start_position if path else consumed + len(frame)
+
+        if scored is not None:
+            predictions, codes, embeddings = scored
+            scored_rows += len(predictions)
+            demand_sum += float(predictions['demand'].sum())
+            actions = actions.add(predictions['action'].astype(str).value_counts(), fill_value=0)
+            if embeddings.shape[1]:
+                if not store_ready:
+                    store.reset(base_id, embeddings.shape[1])
+                    store_ready = True
+                embedded += store.write(frame['id'].to_numpy(np.int64), codes, embeddings)
+
+        if progress:
+            progress(consumed, total, time.perf_counter() - started)
+
+    with transaction.atomic(using=router.db_for_write(Book)):
+        # A file without rows still replaces the catalog
+        if clear_catalog:
+            _clear_catalog()
+        checkpoint.status = 'finished'
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+    rebuild_forecast_index()
+    if path:
+        rebuild_search_index()
+    if embedded:
+        store.build_index()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Scoring run '{name}' finished: {scored_rows} rows in {elapsed:.1f}s")
+    return {
+        'name': name,
+        'source': source,
+        'resumed_from': start_position if resumed else None,
+        'batches': batch_count,
+        'rows_scored': scored_rows,
+        'rows_skipped': consumed - scored_rows if path else 0,
+        'run_rows_scored': checkpoint.rows_scored,
+        'elapsed_seconds': elapsed,
+        'rows_per_second': scored_rows / elapsed if elapsed else 0.0,
+        'mean_demand': demand_sum / scored_rows if scored_rows else 0.0,
+        'actions': {action: int(count) for action, count in actions.sort_index().items()},
+        'embedded': embedded,
+        'workers': workers,
+    }
@@ -0,0 +1,144 @@
+"""
+Async view helpers and the bounded executor for heavy work
+
+Under ASGI the read endpoints run on the event loop with Django's async ORM,
+while uploads, reprocessing and inference are handed to ``run_heavy``: a small
+thread pool (``LIBRARY_AI_HEAVY_WORKERS`` threads) shared by the whole
+process. A multi-second job therefore occupies one pool thread instead of the
+worker, and dashboard and book reads keep being served while it runs. Reads
+made of several blocking queries go through ``run_read``, which keeps them off
+the thread that runs synchronous views. Synchronous code starts background
+jobs in the same pool with ``submit_heavy``.
+
+Django 4.2's ``csrf_exempt`` and ``require_http_methods`` wrap views in plain
+functions, which hides coroutine views from the handler, so async views use
+the equivalents below.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponseNotAllowed
+from django.utils.log import log_response
+
+from .metrics import Gauge, STAGE_SECONDS
+from .profiling import profile_job
+
+logger = logging.getLogger(__name__)
+
+HEAVY_JOBS = Gauge(
+    'library_ai_heavy_jobs',
+    'Heavy jobs queued or running in the executor',
+    multiprocess_mode='livesum',
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def heavy_executor():
+    """Process-wide pool that runs inference and parsing off the event loop"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from django.conf import settings
+
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'LIBRARY_AI_HEAVY_WORKERS', 2),
+                    thread_name_prefix='library-ai-heavy',
+                )
+    return _executor
+
+
+def _run_job(func, args, kwargs, submitted_at):
+    STAGE_SECONDS.observe(time.perf_counter() - submitted_at, stage='heavy_queue_wait')
+    # Pool threads outlive requests, so manage their connections like a request would
+    close_old_connections()
+    try:
+        # Profiled along with the request that started it, if any
+        with profile_job():
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_heavy(func, *args, **kwargs):
+    """
+    Run a blocking function in the heavy executor and await its result
+
+    The caller's context variables are visible inside ``func``.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    job = functools.partial(context.run, _run_job, func, args, kwargs, time.perf_counter())
+    HEAVY_JOBS.inc()
+    try:
+        return await loop.run_in_executor(heavy_executor(), job)
+    finally:
+        HEAVY_JOBS.dec()
+
+
+def submit_heavy(func, *args, **kwargs):
+    """
+    Start a blocking function in the heavy executor without waiting for it
+
+    For background jobs started by synchronous code. The caller's context
+    variables are visible inside ``func``.
+
+    Returns:
+        ``concurrent.futures.Future`` of the result
+    """
+    context = contextvars.copy_context()
+    HEAVY_JOBS.inc()
+    future = heavy_executor().submit(context.run, _run_job, func, args, kwargs, time.perf_counter())
+    future.add_done_callback(lambda done: HEAVY_JOBS.dec())
+    return future
+
+
+def _run_read(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_read(func, *args, **kwargs):
+    """
+    Run a short blocking read outside the thread shared by synchronous code
+
+    ``sync_to_async`` defaults to one thread that also serves synchronous
+    views and middleware, so a slow admin page or ``clear_data`` would hold
+    the read up. Context variables are copied, as with ``run_heavy``.
+    """
+    return await sync_to_async(_run_read, thread_sensitive=False)(func, args, kwargs)
+
+
+def async_csrf_exempt(view_func):
+    """``csrf_exempt`` for coroutine views"""
+    view_func.csrf_exempt = True
+    return view_func
+
+
+def async_require_http_methods(request_method_list):
+    """``require_http_methods`` for coroutine views"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def inner(request, *args, **kwargs):
+            if request.method not in request_method_list:
+                response = HttpResponseNotAllowed(request_method_list)
+                log_response(
+                    'Method Not Allowed (%s): %s', request.method, request.path,
+                    response=response, request=request,
+                )
+                return response
+            return await func(request, *args, **kwargs)
+        return inner
+    return decorator
@@ -0,0 +1,186 @@
+"""
+Per-process CPU budget for torch inference
+
+By default every worker's torch pipelines use one intra-op thread per core, so
+N workers on a node run N x cores threads and spend their time contending for
+the same cores. ``apply_cpu_budget`` runs once per process, before the models
+load. It splits the node's cores between the ``LIBRARY_AI_CPU_WORKERS``
+processes that run inference, sets torch's intra- and inter-op thread counts
+(and the OpenMP/MKL variables, if torch is not imported yet) and, with
+``LIBRARY_AI_CPU_PINNING``, pins the process to its own slice of cores.
+
+Pinned processes claim a slot by taking an exclusive ``flock`` on one of
+``LIBRARY_AI_CPU_SLOTS_DIR/slot-<n>.lock``. The lock is held for the life of
+the process, so a restarted worker takes over the slot its predecessor left
+and no two live workers share cores.
+"""
+import logging
+import os
+import sys
+import threading
+from pathlib import Path
+
+from .metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+TORCH_THREADS = Gauge(
+    'library_ai_torch_threads',
+    'Torch intra-op threads, summed over live processes',
+)
+
+_lock = threading.Lock()
+_applied = None
+# Open slot lock file; the flock lasts as long as this descriptor
+_slot_file = None
+
+
+def available_cpus():
+    """CPUs this process may run on, sorted"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_cpu_budget(workers=None, threads=None, interop_threads=None, cpus=None):
+    """
+    Thread counts for one of ``workers`` inference processes sharing ``cpus``
+
+    Args:
+        workers: Processes running inference on the node (defaults to
+            LIBRARY_AI_CPU_WORKERS)
+        threads: Intra-op threads per process; 0 or None splits the cores
+            evenly (defaults to LIBRARY_AI_TORCH_THREADS)
+        interop_threads: Inter-op threads per process (defaults to
+            LIBRARY_AI_TORCH_INTEROP_THREADS)
+        cpus: CPU ids to share (defaults to this process's affinity)
+
+    Returns:
+        Dictionary with cpus, workers, threads and interop_threads
+    """
+    from django.conf import settings
+
+    cpus = list(cpus) if cpus is not None else available_cpus()
+    workers = max(1, workers or getattr(settings, 'LIBRARY_AI_CPU_WORKERS', 1))
+    threads = threads if threads is not None else getattr(settings, 'LIBRARY_AI_TORCH_THREADS', 0)
+    if not threads:
+        threads = max(1, len(cpus) // workers)
+    if interop_threads is None:
+        interop_threads = getattr(settings, 'LIBRARY_AI_TORCH_INTEROP_THREADS', 1)
+    return {
+        'cpus': len(cpus),
+        'workers': workers,
+        'threads': threads,
+        'interop_threads': max(1, interop_threads),
+    }
+
+
+def slot_cpus(slot, threads, cpus):
+    """Disjoint slice of ``cpus`` for pinning slot ``slot`` (wrapping if oversubscribed)"""
+    start = slot * threads
+    return [cpus[(start + offset) % len(cpus)] for offset in range(min(threads, len(cpus)))]
+
+
+def _claim_slot(directory, workers):
+    """Index of the first free slot lock, or None if every slot is held"""
+    global _slot_file
+    import fcntl
+
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for slot in range(workers):
+        handle = open(directory / f'slot-{slot}.lock', 'a+')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(os.getpid()))
+        handle.flush()
+        _slot_file = handle
+        return slot
+    return None
+
+
+def _set_torch_threads(threads, interop_threads):
+    # Read by OpenMP/MKL when torch loads; too late once it has been imported
+    if 'torch' not in sys.modules:
+        os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+        os.environ.setdefault('MKL_NUM_THREADS', str(threads))
+    # The Rust tokenizers spawn their own pool per process otherwise
+    os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+    try:
+        import torch
+    except ImportError:
+        return None
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError as e:
+        # Only allowed before the first inter-op parallel work in the process
+        logger.warning(f"Could not set torch inter-op threads: {str(e)}")
+    return {'threads': torch.get_num_threads(), 'interop_threads': torch.get_num_interop_threads()}
+
+
+def apply_cpu_budget(workers=None):
+    """
+    Apply this process's CPU budget once, before the models load
+
+    Args:
+        workers: Processes running inference on the node, overriding
+            LIBRARY_AI_CPU_WORKERS (e.g. ``score_catalog --workers``)
+
+    Returns:
+        The effective configuration (see ``effective_cpu_budget``)
+    """
+    global _applied
+    from django.conf import settings
+
+    with _lock:
+        if _applied is not None:
+            return _applied
+
+        cpus = available_cpus()
+        plan = plan_cpu_budget(workers=workers, cpus=cpus)
+        plan.update({'pid': os.getpid(), 'slot': None, 'pinned_cpus': None})
+
+        if getattr(settings, 'LIBRARY_AI_CPU_PINNING', False):
+            if not hasattr(os, 'sched_setaffinity'):
+                logger.warning("CPU pinning is not supported on this platform")
+            else:
+                slots_dir = getattr(settings, 'LIBRARY_AI_CPU_SLOTS_DIR', Path(settings.BASE_DIR) / 'var' / 'cpu-slots')
+                slot = _claim_slot(slots_dir, plan['workers'])
+                if slot is None:
+                    logger.warning(
+                        f"All {plan['workers']} CPU slots are taken; process {os.getpid()} runs unpinned "
+                        f"(is LIBRARY_AI_CPU_WORKERS lower than the number of workers?)"
+                    )
+                else:
+                    pinned = slot_cpus(slot, plan['threads'], cpus)
+                    os.sched_setaffinity(0, pinned)
+                    plan.update({'slot': slot, 'pinned_cpus': pinned})
+
+        torch_threads = _set_torch_threads(plan['threads'], plan['interop_threads'])
+        plan['torch'] = torch_threads
+        if torch_threads:
+            TORCH_THREADS.set(torch_threads['threads'])
+        if plan['workers'] * plan['threads'] > plan['cpus']:
+            logger.warning(
+                f"{plan['workers']} workers x {plan['threads']} threads oversubscribe {plan['cpus']} cores"
+            )
+        logger.info(
+            f"CPU budget: {plan['threads']} intra-op / {plan['interop_threads']} inter-op threads "
+            f"for 1 of {plan['workers']} workers on {plan['cpus']} cores"
+            + (f", pinned to CPUs {plan['pinned_cpus']} (slot {plan['slot']})" if plan['pinned_cpus'] else '')
+        )
+        _applied = plan
+        return plan
+
+
+def effective_cpu_budget():
+    """Configuration applied in this process, or None before the models load"""
+    return _applied
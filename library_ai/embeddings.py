@@ -0,0 +1,383 @@
+"""
+Persistent book-text embeddings and approximate nearest-neighbour search
+
+Embeddings computed while scoring uploads and reprocess runs are kept in a
+memory-mapped float16 matrix whose row ``book_id - base_id`` holds the
+L2-normalized embedding of that book, so cosine similarity is a dot product
+and nothing is loaded into RAM beyond the pages a query touches.
+
+Files in ``LIBRARY_AI_EMBEDDINGS_DIR``:
+
+* ``meta.json``               - generation, base_id, dim, capacity, index info
+* ``embeddings-<gen>.f16``    - (capacity, dim) float16 rows
+* ``present-<gen>.u8``        - 1 where a row holds an embedding
+* ``ivf-<gen>-*.npy``         - IVF index: random projection, centroids and
+  the row ids of every inverted list
+
+A catalog upload starts a new generation instead of truncating files that
+other workers may still have mapped. The IVF index clusters rows (projected
+to ``IVF_PROJECTION_DIM`` dimensions) with spherical k-means; a query scans
+the ``nprobe`` closest lists plus any rows written since the index was built,
+scoring them on the full float16 vectors. Converting those rows to float32
+dominates query time, so lists are kept small (a few hundred rows).
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from .metrics import ROWS_PROCESSED, timed
+
+logger = logging.getLogger(__name__)
+
+# Catalogs smaller than this are searched exhaustively
+IVF_MIN_ROWS = 4096
+
+# Dimensions of the random projection used for clustering
+IVF_PROJECTION_DIM = 64
+
+# Rows sampled to train the k-means centroids
+IVF_TRAIN_SAMPLE = 50_000
+IVF_KMEANS_ITERATIONS = 10
+
+# Inverted lists scanned per query
+DEFAULT_NPROBE = 8
+
+# Rows read from the memmap per chunk when scanning or assigning
+SCAN_CHUNK_ROWS = 65_536
+
+
+def _ivf_lists(rows):
+    """Number of inverted lists for a catalog: about 4 * sqrt(rows), at most 4096"""
+    return int(min(4096, max(16, 4 * rows ** 0.5)))
+
+
+def _normalize(vectors):
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingStore:
+    """
+    Float16 embedding matrix aligned with Book ids, plus its IVF index
+
+    Args:
+        directory: Directory holding the store's files
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._meta_path = self.directory / 'meta.json'
+        self._opened = None
+        self._opened_key = None
+
+    # Metadata and locking
+
+    def _read_meta(self):
+        try:
+            return json.loads(self._meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, meta):
+        tmp_path = self._meta_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, self._meta_path)
+
+    @contextmanager
+    def _write_lock(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _path(self, meta, name):
+        return self.directory / name.format(gen=meta['generation'])
+
+    # Writes
+
+    def reset(self, base_id, dim):
+        """Start a new, empty generation whose first row is ``base_id``"""
+        with self._write_lock():
+            previous = self._read_meta()
+            generation = (previous['generation'] + 1) if previous else 1
+            meta = {'generation': generation, 'base_id': int(base_id), 'dim': int(dim), 'capacity': 0, 'index': None}
+            self._path(meta, 'embeddings-{gen}.f16').touch()
+            self._path(meta, 'present-{gen}.u8').touch()
+            self._write_meta(meta)
+            if previous:
+                # Readers that still map these files keep them until they remap
+                stale = [self._path(previous, 'embeddings-{gen}.f16'), self._path(previous, 'present-{gen}.u8')]
+                for path in stale + list(self.directory.glob(f"ivf-{previous['generation']}-*.npy")):
+                    path.unlink(missing_ok=True)
+
+    def clear(self):
+        """Remove every generation and the index"""
+        with self._write_lock():
+            previous = self._read_meta()
+            # Keep counting generations so cached maps are never mistaken for new ones
+            generation = (previous['generation'] + 1) if previous else 1
+            self._write_meta({'generation': generation, 'base_id': 0, 'dim': 0, 'capacity': 0, 'index': None})
+            for pattern in ('embeddings-*', 'present-*', 'ivf-*'):
+                for path in self.directory.glob(pattern):
+                    path.unlink(missing_ok=True)
+
+    @timed('embedding_store_write')
+    def write(self, book_ids, codes, embeddings):
+        """
+        Store the embeddings of books
+
+        Args:
+            book_ids: Book primary keys
+            codes: Row of ``embeddings`` for each book
+            embeddings: (distinct texts, dim) array
+
+        Returns:
+            Number of rows written (0 when the store has no matching generation)
+        """
+        import numpy as np
+
+        book_ids = np.asarray(book_ids, dtype=np.int64)
+        if not len(book_ids) or embeddings.shape[1] == 0:
+            return 0
+        unit = _normalize(embeddings).astype(np.float16)
+
+        with self._write_lock():
+            meta = self._read_meta()
+            if meta is None or meta['dim'] != unit.shape[1]:
+                return 0
+            rows = book_ids - meta['base_id']
+            keep = rows >= 0
+            rows, codes = rows[keep], np.asarray(codes)[keep]
+            if not len(rows):
+                return 0
+
+            needed = int(rows.max()) + 1
+            if needed > meta['capacity']:
+                # Grow geometrically; the files only ever get longer within a generation
+                capacity = max(needed, 2 * meta['capacity'])
+                os.truncate(self._path(meta, 'embeddings-{gen}.f16'), capacity * meta['dim'] * 2)
+                os.truncate(self._path(meta, 'present-{gen}.u8'), capacity)
+                meta['capacity'] = capacity
+
+            data = np.memmap(self._path(meta, 'embeddings-{gen}.f16'), dtype=np.float16, mode='r+',
+                             shape=(meta['capacity'], meta['dim']))
+            present = np.memmap(self._path(meta, 'present-{gen}.u8'), dtype=np.uint8, mode='r+',
+                                shape=(meta['capacity'],))
+            order = np.argsort(rows, kind='stable')
+            for start in range(0, len(order), SCAN_CHUNK_ROWS):
+                chunk = order[start:start + SCAN_CHUNK_ROWS]
+                data[rows[chunk]] = unit[codes[chunk]]
+            present[rows] = 1
+            data.flush()
+            present.flush()
+            del data, present
+            self._write_meta(meta)
+        ROWS_PROCESSED.inc(len(rows), stage='embedding_store_write')
+        return len(rows)
+
+    # Reads
+
+    def _open(self):
+        """Read-only maps of the current generation, reopened when it changes"""
+        import numpy as np
+
+        meta = self._read_meta()
+        if meta is None or not meta['capacity']:
+            return None
+        key = (meta['generation'], meta['capacity'], (meta['index'] or {}).get('built_rows'))
+        if key != self._opened_key:
+            opened = {
+                'meta': meta,
+                'data': np.memmap(self._path(meta, 'embeddings-{gen}.f16'), dtype=np.float16, mode='r',
+                                  shape=(meta['capacity'], meta['dim'])),
+                'present': np.memmap(self._path(meta, 'present-{gen}.u8'), dtype=np.uint8, mode='r',
+                                     shape=(meta['capacity'],)),
+                'index': None,
+            }
+            if meta['index']:
+                opened['index'] = {
+                    name: np.load(self._path(meta, f'ivf-{{gen}}-{name}.npy'), mmap_mode='r')
+                    for name in ('projection', 'centroids', 'order', 'offsets')
+                }
+            self._opened, self._opened_key = opened, key
+        return self._opened
+
+    def vector(self, book_id):
+        """Unit embedding of a book as float32, or None if it has none"""
+        import numpy as np
+
+        opened = self._open()
+        if opened is None:
+            return None
+        row = int(book_id) - opened['meta']['base_id']
+        if not 0 <= row < opened['meta']['capacity'] or not opened['present'][row]:
+            return None
+        return np.asarray(opened['data'][row], dtype=np.float32)
+
+    @timed('build_embedding_index')
+    def build_index(self, seed=0):
+        """
+        Train the IVF centroids and inverted lists on the current generation
+
+        Returns:
+            Number of rows indexed (0 when the catalog is searched exhaustively)
+        """
+        import numpy as np
+
+        opened = self._open()
+        if opened is None:
+            return 0
+        meta, data, present = opened['meta'], opened['data'], opened['present']
+        rows = np.flatnonzero(present)
+        if len(rows) < IVF_MIN_ROWS:
+            return 0
+
+        rng = np.random.default_rng(seed)
+        projection = _normalize(rng.standard_normal((IVF_PROJECTION_DIM, meta['dim']))).T.astype(np.float32)
+        n_lists = _ivf_lists(len(rows))
+
+        # Spherical k-means on a sample of projected rows
+        sample = np.sort(rng.choice(rows, size=min(IVF_TRAIN_SAMPLE, len(rows)), replace=False))
+        points = _normalize(np.asarray(data[sample], dtype=np.float32) @ projection)
+        centroids = points[rng.choice(len(points), size=n_lists, replace=False)]
+        for _ in range(IVF_KMEANS_ITERATIONS):
+            labels = np.argmax(points @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, points)
+            counts = np.bincount(labels, minlength=n_lists)
+            empty = counts == 0
+            sums[empty] = points[rng.choice(len(points), size=int(empty.sum()), replace=False)]
+            centroids = _normalize(sums)
+
+        # Assign every stored row to its closest centroid, chunk by chunk
+        labels = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), SCAN_CHUNK_ROWS):
+            chunk = rows[start:start + SCAN_CHUNK_ROWS]
+            projected = np.asarray(data[chunk], dtype=np.float32) @ projection
+            labels[start:start + len(chunk)] = np.argmax(projected @ centroids.T, axis=1)
+        order = np.argsort(labels, kind='stable')
+        offsets = np.searchsorted(labels[order], np.arange(n_lists + 1)).astype(np.int64)
+
+        with self._write_lock():
+            current = self._read_meta()
+            if current is None or current['generation'] != meta['generation']:
+                return 0
+            built_rows = int(rows[-1]) + 1
+            for name, array in (
+                ('projection', projection),
+                ('centroids', centroids.astype(np.float32)),
+                ('order', rows[order].astype(np.int64)),
+                ('offsets', offsets),
+            ):
+                np.save(self._path(current, f'ivf-{{gen}}-{name}.npy'), array)
+            current['index'] = {'lists': n_lists, 'built_rows': built_rows}
+            self._write_meta(current)
+        logger.info(f"Built embedding index over {len(rows)} books in {n_lists} lists")
+        return len(rows)
+
+    def _candidates(self, opened, query, nprobe):
+        """Rows to score for a query: the probed lists plus unindexed rows"""
+        import numpy as np
+
+        meta, index = opened['meta'], opened['index']
+        if index is None:
+            return np.flatnonzero(opened['present'])
+
+        centroid_scores = np.asarray(index['centroids']) @ (query @ index['projection'])
+        nprobe = min(nprobe, len(centroid_scores))
+        probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        offsets = index['offsets']
+        lists = [np.asarray(index['order'][offsets[i]:offsets[i + 1]]) for i in probed]
+
+        # Rows written after the index was built are scanned exhaustively
+        built_rows = meta['index']['built_rows']
+        tail = np.flatnonzero(opened['present'][built_rows:]) + built_rows
+        return np.sort(np.concatenate(lists + [tail]))
+
+    @timed('similar_books')
+    def search(self, book_id, k=10, nprobe=DEFAULT_NPROBE):
+        """
+        Books whose embeddings are most similar to a book's
+
+        Returns:
+            List of (book_id, cosine similarity) pairs, most similar first;
+            empty when the book has no stored embedding
+        """
+        import numpy as np
+
+        opened = self._open()
+        query = self.vector(book_id)
+        if opened is None or query is None:
+            return []
+        base_id = opened['meta']['base_id']
+
+        candidates = self._candidates(opened, query, nprobe)
+        candidates = candidates[candidates != int(book_id) - base_id]
+        if not len(candidates):
+            return []
+
+        scores = np.empty(len(candidates), dtype=np.float32)
+        for start in range(0, len(candidates), SCAN_CHUNK_ROWS):
+            chunk = candidates[start:start + SCAN_CHUNK_ROWS]
+            scores[start:start + len(chunk)] = np.asarray(opened['data'][chunk], dtype=np.float32) @ query
+
+        k = min(k, len(candidates))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(int(row) + base_id, float(score)) for row, score in zip(candidates[best], scores[best])]
+
+
+# Per library slug (None for the default catalog)
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def embedding_store():
+    """
+    Process-wide store of the current library's catalog
+
+    The default catalog uses ``LIBRARY_AI_EMBEDDINGS_DIR``; each library a
+    subdirectory named after it.
+    """
+    from .tenants import current_library
+
+    library = current_library()
+    if library not in _stores:
+        from django.conf import settings
+
+        with _stores_lock:
+            if library not in _stores:
+                directory = Path(getattr(settings, 'LIBRARY_AI_EMBEDDINGS_DIR', Path(settings.BASE_DIR) / 'var' / 'embeddings'))
+                _stores[library] = EmbeddingStore(directory / library if library else directory)
+    return _stores[library]
+
+
+def store_catalog_embeddings(book_ids, codes, embeddings, replace=False):
+    """
+    Persist embeddings produced by ``predict_demand_frame`` and refresh the index
+
+    Args:
+        book_ids: Book primary keys aligned with ``codes``
+        codes: Row of ``embeddings`` for each book
+        embeddings: (distinct texts, dim) float16 array
+        replace: Start a new generation (the whole catalog was replaced)
+    """
+    if embeddings.shape[1] == 0 or not len(book_ids) or any(book_id is None for book_id in book_ids):
+        return 0
+    store = embedding_store()
+    if replace:
+        store.reset(min(book_ids), embeddings.shape[1])
+    written = store.write(book_ids, codes, embeddings)
+    if written:
+        store.build_index()
+    return written
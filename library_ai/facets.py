@@ -0,0 +1,160 @@
+"""
+Faceted summaries of the catalog for the inventory page
+
+One grouped query over the books matching the search returns a small cube of
+(category, action, demand bucket) counts and demand sums. Category counts,
+action counts, the demand histogram and the recommendation hints are all
+marginals of that cube, so the summary costs a single scan whatever the
+catalog size, and the page no longer downloads the whole catalog to build it.
+The high-demand list is a separate top-N query. Folding it into the cube with
+a ranking window function would sort every matching book, and that measured
+several times slower than the grouped scan and the top-N query together.
+
+Facets are disjunctive: category counts honour the action filter but not the
+category filter, and vice versa, so every option shows how many books picking
+it would leave.
+"""
+from django.db.models import Count, F, FloatField, IntegerField, Q, Sum, Value
+from django.db.models.functions import Cast, Least
+
+from .models import Book
+
+# Demand histogram buckets over 0-100
+DEMAND_BUCKETS = 10
+
+# Demand at or above which a book is listed as high demand
+HIGH_DEMAND_THRESHOLD = 90
+
+# High-demand books returned with the facets
+TOP_BOOKS = 5
+
+
+def filtered_books(search='', category='', action=''):
+    """Books matching the inventory page's search box and filters"""
+    books = Book.objects.all()
+    if search:
+        books = books.filter(Q(title__icontains=search) | Q(author__icontains=search))
+    if category:
+        books = books.filter(category=category)
+    if action:
+        books = books.filter(action=action)
+    return books
+
+
+def _cube_query(search, buckets):
+    bucket = Cast(
+        Least(F('demand') * Value(buckets / 100.0, output_field=FloatField()), Value(buckets - 1)),
+        IntegerField(),
+    )
+    return (
+        filtered_books(search)
+        .order_by()
+        .values('category', 'action', bucket=bucket)
+        .annotate(count=Count('id'), demand_sum=Sum('demand'))
+    )
+
+
+def _top_books_query(search, category, action, top_n, threshold):
+    return (
+        filtered_books(search, category, action)
+        .filter(demand__gte=threshold)
+        .order_by('-demand', 'title', 'id')
+        .values('id', 'title', 'author', 'category', 'demand', 'action')[:top_n]
+    )
+
+
+def _recommendations(category_actions, category_demand, category_counts):
+    """Short hints from the category x action counts of the filtered books"""
+    hints = []
+    if not category_counts:
+        return hints
+
+    def share(category, action):
+        return category_actions.get((category, action), 0) / category_counts[category]
+
+    acquire = max(category_counts, key=lambda category: (share(category, 'Acquire'), category_counts[category]))
+    if share(acquire, 'Acquire'):
+        hints.append(
+            f"Focus on acquiring {acquire} titles - {share(acquire, 'Acquire'):.0%} of them are flagged Acquire"
+        )
+    surplus = max(
+        category_counts,
+        key=lambda category: (share(category, 'Transfer') + share(category, 'Deaccession'), category_counts[category]),
+    )
+    if share(surplus, 'Transfer') + share(surplus, 'Deaccession'):
+        hints.append(
+            f"Consider transferring or weeding low-demand {surplus} titles - "
+            f"{category_actions.get((surplus, 'Transfer'), 0) + category_actions.get((surplus, 'Deaccession'), 0)} "
+            f"books are flagged"
+        )
+    average = {category: category_demand[category] / category_counts[category] for category in category_counts}
+    strongest = max(average, key=average.get)
+    hints.append(f"{strongest} has the highest average demand ({average[strongest]:.1f}%) - keep it well stocked")
+    steadiest = max(category_counts, key=lambda category: (share(category, 'Hold'), category_counts[category]))
+    if steadiest != strongest and share(steadiest, 'Hold'):
+        hints.append(f"{steadiest} demand is steady - maintain current levels")
+    return hints
+
+
+def _summarize(cube, top, category, action, buckets):
+    categories = {}
+    actions = {code: 0 for code, _ in Book.ACTIONS}
+    histogram = [0] * buckets
+    category_actions = {}
+    category_demand = {}
+    category_counts = {}
+    total = 0
+    demand_sum = 0.0
+
+    for row in cube:
+        row_category, row_action, count = row['category'], row['action'], row['count']
+        if not action or row_action == action:
+            categories[row_category] = categories.get(row_category, 0) + count
+        if not category or row_category == category:
+            actions[row_action] = actions.get(row_action, 0) + count
+        if (not category or row_category == category) and (not action or row_action == action):
+            total += count
+            demand_sum += row['demand_sum'] or 0.0
+            histogram[min(max(row['bucket'] or 0, 0), buckets - 1)] += count
+            category_actions[(row_category, row_action)] = category_actions.get((row_category, row_action), 0) + count
+            category_demand[row_category] = category_demand.get(row_category, 0.0) + (row['demand_sum'] or 0.0)
+            category_counts[row_category] = category_counts.get(row_category, 0) + count
+
+    width = 100 / buckets
+    return {
+        'total': total,
+        'average_demand': round(demand_sum / total, 1) if total else 0,
+        'categories': [
+            {'category': name, 'count': count}
+            for name, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        'actions': actions,
+        'demand_histogram': [
+            {'min': round(i * width, 1), 'max': round((i + 1) * width, 1), 'count': count}
+            for i, count in enumerate(histogram)
+        ],
+        'high_demand': top,
+        'recommendations': _recommendations(category_actions, category_demand, category_counts),
+    }
+
+
+async def ainventory_facets(search='', category='', action='', top_n=TOP_BOOKS,
+                            threshold=HIGH_DEMAND_THRESHOLD, buckets=DEMAND_BUCKETS):
+    """
+    Facet counts, demand histogram and top high-demand books for a filter
+
+    Args:
+        search: Title/author substring
+        category: Selected category ('' for all)
+        action: Selected action ('' for all)
+        top_n: High-demand books to return
+        threshold: Minimum demand of a high-demand book
+        buckets: Demand histogram buckets over 0-100
+
+    Returns:
+        Dictionary with total, average_demand, categories, actions,
+        demand_histogram, high_demand and recommendations
+    """
+    cube = [row async for row in _cube_query(search, buckets)]
+    top = [book async for book in _top_books_query(search, category, action, top_n, threshold)]
+    return _summarize(cube, top, category, action, buckets)
@@ -0,0 +1,157 @@
+"""
+Precomputed top-N books per category for the demand forecast endpoint
+
+``ForecastTopBook`` holds the highest-demand books of every category, plus the
+catalog-wide top N under category ``''``. The forecast endpoint and the
+category list read only this table, so they touch at most
+``FORECAST_TOP_N x (categories + 1)`` rows whatever the catalog size. The index
+is rebuilt with one window-function query whenever book demand changes:
+after an upload, a reprocess or rescoring run and a clear. Admin edits of a
+few books re-rank only the categories they touch (``refresh_forecast_index``).
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import router, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .metrics import ROWS_PROCESSED, timed
+from .models import Book, ForecastTopBook
+
+logger = logging.getLogger(__name__)
+
+# Books charted per category
+FORECAST_TOP_N = 10
+
+# Category key of the catalog-wide ranking
+ALL_CATEGORIES = ''
+
+# Book fields the index ranks by, groups by or shows
+FORECAST_COLUMNS = ['title', 'category', 'demand']
+
+
+@timed('rebuild_forecast_index')
+def rebuild_forecast_index(top_n=FORECAST_TOP_N):
+    """
+    Replace the top-N index with the current catalog's rankings
+
+    Returns:
+        Number of index rows written
+    """
+    ranking = [F('demand').desc(), F('title').asc(), F('id').asc()]
+    per_category = (
+        Book.objects
+        .annotate(rank=Window(RowNumber(), partition_by=[F('category')], order_by=ranking))
+        .filter(rank__lte=top_n)
+        .values_list('category', 'rank', 'id', 'title', 'demand')
+    )
+    overall = Book.objects.order_by(*ranking).values_list('id', 'title', 'demand')[:top_n]
+
+    rows = [
+        ForecastTopBook(category=category, rank=rank, book_id=book_id, title=title, demand=demand)
+        for category, rank, book_id, title, demand in per_category
+    ]
+    rows.extend(
+        ForecastTopBook(category=ALL_CATEGORIES, rank=rank, book_id=book_id, title=title, demand=demand)
+        for rank, (book_id, title, demand) in enumerate(overall, start=1)
+    )
+
+    with transaction.atomic(using=router.db_for_write(ForecastTopBook)):
+        ForecastTopBook.objects.all().delete()
+        ForecastTopBook.objects.bulk_create(rows)
+    ROWS_PROCESSED.inc(len(rows), stage='rebuild_forecast_index')
+    return len(rows)
+
+
+@timed('refresh_forecast_index')
+def refresh_forecast_index(categories, top_n=FORECAST_TOP_N):
+    """
+    Re-rank some categories, and the catalog-wide top N, after a few books changed
+
+    Each category costs one indexed top-N query instead of a pass over the
+    whole catalog. An index that was never built is built in full.
+
+    Args:
+        categories: Categories whose books were added, edited or deleted
+
+    Returns:
+        Number of index rows written
+    """
+    if not ForecastTopBook.objects.exists():
+        return rebuild_forecast_index(top_n)
+
+    ranking = [F('demand').desc(), F('title').asc(), F('id').asc()]
+    keys = {category for category in categories if category} | {ALL_CATEGORIES}
+    rows = []
+    for category in keys:
+        books = Book.objects.all() if category == ALL_CATEGORIES else Book.objects.filter(category=category)
+        rows.extend(
+            ForecastTopBook(category=category, rank=rank, book_id=book_id, title=title, demand=demand)
+            for rank, (book_id, title, demand) in enumerate(
+                books.order_by(*ranking).values_list('id', 'title', 'demand')[:top_n], start=1
+            )
+        )
+
+    with transaction.atomic(using=router.db_for_write(ForecastTopBook)):
+        ForecastTopBook.objects.filter(category__in=keys).delete()
+        ForecastTopBook.objects.bulk_create(rows)
+    ROWS_PROCESSED.inc(len(rows), stage='refresh_forecast_index')
+    return len(rows)
+
+
+def clear_forecast_index():
+    ForecastTopBook.objects.all().delete()
+
+
+def _top_books_query(category):
+    return (
+        ForecastTopBook.objects
+        .filter(category=category or ALL_CATEGORIES)
+        .order_by('rank')
+        .values('title', 'demand')
+    )
+
+
+def _categories_query():
+    return (
+        ForecastTopBook.objects
+        .filter(rank=1)
+        .exclude(category=ALL_CATEGORIES)
+        .order_by('category')
+        .values_list('category', flat=True)
+    )
+
+
+def top_books(category=None):
+    """
+    Highest-demand books of a category (or the whole catalog), best first
+
+    Returns:
+        List of dictionaries with title and demand
+    """
+    books = list(_top_books_query(category))
+    # Catalogs loaded before the index existed are indexed on first read
+    if not books and not ForecastTopBook.objects.exists() and Book.objects.exists():
+        rebuild_forecast_index()
+        return top_books(category)
+    return books
+
+
+async def atop_books(category=None):
+    """Async ``top_books`` for the ASGI forecast endpoint"""
+    books = [book async for book in _top_books_query(category)]
+    if not books and not await ForecastTopBook.objects.aexists() and await Book.objects.aexists():
+        await sync_to_async(rebuild_forecast_index)()
+        return await atop_books(category)
+    return books
+
+
+def forecast_categories():
+    """Categories present in the catalog, from the index rather than the Book table"""
+    return list(_categories_query())
+
+
+async def aforecast_categories():
+    """Async ``forecast_categories``"""
+    return [category async for category in _categories_query()]
@@ -0,0 +1,573 @@
+"""
+Parsing, schema inference and cleaning for uploaded catalog files
+
+``clean_catalog`` is the stage between parsing and inference: it maps the
+file's headers onto the catalog columns, coerces types with whole-column
+pandas operations, interns categories, collapses duplicate books so each is
+scored once, and reports data quality per column.
+
+pandas is imported inside the functions that need it so that importing the
+API views does not pull it in at process start.
+"""
+import json
+import logging
+import os
+import re
+import warnings
+
+logger = logging.getLogger(__name__)
+
+# Required columns and the names they may appear under in an uploaded file.
+# Headers are matched after lower-casing and turning punctuation into spaces,
+# so 'Book_Title' and 'BOOK-TITLE' both match 'book title'.
+COLUMN_MAPPING = {
+    'title': ['title', 'book title', 'name', 'book name', 'title name', 'book'],
+    'author': ['author', 'author name', 'writer', 'authors', 'author s', 'creator', 'book author'],
+    'category': ['category', 'genre', 'subject', 'categories', 'genres', 'book category', 'book genre',
+                 'classification'],
+}
+
+# Optional per-branch columns used by the transfer planner
+BRANCH_COLUMN_MAPPING = {
+    'branch': ['branch', 'library branch', 'user_location', 'location', 'branch name', 'user location'],
+    'copies': ['copies', 'branch copies', 'total_copies', 'holdings', 'total copies', 'copies held'],
+}
+
+# Optional existing demand (0-100) used as the base of the prediction
+DEMAND_COLUMN_NAMES = ['demand', 'demand score', 'demand percent', 'demand pct', 'predicted demand', 'demand %']
+
+# File extensions accepted for upload and the parser used for each
+CATALOG_FORMATS = {
+    '.csv': 'csv',
+    '.xlsx': 'excel',
+    '.xls': 'excel',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+
+# Records per DataFrame chunk when streaming JSON Lines
+JSONL_CHUNK_ROWS = 100_000
+
+
+class IngestionError(ValueError):
+    """Raised when an uploaded file cannot be turned into a book catalog"""
+
+
+def catalog_format(filename):
+    """
+    Format name for an uploaded file
+    
+    Raises:
+        IngestionError: if the extension is not supported
+    """
+    suffix = os.path.splitext(filename.lower())[1]
+    if suffix not in CATALOG_FORMATS:
+        raise IngestionError(
+            'Unsupported file format. Please upload CSV, Excel, JSON, JSON Lines, Parquet or Arrow.'
+        )
+    return CATALOG_FORMATS[suffix]
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def read_catalog(path, filename):
+    """
+    Parse an uploaded file into a DataFrame
+    
+    Args:
+        path: Location of the stored file
+        filename: Original file name, used to pick the parser
+        
+    Returns:
+        Tuple of (DataFrame with the file's rows and original column names,
+        report dict with the format, parser used and number of skipped bad rows)
+    """
+    file_format = catalog_format(filename)
+    reader = {
+        'csv': _read_csv,
+        'excel': _read_excel,
+        'json': _read_json,
+        'jsonl': _read_jsonl,
+        'parquet': _read_parquet,
+        'arrow': _read_arrow,
+    }[file_format]
+    df, parser, bad_rows = reader(path)
+    if bad_rows:
+        logger.warning(f"Skipped {bad_rows} malformed rows in '{filename}'")
+    return df, {'format': file_format, 'parser': parser, 'bad_rows': bad_rows}
+
+
+def _read_csv(path):
+    """
+    Fast strict parse first; malformed rows are then skipped and counted by the
+    C parser, and only files it cannot tokenize go through the python engine
+    """
+    import pandas as pd
+    
+    if _has_pyarrow():
+        try:
+            return pd.read_csv(path, engine='pyarrow'), 'pyarrow', 0
+        except (pd.errors.ParserError, ValueError) as e:
+            if isinstance(e, UnicodeDecodeError):
+                raise
+            logger.info(f"Strict CSV parse failed ({str(e)}), skipping malformed rows")
+    
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', pd.errors.ParserWarning)
+            df = pd.read_csv(path, engine='c', on_bad_lines='warn')
+        bad_rows = sum(
+            str(warning.message).count('Skipping line')
+            for warning in caught if issubclass(warning.category, pd.errors.ParserWarning)
+        )
+        return df, 'c', bad_rows
+    except pd.errors.ParserError as e:
+        logger.info(f"C CSV parse failed ({str(e)}), retrying with the python engine")
+    
+    bad_rows = 0
+    
+    def skip_bad_line(line):
+        nonlocal bad_rows
+        bad_rows += 1
+        return None
+    
+    df = pd.read_csv(path, engine='python', on_bad_lines=skip_bad_line)
+    return df, 'python', bad_rows
+
+
+def _read_excel(path):
+    import pandas as pd
+    
+    # python-calamine parses large sheets much faster than openpyxl when installed
+    try:
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return pd.read_excel(path), 'openpyxl', 0
+    return pd.read_excel(path, engine='calamine'), 'calamine', 0
+
+
+def _read_json(path):
+    """JSON array of records, falling back to JSON Lines for mislabelled files"""
+    import pandas as pd
+    
+    try:
+        return pd.read_json(path, orient='records', convert_dates=False), 'json', 0
+    except ValueError:
+        return _read_jsonl(path)
+
+
+def _read_jsonl(path):
+    """
+    JSON Lines via pyarrow's block-streaming reader, or a tolerant line-by-line
+    stream in bounded chunks that skips lines which are not JSON objects
+    """
+    import pandas as pd
+    
+    if _has_pyarrow():
+        import pyarrow
+        import pyarrow.json
+        
+        try:
+            return pyarrow.json.read_json(path).to_pandas(), 'pyarrow', 0
+        except pyarrow.ArrowInvalid as e:
+            logger.info(f"Strict JSON Lines parse failed ({str(e)}), skipping malformed lines")
+    
+    chunks = []
+    records = []
+    bad_rows = 0
+    with open(path, 'rb') as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                bad_rows += 1
+                continue
+            if not isinstance(record, dict):
+                bad_rows += 1
+                continue
+            records.append(record)
+            if len(records) >= JSONL_CHUNK_ROWS:
+                chunks.append(pd.DataFrame.from_records(records))
+                records = []
+    if records or not chunks:
+        chunks.append(pd.DataFrame.from_records(records))
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    return df, 'jsonl', bad_rows
+
+
+def _read_parquet(path):
+    import pandas as pd
+    
+    if not _has_pyarrow():
+        raise IngestionError('Parquet uploads require the pyarrow package.')
+    return pd.read_parquet(path, engine='pyarrow'), 'pyarrow', 0
+
+
+def _read_arrow(path):
+    import pandas as pd
+    
+    if not _has_pyarrow():
+        raise IngestionError('Arrow uploads require the pyarrow package.')
+    return pd.read_feather(path), 'pyarrow', 0
+
+
+def _normalize_header(name):
+    return ' '.join(re.sub(r'[^0-9a-z%]+', ' ', str(name).lower()).split())
+
+
+def infer_schema(columns):
+    """
+    Map a file's column names onto the catalog columns
+    
+    Aliases are tried in order. A required column with no alias falls back to
+    the only header containing its name as a word (e.g. 'Main Title').
+    
+    Returns:
+        Dict of original column name -> catalog column
+    
+    Raises:
+        IngestionError: if a required column cannot be found
+    """
+    normalized = {}
+    for column in columns:
+        normalized.setdefault(_normalize_header(column), column)
+    
+    mapping = {}
+    
+    def claim(target, names, required):
+        for name in names:
+            column = normalized.get(_normalize_header(name))
+            if column is not None and column not in mapping:
+                mapping[column] = target
+                return
+        if required:
+            candidates = [
+                column for header, column in normalized.items()
+                if target in header.split() and column not in mapping
+            ]
+            if len(candidates) == 1:
+                mapping[candidates[0]] = target
+                return
+            raise IngestionError(
+                f"Missing required column. Please ensure your file has a column for "
+                f"'{target}' (e.g., {', '.join(names[:3])})."
+            )
+    
+    for target, names in COLUMN_MAPPING.items():
+        claim(target, names, required=True)
+    # Branch and demand columns are optional; recognise them when present
+    for target, names in BRANCH_COLUMN_MAPPING.items():
+        claim(target, names, required=False)
+    claim('demand', DEMAND_COLUMN_NAMES, required=False)
+    return mapping
+
+
+def _clean_text(series):
+    """Strings with surrounding whitespace removed; blanks become missing"""
+    # Mask before converting: pandas 2 turns NaN/None into 'nan'/'None' strings
+    missing = series.isna()
+    text = series.astype(str).str.strip()
+    return text.where(~missing & (text != ''))
+
+
+def _text_key(text):
+    """Case- and whitespace-insensitive comparison key for cleaned text"""
+    key = text.str.lower()
+    # The regex is slow at 1M rows, so only rows with runs of whitespace take it
+    spaced = key.str.contains('  ', regex=False) | key.str.contains('\t', regex=False)
+    if spaced.any():
+        key = key.mask(spaced, key[spaced].str.replace(r'\s+', ' ', regex=True))
+    return key
+
+
+def _intern_categories(series):
+    """
+    Categorical of the categories, merging spellings that differ only in case
+    and whitespace into their most frequent spelling
+    
+    Returns:
+        Tuple of (Categorical, number of spellings merged away)
+    
+    Only the distinct values are normalized, so the cost is one factorize.
+    """
+    import numpy as np
+    import pandas as pd
+    
+    codes, uniques = pd.factorize(series)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    spellings = [' '.join(str(spelling).split()) for spelling in uniques.tolist()]
+    spelling_counts = {}
+    for spelling, count in zip(spellings, counts.tolist()):
+        spelling_counts[spelling] = spelling_counts.get(spelling, 0) + count
+    
+    def preference(spelling):
+        # Most frequent first; on ties prefer 'Science Fiction' over 'science fiction'
+        return spelling_counts[spelling], spelling not in (spelling.lower(), spelling.upper())
+    
+    canonical = {}
+    for spelling in spelling_counts:
+        key = spelling.casefold()
+        if key not in canonical or preference(spelling) > preference(canonical[key]):
+            canonical[key] = spelling
+    categories = list(dict.fromkeys(canonical[spelling.casefold()] for spelling in spellings))
+    positions = {category: i for i, category in enumerate(categories)}
+    remap = np.array([positions[canonical[spelling.casefold()]] for spelling in spellings] + [-1], dtype=np.int64)
+    return pd.Categorical.from_codes(remap[codes], categories=categories), len(uniques) - len(categories)
+
+
+def _coerce_number(series, lower=None, upper=None):
+    """
+    Numbers from numeric or text columns ('87%', ' 42 '); unparseable values
+    become missing and out-of-range ones are clipped
+    
+    Returns:
+        Tuple of (float Series, invalid count, clipped count)
+    """
+    import numpy as np
+    import pandas as pd
+    from pandas.api.types import is_bool_dtype, is_numeric_dtype
+    
+    if is_numeric_dtype(series) and not is_bool_dtype(series):
+        values = series.astype(np.float64)
+        invalid = 0
+    else:
+        # Parse each distinct string once; numbers repeat heavily in real catalogs
+        codes, uniques = pd.factorize(_clean_text(series))
+        parsed = pd.to_numeric(pd.Series(uniques, dtype=object).str.rstrip('%'), errors='coerce')
+        parsed = np.append(parsed.to_numpy(dtype=np.float64), np.nan)
+        values = pd.Series(parsed[codes], index=series.index)
+        invalid = int(((codes >= 0) & np.isnan(values.to_numpy())).sum())
+    finite = np.isfinite(values)
+    invalid += int((values.notna() & ~finite).sum())
+    values = values.where(finite)
+    clipped = values.clip(lower=lower, upper=upper)
+    changed = int(((clipped != values) & values.notna()).sum())
+    return clipped, invalid, changed
+
+
+def _standardize(df, report):
+    mapping = infer_schema(df.columns)
+    report['ignored_columns'] = [str(column) for column in df.columns if column not in mapping]
+    df = df[list(mapping)].rename(columns=mapping)
+    columns = {}
+    
+    for column in ('title', 'author', 'branch'):
+        if column in df:
+            df[column] = _clean_text(df[column])
+            columns[column] = {'type': 'text', 'missing': int(df[column].isna().sum())}
+    if 'demand' in df:
+        df['demand'], invalid, clipped = _coerce_number(df['demand'], 0, 100)
+        columns['demand'] = {
+            'type': 'number', 'missing': int(df['demand'].isna().sum()) - invalid,
+            'invalid': invalid, 'clipped': clipped,
+        }
+    if 'copies' in df:
+        df['copies'], invalid, clipped = _coerce_number(df['copies'], lower=0)
+        columns['copies'] = {
+            'type': 'number', 'missing': int(df['copies'].isna().sum()) - invalid,
+            'invalid': invalid, 'clipped': clipped,
+        }
+    
+    df['category'] = _clean_text(df['category'])
+    columns['category'] = {'type': 'category', 'missing': int(df['category'].isna().sum())}
+    
+    # Clean data by removing rows with missing essential information
+    complete = df[['title', 'author', 'category']].notna().all(axis=1)
+    df = df[complete]
+    df['category'], merged = _intern_categories(df['category'])
+    columns['category'].update({'distinct': len(df['category'].cat.categories), 'merged_spellings': merged})
+    
+    for target, info in columns.items():
+        source = next(column for column, mapped in mapping.items() if mapped == target)
+        columns[target] = {'source': str(source), **info}
+    report['columns'] = columns
+    report['incomplete_rows'] = int((~complete).sum())
+    return df
+
+
+def standardize_columns(df):
+    """
+    Map the file's columns onto title/author/category (and branch, copies and
+    demand when present), coerce their types and drop incomplete rows
+    
+    Text is stripped, blank strings count as missing, demand and copies are
+    parsed as numbers and categories are interned as a Categorical. The index
+    is kept, so rows still carry their position in the file.
+    
+    Raises:
+        IngestionError: if a required column cannot be found
+    """
+    return _standardize(df, {})
+
+
+def deduplicate_books(df):
+    """
+    One row per book, keyed on case- and whitespace-insensitive title and author
+    
+    Titles are factorized first; authors are only compared for the rows whose
+    title repeats, which keeps the cost near one factorize of the titles.
+    
+    Returns:
+        Tuple of (first row of every book, book position of every input row)
+    """
+    import numpy as np
+    import pandas as pd
+    
+    title_codes, titles = pd.factorize(_text_key(df['title']))
+    repeated = np.bincount(title_codes, minlength=len(titles))[title_codes] > 1
+    is_first = ~repeated
+    if repeated.any():
+        # Books among the rows whose title repeats, told apart by author
+        author_codes, authors = pd.factorize(_text_key(df['author'][repeated]))
+        repeated_codes, _ = pd.factorize(title_codes[repeated].astype(np.int64) * len(authors) + author_codes)
+        repeated_first = np.flatnonzero(~pd.Series(repeated_codes).duplicated().to_numpy())
+        is_first[np.flatnonzero(repeated)[repeated_first]] = True
+    
+    # Books are numbered by their first row, so they keep the file's order
+    positions = np.cumsum(is_first) - 1
+    codes = positions
+    if repeated.any():
+        codes = positions.copy()
+        codes[repeated] = positions[np.flatnonzero(repeated)[repeated_first]][repeated_codes]
+    books = df.iloc[np.flatnonzero(is_first)]
+    
+    if 'demand' in df and len(books) < len(df):
+        # A book whose first row has no demand takes the first one given by its other rows
+        missing = books['demand'].isna().to_numpy()
+        if missing.any():
+            rows = missing[codes] & df['demand'].notna().to_numpy()
+            fill = df['demand'][rows].groupby(codes[rows]).first()
+            demand = books['demand'].to_numpy(copy=True)
+            demand[fill.index.to_numpy()] = fill.to_numpy()
+            books = books.assign(demand=demand)
+    return books, codes
+
+
+def clean_catalog(df):
+    """
+    Standardize an uploaded catalog and collapse duplicate books before inference
+    
+    Args:
+        df: Parsed upload with the file's original column names
+        
+    Returns:
+        Tuple of (books, rows, book_codes, report): one row per distinct book;
+        every complete input row (for per-branch stock); the position in
+        ``books`` of each row; and a per-column quality report
+    
+    Raises:
+        IngestionError: if a required column cannot be found
+    """
+    report = {'rows_in': len(df)}
+    rows = _standardize(df, report)
+    books, codes = deduplicate_books(rows)
+    report['duplicate_rows'] = len(rows) - len(books)
+    report['books'] = len(books)
+    return books, rows, codes, report
+
+
+def iter_catalog(path, filename, chunk_rows):
+    """
+    Stream a catalog file as DataFrame chunks of at most ``chunk_rows`` rows
+    
+    Chunks keep the file's original column names and are indexed by row
+    position in the file, so positions stay stable when a stream is resumed.
+    CSV, JSON Lines, Parquet and Arrow files are read incrementally; Excel and
+    JSON arrays are parsed whole and then sliced.
+    """
+    import pandas as pd
+    
+    file_format = catalog_format(filename)
+    if file_format == 'csv':
+        with pd.read_csv(path, engine='c', chunksize=chunk_rows, on_bad_lines='skip') as reader:
+            yield from reader
+    elif file_format == 'jsonl':
+        yield from _iter_jsonl(path, chunk_rows)
+    elif file_format in ('parquet', 'arrow'):
+        if not _has_pyarrow():
+            raise IngestionError(f'{file_format.title()} files require the pyarrow package.')
+        offset = 0
+        for batch in _arrow_batches(path, file_format, chunk_rows):
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+    else:
+        df, _ = read_catalog(path, filename)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+
+
+def _iter_jsonl(path, chunk_rows):
+    import pandas as pd
+    
+    records = []
+    offset = 0
+    with open(path, 'rb') as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            records.append(record)
+            if len(records) >= chunk_rows:
+                yield pd.DataFrame.from_records(records, index=pd.RangeIndex(offset, offset + len(records)))
+                offset += len(records)
+                records = []
+    if records:
+        yield pd.DataFrame.from_records(records, index=pd.RangeIndex(offset, offset + len(records)))
+
+
+def _arrow_batches(path, file_format, chunk_rows):
+    if file_format == 'parquet':
+        import pyarrow.parquet
+        
+        yield from pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunk_rows)
+    else:
+        import pyarrow.feather
+        
+        # Memory-mapped, so batches are sliced without reading the whole file
+        yield from pyarrow.feather.read_table(path, memory_map=True).to_batches(max_chunksize=chunk_rows)
+
+
+def count_catalog_rows(path, filename):
+    """
+    Number of records in a catalog file, for progress reporting
+    
+    Read from metadata for Parquet and Arrow and by counting lines for CSV and
+    JSON Lines (so it is approximate when fields contain line breaks); None
+    for formats that would have to be parsed in full.
+    """
+    file_format = catalog_format(filename)
+    if file_format in ('csv', 'jsonl'):
+        lines = 0
+        with open(path, 'rb') as fh:
+            for block in iter(lambda: fh.read(1 << 24), b''):
+                lines += block.count(b'\n')
+        return max(0, lines - 1) if file_format == 'csv' else lines
+    if file_format in ('parquet', 'arrow') and _has_pyarrow():
+        if file_format == 'parquet':
+            import pyarrow.parquet
+            
+            return pyarrow.parquet.ParquetFile(path).metadata.num_rows
+        import pyarrow.feather
+        
+        return pyarrow.feather.read_table(path, memory_map=True).num_rows
+    return None
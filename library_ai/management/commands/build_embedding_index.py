@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library_ai.embeddings import embedding_store
+from library_ai.tenants import using_library
+
+
+class Command(BaseCommand):
+    help = 'Retrain the similar-books IVF index over every stored embedding'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--library', help='Library whose index to retrain (defaults to the default catalog)')
+
+    def handle(self, *args, **options):
+        try:
+            with using_library(options['library']):
+                indexed = embedding_store().build_index()
+        except LookupError as e:
+            raise CommandError(str(e))
+        if indexed:
+            self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} book embeddings'))
+        else:
+            self.stdout.write('Catalog too small for an index; similar-books searches it exhaustively')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library_ai.prediction_history import DEFAULT_RETENTION_DAYS, HISTORY_BATCH_SIZE, compact_history
+from library_ai.tenants import using_library
+
+
+class Command(BaseCommand):
+    help = 'Delete raw prediction history past the retention window; daily summaries are kept'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=DEFAULT_RETENTION_DAYS,
+            help=f'Keep raw rows from the last N days (default {DEFAULT_RETENTION_DAYS})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=HISTORY_BATCH_SIZE,
+            help='Rows deleted per statement',
+        )
+        parser.add_argument(
+            '--library',
+            help='Library whose history to compact (defaults to the default database)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with using_library(options['library']):
+                deleted = compact_history(options['retention_days'], options['batch_size'])
+        except LookupError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} prediction history rows'))
@@ -0,0 +1,52 @@
+import fcntl
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from library_ai.cpu_budget import available_cpus, plan_cpu_budget, slot_cpus
+
+
+class Command(BaseCommand):
+    help = 'Show how torch threads and cores are split between the inference workers on this node'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='inference processes (defaults to LIBRARY_AI_CPU_WORKERS)')
+        parser.add_argument('--threads', type=int, help='intra-op threads per process (0 = split the cores)')
+
+    def handle(self, *args, **options):
+        cpus = available_cpus()
+        plan = plan_cpu_budget(workers=options['workers'], threads=options['threads'], cpus=cpus)
+        used = plan['workers'] * plan['threads']
+
+        self.stdout.write(f"Cores available:      {plan['cpus']}")
+        self.stdout.write(f"Inference workers:    {plan['workers']}")
+        self.stdout.write(f"Intra-op threads:     {plan['threads']} per worker ({used} total)")
+        self.stdout.write(f"Inter-op threads:     {plan['interop_threads']} per worker")
+        if used > plan['cpus']:
+            self.stdout.write(self.style.WARNING(f"Oversubscribed: {used} threads on {plan['cpus']} cores"))
+
+        if not settings.LIBRARY_AI_CPU_PINNING:
+            self.stdout.write('Pinning:              off (set LIBRARY_AI_CPU_PINNING=1 to pin workers)')
+            return
+
+        self.stdout.write('Pinning:              on')
+        slots_dir = Path(settings.LIBRARY_AI_CPU_SLOTS_DIR)
+        for slot in range(plan['workers']):
+            self.stdout.write(
+                f"  slot {slot}: CPUs {slot_cpus(slot, plan['threads'], cpus)} - {self._holder(slots_dir, slot)}"
+            )
+
+    def _holder(self, slots_dir, slot):
+        """Pid holding a slot's lock, found by trying to take the lock ourselves"""
+        path = slots_dir / f'slot-{slot}.lock'
+        if not path.exists():
+            return 'free'
+        with open(path, 'a+') as handle:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.seek(0)
+                return f'held by pid {handle.read().strip() or "?"}'
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            return 'free'
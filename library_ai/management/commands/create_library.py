@@ -0,0 +1,26 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from library_ai.models import Library
+from library_ai.tenants import SLUG_RE, forget_registry, library_database_path, register_library_database
+
+
+class Command(BaseCommand):
+    help = 'Register a library and create its catalog database; re-run it to apply new migrations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug', help='Short name used in X-Library headers, host names and the database file')
+        parser.add_argument('--name', default='', help='Display name (defaults to the slug)')
+
+    def handle(self, *args, **options):
+        slug = options['slug']
+        if not SLUG_RE.match(slug):
+            raise CommandError('Library slugs are 1-63 lowercase letters, digits and inner hyphens')
+
+        library, created = Library.objects.get_or_create(slug=slug, defaults={'name': options['name'] or slug})
+        forget_registry()
+        alias = register_library_database(slug)
+        call_command('migrate', database=alias, interactive=False, verbosity=max(0, options['verbosity'] - 1))
+
+        action = 'Created' if created else 'Migrated'
+        self.stdout.write(self.style.SUCCESS(f"{action} library '{library.slug}' at {library_database_path(slug)}"))
@@ -0,0 +1,19 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from library_ai.models import Library
+from library_ai.tenants import register_library_database
+
+
+class Command(BaseCommand):
+    help = "Apply pending migrations to every library's catalog database"
+
+    def handle(self, *args, **options):
+        slugs = list(Library.objects.values_list('slug', flat=True))
+        for slug in slugs:
+            self.stdout.write(f'Migrating {slug}')
+            call_command(
+                'migrate', database=register_library_database(slug), interactive=False,
+                verbosity=max(0, options['verbosity'] - 1),
+            )
+        self.stdout.write(self.style.SUCCESS(f'Migrated {len(slugs)} libraries'))
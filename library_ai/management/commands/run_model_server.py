@@ -0,0 +1,48 @@
+import os
+import signal
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from library_ai.ai_models import LibraryDemandPredictor
+from library_ai.cpu_budget import apply_cpu_budget
+from library_ai.model_server import ModelServer
+
+
+class Command(BaseCommand):
+    help = 'Run the shared model server that scores books for all Django workers on this node'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket',
+            default=settings.LIBRARY_AI_MODEL_SERVER_SOCKET or os.path.join(settings.BASE_DIR, 'var', 'model-server.sock'),
+            help='Unix socket path (defaults to LIBRARY_AI_MODEL_SERVER_SOCKET)',
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+
+        # The server is the node's only inference process, so it gets every core
+        apply_cpu_budget(workers=1)
+        predictor = LibraryDemandPredictor(use_model_server=False)
+        predictor.initialize_models()
+        if not predictor.is_initialized:
+            raise CommandError('AI models failed to load; see the log for details')
+
+        server = ModelServer(
+            socket_path,
+            predictor,
+            max_batch_size=settings.LIBRARY_AI_BATCH_MAX_SIZE,
+            max_wait=settings.LIBRARY_AI_BATCH_MAX_WAIT_MS / 1000,
+        )
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        self.stdout.write(self.style.SUCCESS(f'Model server listening on {socket_path} (pid {os.getpid()})'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write('Model server stopped')
@@ -0,0 +1,98 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library_ai.bulk_scoring import DEFAULT_BATCH_ROWS, score_catalog
+from library_ai.ingestion import IngestionError
+from library_ai.tenants import using_library
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = (
+        'Score a catalog file (replacing the current catalog) or rescore the Book table in batches '
+        'across worker processes; an interrupted run resumes from its last checkpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            help='Catalog file (CSV, Excel, JSON, JSON Lines, Parquet or Arrow); omit to rescore the Book table',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Scoring processes, each with its own copy of the models unless a model server is configured',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_ROWS,
+            help=f'Rows per batch and checkpoint (default {DEFAULT_BATCH_ROWS})',
+        )
+        parser.add_argument(
+            '--name',
+            help='Checkpoint name, to keep several resumable runs apart (defaults to the source)',
+        )
+        parser.add_argument(
+            '--library',
+            help='Library whose catalog to score (defaults to the default database)',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an unfinished checkpoint and start from the beginning',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be positive')
+
+        last_report = [0.0]
+
+        def progress(rows_done, rows_total, elapsed):
+            now = time.monotonic()
+            if now - last_report[0] < PROGRESS_INTERVAL:
+                return
+            last_report[0] = now
+            rate = rows_done / elapsed if elapsed else 0.0
+            line = f'{rows_done:,} rows'
+            if rows_total:
+                line += f' of {rows_total:,} ({min(100.0, 100 * rows_done / rows_total):.1f}%)'
+            line += f' | {rate:,.0f} rows/s'
+            if rows_total and rate:
+                line += f' | ETA {datetime.timedelta(seconds=round(max(0, rows_total - rows_done) / rate))}'
+            self.stdout.write(line)
+
+        try:
+            with using_library(options['library']):
+                report = score_catalog(
+                    path=options['file'],
+                    name=options['name'],
+                    workers=options['workers'],
+                    batch_rows=options['batch_size'],
+                    restart=options['restart'],
+                    progress=progress,
+                )
+        except (IngestionError, ValueError, FileNotFoundError, LookupError) as e:
+            raise CommandError(str(e))
+
+        if report['resumed_from'] is not None:
+            self.stdout.write(f"Resumed '{report['name']}' from position {report['resumed_from']:,}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {report['rows_scored']:,} rows in {report['batches']:,} batches "
+            f"({datetime.timedelta(seconds=round(report['elapsed_seconds']))}, "
+            f"{report['rows_per_second']:,.0f} rows/s, {report['workers']} workers)"
+        ))
+        if report['rows_skipped']:
+            self.stdout.write(f"Skipped {report['rows_skipped']:,} incomplete rows")
+        self.stdout.write(f"Rows scored over the whole run: {report['run_rows_scored']:,}")
+        self.stdout.write(f"Mean predicted demand: {report['mean_demand']:.1f}")
+        for action, count in report['actions'].items():
+            self.stdout.write(f'  {action}: {count:,}')
+        if report['embedded']:
+            self.stdout.write(f"Stored {report['embedded']:,} embeddings")
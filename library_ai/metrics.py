@@ -0,0 +1,440 @@
+"""
+Lightweight hot-path metrics with Prometheus text exposition
+
+Each process keeps its samples in memory. With ``LIBRARY_AI_METRICS_DIR`` set,
+it also periodically snapshots them to ``<pid>-<start>.json`` in that
+directory, and the ``/metrics`` view merges every snapshot there, so counters
+and histograms are summed correctly across all WSGI/ASGI worker processes on
+the node. The start time in the file name keeps a process that reuses a dead
+process' pid from overwriting (and rolling back) its counters. A process that
+exits drops its ``livesum`` gauges from its final snapshot. Each new process
+folds the snapshots of exited ones into ``aggregate.json``, so the directory
+and the cost of a scrape grow with the live workers, not with every worker
+that ever ran.
+"""
+import atexit
+import asyncio
+import fcntl
+import json
+import logging
+import math
+import os
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0  # seconds between snapshots of a dirty process
+
+# Samples of exited processes, folded together by ``compact_snapshots``
+AGGREGATE_NAME = 'aggregate.json'
+LOCK_NAME = '.lock'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, math.inf)
+
+
+class _Registry:
+    """Process-local store of metric samples"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.values = {}
+        self.lock = threading.Lock()
+        self._set_identity()
+        self.dirty = False
+        self._flusher = None
+
+    def _set_identity(self):
+        self.pid = os.getpid()
+        self.snapshot_name = f'{self.pid}-{time.time_ns()}.json'
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def _check_fork(self):
+        # A forked worker must not re-export samples recorded by its parent
+        if self.pid != os.getpid():
+            self._set_identity()
+            self.values = {}
+            self._flusher = None
+
+    def update(self, key, func):
+        with self.lock:
+            self._check_fork()
+            self.values[key] = func(self.values.get(key))
+            self.dirty = True
+        if self._flusher is None:
+            self._start_flusher()
+
+    def _start_flusher(self):
+        with self.lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True)
+            self._flusher.start()
+        atexit.register(self.close)
+
+    def _flush_loop(self):
+        directory = metrics_dir()
+        if directory is not None:
+            compact_snapshots(directory)
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            if self.dirty:
+                self.flush()
+
+    def snapshot(self, live=True):
+        """Samples as JSON-ready lists; ``live=False`` leaves out ``livesum`` gauges"""
+        with self.lock:
+            self._check_fork()
+            self.dirty = False
+            return [
+                [name, list(labels), list(value) if isinstance(value, list) else value]
+                for (name, labels), value in self.values.items()
+                if live or not _is_livesum(self.metrics.get(name))
+            ]
+
+    def flush(self, live=True):
+        """Write this process' samples to the shared metrics directory"""
+        directory = metrics_dir()
+        if directory is None:
+            return
+        try:
+            samples = self.snapshot(live)
+            directory.mkdir(parents=True, exist_ok=True)
+            modes = {name: _mode(self.metrics.get(name)) for name, _, _ in samples}
+            _write_json(directory, self.snapshot_name, {'pid': self.pid, 'modes': modes, 'samples': samples})
+        except OSError as e:
+            logger.error(f"Error flushing metrics: {str(e)}")
+
+    def close(self):
+        """Final snapshot at exit: counters and histograms stay, live gauges go"""
+        if self.pid == os.getpid():
+            self.flush(live=False)
+
+
+def _is_livesum(metric):
+    return metric is not None and metric.kind == 'gauge' and metric.multiprocess_mode == 'livesum'
+
+
+def _mode(metric):
+    """How samples of ``metric`` merge across processes: sum, histogram, max or livesum"""
+    if metric is None:
+        return None
+    if metric.kind == 'gauge':
+        return metric.multiprocess_mode
+    return 'histogram' if metric.kind == 'histogram' else 'sum'
+
+
+def _write_json(directory, name, data):
+    tmp_path = directory / f'.{name}.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, directory / name)
+
+
+registry = _Registry()
+
+
+def metrics_dir():
+    """Directory shared by all worker processes, or None for single-process mode"""
+    from django.conf import settings
+
+    path = getattr(settings, 'LIBRARY_AI_METRICS_DIR', None)
+    return Path(path) if path else None
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _key(self, labels):
+        return (self.name, tuple(str(labels.get(label, '')) for label in self.labelnames))
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        registry.update(self._key(labels), lambda value: (value or 0) + amount)
+
+
+class Gauge(_Metric):
+    """
+    Gauge with a multiprocess aggregation mode:
+    ``livesum`` sums live processes, ``max`` keeps the largest value seen.
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), multiprocess_mode='livesum'):
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value, **labels):
+        registry.update(self._key(labels), lambda _: value)
+
+    def inc(self, amount=1, **labels):
+        registry.update(self._key(labels), lambda value: (value or 0) + amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if math.isnan(value):
+            # Falls in no bucket, and would poison _sum
+            return
+        buckets = self.buckets
+
+        def _observe(state):
+            if state is None:
+                state = [0] * len(buckets) + [0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+            return state
+
+        registry.update(self._key(labels), _observe)
+
+
+STAGE_SECONDS = Histogram(
+    'library_ai_stage_duration_seconds',
+    'Latency of instrumented hot-path stages',
+    ['stage'],
+)
+ROWS_PROCESSED = Counter(
+    'library_ai_rows_processed_total',
+    'Rows handled per stage',
+    ['stage'],
+)
+MODEL_LOAD_SECONDS = Gauge(
+    'library_ai_model_load_seconds',
+    'Time spent loading the Hugging Face pipelines',
+    multiprocess_mode='max',
+)
+CACHE_HITS = Counter(
+    'library_ai_cache_hits_total',
+    'Cache lookups served without recomputation',
+    ['cache'],
+)
+CACHE_MISSES = Counter(
+    'library_ai_cache_misses_total',
+    'Cache lookups that required recomputation',
+    ['cache'],
+)
+INFERENCE_BATCH_SIZE = Histogram(
+    'library_ai_inference_batch_size',
+    'Number of texts per transformer call',
+    ['model'],
+    buckets=SIZE_BUCKETS,
+)
+
+
+class timed:
+    """
+    Record the duration of a block or function in ``STAGE_SECONDS``.
+
+    Usable as ``with timed('parse'):`` or as ``@timed('upload_file')``.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        STAGE_SECONDS.observe(time.perf_counter() - self._start, stage=self.stage)
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+        return wrapper
+
+
+def _pid_alive(pid):
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_snapshots(directory):
+    snapshots = []
+    for path in directory.glob('*.json'):
+        try:
+            with open(path) as fh:
+                snapshots.append((path, json.load(fh)))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _merge(snapshots):
+    """
+    Sum snapshots into one mapping; ``livesum`` gauges only count while
+    their process is alive
+    """
+    merged = {}
+    for snapshot in snapshots:
+        modes = snapshot.get('modes', {})
+        alive = None
+        for name, labels, value in snapshot['samples']:
+            mode = modes.get(name) or _mode(registry.metrics.get(name))
+            if mode is None:
+                continue
+            key = (name, tuple(labels))
+            current = merged.get(key)
+            if mode == 'histogram':
+                merged[key] = value if current is None else [a + b for a, b in zip(current, value)]
+            elif mode == 'max':
+                merged[key] = value if current is None else max(current, value)
+            elif mode == 'livesum':
+                if alive is None:
+                    alive = _pid_alive(snapshot.get('pid'))
+                if alive:
+                    merged[key] = (current or 0) + value
+            else:
+                merged[key] = (current or 0) + value
+    return merged
+
+
+def compact_snapshots(directory):
+    """
+    Fold the snapshots of exited processes into ``aggregate.json``
+
+    Returns:
+        Number of snapshot files folded
+    """
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / LOCK_NAME, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            snapshots = _read_snapshots(directory)
+            aggregate = [snapshot for path, snapshot in snapshots if path.name == AGGREGATE_NAME]
+            exited = [
+                (path, snapshot) for path, snapshot in snapshots
+                if path.name != AGGREGATE_NAME and snapshot.get('pid') != os.getpid()
+                and not _pid_alive(snapshot.get('pid'))
+            ]
+            if not exited:
+                return 0
+            merged = _merge(aggregate + [snapshot for _, snapshot in exited])
+            modes = {}
+            for snapshot in aggregate + [snapshot for _, snapshot in exited]:
+                modes.update(snapshot.get('modes', {}))
+            _write_json(directory, AGGREGATE_NAME, {
+                'pid': None,
+                'modes': {name: mode for name, mode in modes.items() if mode != 'livesum'},
+                'samples': [[name, list(labels), value] for (name, labels), value in merged.items()],
+            })
+            for path, _ in exited:
+                path.unlink(missing_ok=True)
+    except OSError as e:
+        logger.error(f"Error compacting metrics snapshots: {str(e)}")
+        return 0
+    logger.info(f"Folded {len(exited)} metrics snapshots of exited processes")
+    return len(exited)
+
+
+def collect():
+    """Merge the samples of every worker process into one mapping"""
+    directory = metrics_dir()
+    if directory is None:
+        return _merge([{'pid': os.getpid(), 'samples': registry.snapshot()}])
+
+    registry.flush()
+    try:
+        with open(directory / LOCK_NAME, 'a') as lock:
+            # Never read a snapshot and the aggregate it is being folded into
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            snapshots = _read_snapshots(directory)
+    except OSError as e:
+        logger.error(f"Error reading metrics snapshots: {str(e)}")
+        snapshots = []
+    return _merge([snapshot for _, snapshot in snapshots])
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = list(zip(labelnames, labels))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def render_prometheus():
+    """Render all metrics in the Prometheus text exposition format (v0.0.4)"""
+    merged = collect()
+    lines = []
+    for name, metric in sorted(registry.metrics.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        samples = sorted((labels, value) for (metric_name, labels), value in merged.items() if metric_name == name)
+        for labels, value in samples:
+            if metric.kind == 'histogram':
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value):
+                    cumulative += count
+                    le = _format_labels(metric.labelnames, labels, ('le', _format_value(bound)))
+                    lines.append(f'{name}_bucket{le} {cumulative}')
+                label_str = _format_labels(metric.labelnames, labels)
+                lines.append(f'{name}_sum{label_str} {_format_value(value[-2])}')
+                lines.append(f'{name}_count{label_str} {value[-1]}')
+            else:
+                lines.append(f'{name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_ai', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('model_version', models.CharField(max_length=50)),
+                ('category', models.CharField(max_length=100)),
+                ('predictions', models.BigIntegerField(default=0)),
+                ('moves', models.BigIntegerField(default=0, help_text='Predictions recommending anything but Hold')),
+                ('actuals', models.BigIntegerField(default=0)),
+                ('abs_error_sum', models.FloatField(default=0)),
+                ('ape_sum', models.FloatField(default=0, help_text='Sum of absolute percentage errors (actual > 0)')),
+                ('ape_count', models.BigIntegerField(default=0)),
+                ('action_hits', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-date', 'model_version', 'category'],
+            },
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='actual_action',
+            field=models.CharField(blank=True, choices=[('Acquire', 'Acquire'), ('Hold', 'Hold'), ('Transfer', 'Transfer'), ('Deaccession', 'Deaccession')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='category',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='predicted_action',
+            field=models.CharField(blank=True, choices=[('Acquire', 'Acquire'), ('Hold', 'Hold'), ('Transfer', 'Transfer'), ('Deaccession', 'Deaccession')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='source',
+            field=models.CharField(choices=[('upload', 'Upload'), ('reprocess', 'Reprocess')], default='upload', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='book',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='library_ai.book'),
+        ),
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='prediction_date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddConstraint(
+            model_name='predictionsummary',
+            constraint=models.UniqueConstraint(fields=('date', 'model_version', 'category'), name='unique_prediction_summary'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_ai', '0002_prediction_history_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BranchStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('branch', models.CharField(db_index=True, max_length=100)),
+                ('copies', models.PositiveIntegerField(default=0)),
+                ('borrows', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='branch_stock', to='library_ai.book')),
+            ],
+            options={
+                'ordering': ['book', 'branch'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='branchstock',
+            constraint=models.UniqueConstraint(fields=('book', 'branch'), name='unique_branch_stock'),
+        ),
+    ]
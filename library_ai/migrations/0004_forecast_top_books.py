@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_ai', '0003_branch_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastTopBook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(blank=True, max_length=100)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('title', models.CharField(max_length=500)),
+                ('demand', models.FloatField()),
+            ],
+            options={
+                'ordering': ['category', 'rank'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category', '-demand'], name='book_category_demand_idx'),
+        ),
+        migrations.AddField(
+            model_name='forecasttopbook',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library_ai.book'),
+        ),
+        migrations.AddConstraint(
+            model_name='forecasttopbook',
+            constraint=models.UniqueConstraint(fields=('category', 'rank'), name='unique_forecast_rank'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_ai', '0004_forecast_top_books'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoringCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('source', models.CharField(max_length=500)),
+                ('position', models.BigIntegerField(default=0)),
+                ('rows_scored', models.BigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('finished', 'Finished')], default='running', max_length=20)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='predictionhistory',
+            name='source',
+            field=models.CharField(choices=[('upload', 'Upload'), ('reprocess', 'Reprocess'), ('bulk', 'Bulk scoring')], default='upload', max_length=20),
+        ),
+    ]
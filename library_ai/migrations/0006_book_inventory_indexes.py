@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_ai', '0005_scoring_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-demand', 'title'], name='book_demand_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category', 'action', 'demand'], name='book_facets_idx'),
+        ),
+    ]
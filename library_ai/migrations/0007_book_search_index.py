@@ -0,0 +1,32 @@
+from django.db import OperationalError, migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE library_ai_book_fts USING fts5("
+            "title, author, category, content='library_ai_book', content_rowid='id')"
+        )
+    except OperationalError:
+        # SQLite compiled without FTS5: admin search keeps using icontains
+        return
+    schema_editor.execute("INSERT INTO library_ai_book_fts(library_ai_book_fts) VALUES ('rebuild')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS library_ai_book_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_ai', '0006_book_inventory_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
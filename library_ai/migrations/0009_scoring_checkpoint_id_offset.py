@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_ai', '0008_library_registry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scoringcheckpoint',
+            name='id_offset',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
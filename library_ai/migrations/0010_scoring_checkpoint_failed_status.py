@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library_ai', '0009_scoring_checkpoint_id_offset'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scoringcheckpoint',
+            name='status',
+            field=models.CharField(choices=[('running', 'Running'), ('finished', 'Finished'), ('failed', 'Failed')], default='running', max_length=20),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('library_ai', '0010_scoring_checkpoint_failed_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='library',
+            name='members',
+            field=models.ManyToManyField(blank=True, related_name='libraries', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,206 @@
+"""
+Local model server shared by all Django workers on a node
+
+One process (``manage.py run_model_server``) owns the Hugging Face pipelines
+and answers scoring requests over a Unix domain socket, so each WSGI/ASGI
+worker no longer loads its own copy of RoBERTa and BART-large-MNLI.
+
+Wire format: every message is a 4-byte big-endian length followed by a UTF-8
+JSON document.
+
+    request:  {"texts": [...], "categories": [...], "embeddings": true}
+    response: {"sentiment": [...], "genre": [...], "embedding": "<base64>",
+               "embedding_dim": 768}  or  {"error": "..."}
+
+``embedding`` is the row-major float16 embedding matrix, base64 encoded; it
+is empty (``embedding_dim`` 0) when the request set ``"embeddings": false``.
+The client splits large batches into requests of at most ``CLIENT_CHUNK_TEXTS``
+texts, keeping every response far below ``MAX_MESSAGE_BYTES``.
+"""
+import base64
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+
+from .batching import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('>I')
+MAX_MESSAGE_BYTES = 256 * 1024 * 1024
+
+# Texts per client request; with 768-d embeddings (~2 KB per text once base64
+# encoded) a response stays under 10 MB, and the model lock is released between
+# chunks so one large upload cannot starve the other workers
+CLIENT_CHUNK_TEXTS = 4096
+
+
+class ModelServerUnavailable(Exception):
+    """Raised by the client when the model server cannot answer a request"""
+
+
+def _recv_exact(sock, size):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError('connection closed by peer')
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def send_message(sock, payload):
+    body = json.dumps(payload).encode('utf-8')
+    sock.sendall(HEADER.pack(len(body)) + body)
+
+
+def recv_message(sock):
+    (size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise ConnectionError(f'message of {size} bytes exceeds limit')
+    return json.loads(_recv_exact(sock, size).decode('utf-8'))
+
+
+class _ScoringHandler(socketserver.BaseRequestHandler):
+    """Serve scoring requests on one persistent worker connection"""
+
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                response = self.server.score(
+                    request['texts'], request['categories'], request.get('embeddings', True)
+                )
+            except Exception as e:
+                logger.error(f"Error scoring {len(request.get('texts', []))} texts: {str(e)}")
+                response = {'error': str(e)}
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+class ModelServer(socketserver.ThreadingUnixStreamServer):
+    """Unix socket server that scores book texts with one in-process predictor"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, predictor, max_batch_size=64, max_wait=0.005):
+        self.socket_path = str(socket_path)
+        self.predictor = predictor
+        self._model_lock = threading.Lock()
+        # Requests from different workers are coalesced into shared forward passes
+        self._batcher = MicroBatcher(self._score_locked, max_batch_size, max_wait)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        super().__init__(self.socket_path, _ScoringHandler)
+        os.chmod(self.socket_path, 0o660)
+
+    def score(self, texts, categories, want_embeddings=True):
+        """Score texts and build the wire response"""
+        sentiment, genre, embeddings = self._batcher.submit(texts, categories, want_embeddings=want_embeddings)
+        return {
+            'sentiment': sentiment.tolist(),
+            'genre': genre.tolist(),
+            'embedding': base64.b64encode(embeddings.astype('<f2').tobytes()).decode('ascii'),
+            'embedding_dim': embeddings.shape[1],
+        }
+
+    def _score_locked(self, texts, categories, want_embeddings=True):
+        with self._model_lock:
+            return self.predictor.score_texts_locally(texts, categories, want_embeddings=want_embeddings)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class ModelServerClient:
+    """Thin client used by ``LibraryDemandPredictor`` inside each Django worker"""
+
+    def __init__(self, socket_path, timeout=300.0):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def score(self, texts, categories, want_embeddings=True):
+        """
+        Score texts on the model server
+
+        Batches larger than ``CLIENT_CHUNK_TEXTS`` are sent as several requests.
+
+        Args:
+            texts: Book texts to score
+            categories: Category of each text
+            want_embeddings: Also compute embeddings (an extra encoder pass)
+
+        Returns:
+            Tuple of (sentiment, genre, embeddings) NumPy arrays aligned with
+            ``texts``; embeddings have 0 columns unless ``want_embeddings``
+
+        Raises:
+            ModelServerUnavailable: if the server cannot be reached or fails
+        """
+        import numpy as np
+
+        texts = list(texts)
+        categories = [str(c) for c in categories]
+        chunks = [
+            self._score_chunk(texts[start:start + CLIENT_CHUNK_TEXTS], categories[start:start + CLIENT_CHUNK_TEXTS],
+                              want_embeddings)
+            for start in range(0, len(texts), CLIENT_CHUNK_TEXTS)
+        ]
+        if not chunks:
+            return np.zeros(0), np.zeros(0), np.zeros((0, 0), dtype=np.float16)
+        if len(chunks) == 1:
+            return chunks[0]
+        return tuple(np.concatenate(parts) for parts in zip(*chunks))
+
+    def _score_chunk(self, texts, categories, want_embeddings):
+        import numpy as np
+
+        try:
+            sock = self._connection()
+            send_message(sock, {'texts': texts, 'categories': categories, 'embeddings': want_embeddings})
+            response = recv_message(sock)
+        except (OSError, ConnectionError, ValueError) as e:
+            self._reset()
+            raise ModelServerUnavailable(str(e)) from e
+
+        if 'error' in response:
+            raise ModelServerUnavailable(response['error'])
+        embeddings = np.frombuffer(base64.b64decode(response['embedding']), dtype='<f2').astype(np.float16)
+        return (
+            np.asarray(response['sentiment'], dtype=np.float64),
+            np.asarray(response['genre'], dtype=np.float64),
+            embeddings.reshape(len(texts), response['embedding_dim']),
+        )
@@ -1,7 +1,30 @@
+from django.conf import settings
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+class Library(models.Model):
+    """
+    A library system served by this deployment
+    
+    Registry rows live in the default database; each library's catalog lives
+    in its own database (see ``library_ai.tenants``). ``members`` may select
+    the library with the X-Library header and change its catalog; staff may
+    do so for every library.
+    """
+    slug = models.SlugField(max_length=63, unique=True)
+    name = models.CharField(max_length=200)
+    members = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name='libraries')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['slug']
+        verbose_name_plural = 'libraries'
+    
+    def __str__(self):
+        return self.name or self.slug
+
+
 class Book(models.Model):
     ACTIONS = [
         ('Acquire', 'Acquire'),
@@ -23,11 +46,83 @@ class Book(models.Model):
     
     class Meta:
         ordering = ['-demand', 'title']
+        indexes = [
+            models.Index(fields=['category', '-demand'], name='book_category_demand_idx'),
+            models.Index(fields=['-demand', 'title'], name='book_demand_title_idx'),
+            models.Index(fields=['category', 'action', 'demand'], name='book_facets_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.author}"
 
 
+class BranchStock(models.Model):
+    """Copies of a book held at one branch and the borrowing demand seen there"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='branch_stock')
+    branch = models.CharField(max_length=100, db_index=True)
+    copies = models.PositiveIntegerField(default=0)
+    borrows = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['book', 'branch']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'branch'], name='unique_branch_stock'),
+        ]
+    
+    def __str__(self):
+        return f"{self.book_id} @ {self.branch}: {self.copies} copies"
+
+
+class ForecastTopBook(models.Model):
+    """Highest-demand books per category (category '' ranks the whole catalog)"""
+    category = models.CharField(max_length=100, blank=True)
+    rank = models.PositiveSmallIntegerField()
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    title = models.CharField(max_length=500)
+    demand = models.FloatField()
+    
+    class Meta:
+        ordering = ['category', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'rank'], name='unique_forecast_rank'),
+        ]
+    
+    def __str__(self):
+        return f"{self.category or 'All'} #{self.rank}: {self.title}"
+
+
+class ScoringCheckpoint(models.Model):
+    """
+    Progress of a ``score_catalog`` run or a background rescore started from
+    the admin, committed with each batch of results
+    
+    ``position`` is the last Book id scored when scoring the Book table, or the
+    number of file rows consumed when scoring a file. File rows get Book id
+    ``id_offset`` + their row number.
+    """
+    STATUSES = [
+        ('running', 'Running'),
+        ('finished', 'Finished'),
+        ('failed', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=255, unique=True)
+    source = models.CharField(max_length=500)
+    position = models.BigIntegerField(default=0)
+    rows_scored = models.BigIntegerField(default=0)
+    id_offset = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUSES, default='running')
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-updated_at']
+    
+    def __str__(self):
+        return f"{self.name}: {self.rows_scored} rows ({self.status})"
+
+
 class UploadedFile(models.Model):
     file = models.FileField(upload_to='uploads/')
     filename = models.CharField(max_length=255)
@@ -40,11 +135,56 @@ class UploadedFile(models.Model):
 
 
 class PredictionHistory(models.Model):
-    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    SOURCES = [
+        ('upload', 'Upload'),
+        ('reprocess', 'Reprocess'),
+        ('bulk', 'Bulk scoring'),
+    ]
+    
+    # History outlives the books it describes: uploads replace the whole
+    # catalog, so no constraint or cascade ties rows to the current Book table
+    book = models.ForeignKey(
+        Book, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True
+    )
+    category = models.CharField(max_length=100, blank=True, default='')
     predicted_demand = models.FloatField()
+    predicted_action = models.CharField(max_length=20, choices=Book.ACTIONS, blank=True, default='')
     actual_demand = models.FloatField(null=True, blank=True)
-    prediction_date = models.DateTimeField(auto_now_add=True)
+    actual_action = models.CharField(max_length=20, choices=Book.ACTIONS, blank=True, default='')
+    prediction_date = models.DateTimeField(auto_now_add=True, db_index=True)
     model_version = models.CharField(max_length=50, default='v1.0')
+    source = models.CharField(max_length=20, choices=SOURCES, default='upload')
+    
+    class Meta:
+        ordering = ['-prediction_date']
+
+
+class PredictionSummary(models.Model):
+    """
+    Daily roll-up of prediction history per model version and category
+    
+    Maintained incrementally as predictions and actuals are recorded, and by
+    ``compact_prediction_history`` for raw rows past the retention window, so
+    accuracy KPIs never scan the raw history table.
+    """
+    date = models.DateField()
+    model_version = models.CharField(max_length=50)
+    category = models.CharField(max_length=100)
+    predictions = models.BigIntegerField(default=0)
+    moves = models.BigIntegerField(default=0, help_text="Predictions recommending anything but Hold")
+    actuals = models.BigIntegerField(default=0)
+    abs_error_sum = models.FloatField(default=0)
+    ape_sum = models.FloatField(default=0, help_text="Sum of absolute percentage errors (actual > 0)")
+    ape_count = models.BigIntegerField(default=0)
+    action_hits = models.BigIntegerField(default=0)
     
     class Meta:
-        ordering = ['-prediction_date']
\ No newline at end of file
+        ordering = ['-date', 'model_version', 'category']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'model_version', 'category'], name='unique_prediction_summary'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} {self.model_version} {self.category}"
\ No newline at end of file
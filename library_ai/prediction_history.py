@@ -0,0 +1,294 @@
+"""
+Persisted prediction history and accuracy KPIs
+
+Every upload and reprocess run appends one ``PredictionHistory`` row per book.
+Alongside the raw rows, ``PredictionSummary`` keeps per-day counters for each
+model version and category (predictions, moves, actuals, summed errors and
+action hits). The counters are bumped with one upsert per group in the same
+transaction as the raw writes, so MAE, MAPE, hit rate and the dashboard KPIs
+are read from a table whose size grows with days x versions x categories
+rather than with the number of predictions. ``compact_history`` then drops
+raw rows past the retention window without losing the aggregates.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .metrics import ROWS_PROCESSED, timed
+from .models import PredictionHistory, PredictionSummary
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT/UPDATE/DELETE statement for history writes
+HISTORY_BATCH_SIZE = 1000
+
+# Raw history rows older than this are deleted by compaction
+DEFAULT_RETENTION_DAYS = 90
+
+SUMMARY_COUNTERS = [
+    'predictions', 'moves', 'actuals', 'abs_error_sum', 'ape_sum', 'ape_count', 'action_hits',
+]
+
+
+def _upsert_summaries(rows):
+    """
+    Add counter deltas to ``PredictionSummary``, creating missing rows
+
+    Args:
+        rows: Iterable of (date, model_version, category, *SUMMARY_COUNTERS) tuples
+    """
+    rows = [(day.isoformat(), version, category, *counters) for day, version, category, *counters in rows]
+    if not rows:
+        return
+    # The summaries live in the current library's database
+    connection = connections[router.db_for_write(PredictionSummary)]
+    table = connection.ops.quote_name(PredictionSummary._meta.db_table)
+    columns = ['date', 'model_version', 'category', *SUMMARY_COUNTERS]
+    updates = ', '.join(f'{name} = {table}.{name} + excluded.{name}' for name in SUMMARY_COUNTERS)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT (date, model_version, category) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _local_dates(timestamps):
+    """Calendar dates of a datetime Series in the current time zone"""
+    import pandas as pd
+
+    stamps = pd.to_datetime(timestamps, utc=True).dt.tz_convert(timezone.get_current_timezone_name())
+    return stamps.dt.date
+
+
+@timed('record_predictions')
+def record_predictions(predictions, book_ids, model_version, source='upload'):
+    """
+    Append one history row per prediction and bump the daily summaries
+
+    Args:
+        predictions: DataFrame from ``predict_demand_frame``
+        book_ids: Sequence of Book primary keys aligned with ``predictions``
+            (entries may be None when the database does not return them)
+        model_version: Version tag of the predictor that produced the rows
+        source: 'upload', 'reprocess' or 'bulk'
+
+    Returns:
+        Number of history rows written
+    """
+    if not len(predictions):
+        return 0
+
+    categories = predictions['category'].astype(str)
+    actions = predictions['action'].astype(str)
+    rows = [
+        PredictionHistory(
+            book_id=book_id, category=category, predicted_demand=demand, predicted_action=action,
+            model_version=model_version, source=source,
+        )
+        for book_id, category, demand, action in zip(
+            book_ids, categories.tolist(), predictions['demand'].tolist(), actions.tolist()
+        )
+    ]
+
+    grouped = (actions != 'Hold').groupby(categories, sort=False).agg(['size', 'sum'])
+
+    with transaction.atomic(using=router.db_for_write(PredictionHistory)):
+        PredictionHistory.objects.bulk_create(rows, batch_size=HISTORY_BATCH_SIZE)
+        # auto_now_add stamped the rows; bucket the summary on the same clock
+        day = timezone.localdate(rows[0].prediction_date)
+        _upsert_summaries(
+            (day, model_version, category, int(size), int(moves), 0, 0.0, 0.0, 0, 0)
+            for category, size, moves in zip(grouped.index.tolist(), grouped['size'].tolist(), grouped['sum'].tolist())
+        )
+    ROWS_PROCESSED.inc(len(rows), stage='record_predictions')
+    return len(rows)
+
+
+@timed('record_actuals')
+def record_actuals(actuals):
+    """
+    Attach observed demand/actions to the latest open prediction of each book
+
+    Args:
+        actuals: List of dictionaries with ``book_id``, ``actual_demand`` and
+            optional ``actual_action``
+
+    Returns:
+        Dictionary with the number of rows ``matched`` and ``unmatched``
+    """
+    import numpy as np
+    import pandas as pd
+
+    observed = pd.DataFrame.from_records(actuals, columns=['book_id', 'actual_demand', 'actual_action'])
+    observed['book_id'] = pd.to_numeric(observed['book_id'], errors='coerce')
+    observed['actual_demand'] = pd.to_numeric(observed['actual_demand'], errors='coerce')
+    observed['actual_action'] = observed['actual_action'].fillna('').astype(str)
+    observed = observed.dropna(subset=['book_id', 'actual_demand']).drop_duplicates('book_id', keep='last')
+    if observed.empty:
+        return {'matched': 0, 'unmatched': len(actuals)}
+
+    columns = ['id', 'book_id', 'category', 'predicted_demand', 'predicted_action', 'model_version', 'prediction_date']
+    book_ids = observed['book_id'].astype('int64').tolist()
+    with transaction.atomic(using=router.db_for_write(PredictionHistory)):
+        # One query per batch of books keeps each IN list under SQLite's variable limit
+        open_rows = pd.DataFrame.from_records(
+            [
+                row
+                for start in range(0, len(book_ids), HISTORY_BATCH_SIZE)
+                for row in PredictionHistory.objects
+                .filter(book_id__in=book_ids[start:start + HISTORY_BATCH_SIZE], actual_demand__isnull=True)
+                .order_by('-prediction_date', '-id')
+                .values_list(*columns)
+            ],
+            columns=columns,
+        ).drop_duplicates('book_id')
+        if open_rows.empty:
+            return {'matched': 0, 'unmatched': len(actuals)}
+
+        merged = open_rows.merge(observed.astype({'book_id': 'int64'}), on='book_id')
+        abs_error = (merged['predicted_demand'] - merged['actual_demand']).abs()
+        has_ape = merged['actual_demand'] > 0
+        merged['abs_error'] = abs_error
+        merged['ape'] = np.where(has_ape, abs_error / merged['actual_demand'].where(has_ape, 1), 0.0)
+        merged['has_ape'] = has_ape.astype('int64')
+        merged['hit'] = (
+            (merged['actual_action'] != '') & (merged['actual_action'] == merged['predicted_action'])
+        ).astype('int64')
+        merged['date'] = _local_dates(merged['prediction_date'])
+
+        PredictionHistory.objects.bulk_update(
+            [
+                PredictionHistory(id=row_id, actual_demand=demand, actual_action=action)
+                for row_id, demand, action in zip(
+                    merged['id'].tolist(), merged['actual_demand'].tolist(), merged['actual_action'].tolist()
+                )
+            ],
+            ['actual_demand', 'actual_action'],
+            batch_size=HISTORY_BATCH_SIZE,
+        )
+
+        grouped = merged.groupby(['date', 'model_version', 'category'], sort=False).agg(
+            actuals=('id', 'size'),
+            abs_error_sum=('abs_error', 'sum'),
+            ape_sum=('ape', 'sum'),
+            ape_count=('has_ape', 'sum'),
+            action_hits=('hit', 'sum'),
+        )
+        _upsert_summaries(
+            (day, version, category, 0, 0, int(count), float(abs_sum), float(ape_sum), int(ape_count), int(hits))
+            for (day, version, category), count, abs_sum, ape_sum, ape_count, hits in zip(
+                grouped.index.tolist(),
+                grouped['actuals'].tolist(),
+                grouped['abs_error_sum'].tolist(),
+                grouped['ape_sum'].tolist(),
+                grouped['ape_count'].tolist(),
+                grouped['action_hits'].tolist(),
+            )
+        )
+    ROWS_PROCESSED.inc(len(merged), stage='record_actuals')
+    return {'matched': len(merged), 'unmatched': len(actuals) - len(merged)}
+
+
+def _accuracy(totals):
+    actuals = totals['actuals'] or 0
+    ape_count = totals['ape_count'] or 0
+    return {
+        'predictions': totals['predictions'] or 0,
+        'actuals': actuals,
+        'mae': round(totals['abs_error_sum'] / actuals, 2) if actuals else None,
+        'mape': round(100 * totals['ape_sum'] / ape_count, 2) if ape_count else None,
+        'action_hit_rate': round(100 * totals['action_hits'] / actuals, 2) if actuals else None,
+    }
+
+
+def accuracy_report(model_version=None, days=None):
+    """
+    MAE, MAPE and action hit rate per model version and category
+
+    Args:
+        model_version: Restrict to one model version
+        days: Restrict to predictions made in the last ``days`` days
+
+    Returns:
+        List of dictionaries with model_version, category, predictions,
+        actuals, mae, mape (%) and action_hit_rate (%)
+    """
+    summaries = PredictionSummary.objects.all()
+    if model_version:
+        summaries = summaries.filter(model_version=model_version)
+    if days:
+        summaries = summaries.filter(date__gte=timezone.localdate() - timedelta(days=days))
+
+    totals = (
+        summaries.values('model_version', 'category')
+        .annotate(**{name: Sum(name) for name in SUMMARY_COUNTERS})
+        .order_by('model_version', 'category')
+    )
+    return [
+        {'model_version': row['model_version'], 'category': row['category'], **_accuracy(row)}
+        for row in totals
+    ]
+
+
+def dashboard_kpis(model_version):
+    """
+    Accuracy, move rate and equity KPIs for the dashboard
+
+    accuracy is 100 - MAPE over all recorded actuals of ``model_version``;
+    move_rate is the share of the latest day's predictions that recommend
+    moving stock (anything but Hold); equity is the worst category accuracy
+    as a percentage of the best one. KPIs without data are 0.
+
+    Returns:
+        Dictionary with accuracy, move_rate and equity percentages
+    """
+    summaries = PredictionSummary.objects.filter(model_version=model_version)
+    kpis = {'accuracy': 0, 'move_rate': 0, 'equity': 0}
+
+    totals = summaries.aggregate(ape_sum=Sum('ape_sum'), ape_count=Sum('ape_count'))
+    if totals['ape_count']:
+        kpis['accuracy'] = round(max(0.0, 100 - 100 * totals['ape_sum'] / totals['ape_count']), 2)
+
+    latest = summaries.filter(predictions__gt=0).aggregate(date=Max('date'))['date']
+    if latest is not None:
+        day = summaries.filter(date=latest).aggregate(predictions=Sum('predictions'), moves=Sum('moves'))
+        kpis['move_rate'] = round(100 * day['moves'] / day['predictions'], 1)
+
+    by_category = (
+        summaries.filter(ape_count__gt=0).values('category')
+        .annotate(ape_sum=Sum('ape_sum'), ape_count=Sum('ape_count'))
+    )
+    accuracies = [max(0.0, 100 - 100 * row['ape_sum'] / row['ape_count']) for row in by_category]
+    if accuracies and max(accuracies) > 0:
+        kpis['equity'] = round(100 * min(accuracies) / max(accuracies), 1)
+    return kpis
+
+
+@timed('compact_prediction_history')
+def compact_history(retention_days=DEFAULT_RETENTION_DAYS, batch_size=HISTORY_BATCH_SIZE):
+    """
+    Delete raw history rows older than the retention window
+
+    Their counts and errors already live in ``PredictionSummary``; rows are
+    deleted in primary-key batches so each transaction stays short.
+
+    Returns:
+        Number of rows deleted
+    """
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted = 0
+    while True:
+        ids = list(
+            PredictionHistory.objects.filter(prediction_date__lt=cutoff)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        deleted += PredictionHistory.objects.filter(id__in=ids).delete()[0]
+    if deleted:
+        logger.info(f"Compacted {deleted} prediction history rows older than {retention_days} days")
+    return deleted
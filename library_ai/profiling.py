@@ -0,0 +1,290 @@
+"""
+On-demand request profiling for the library_ai API
+
+A staff user triggers profiling for a single request by sending the
+``X-Profile-Request: 1`` header or the ``?profile=1`` query flag. The request
+then runs under cProfile while a sampling thread records its call stacks. Both
+results are stored under ``MEDIA_ROOT/profiles``:
+
+* ``<id>.prof``      - pstats dump (``python -m pstats``, snakeviz, ...)
+* ``<id>.collapsed`` - collapsed stacks (``flamegraph.pl``, speedscope)
+* ``<id>.json``      - request metadata shown in the admin profile list
+
+Requests without the trigger only pay for a header and query-string lookup.
+One request is profiled at a time per process: cProfile cannot run two
+profilers at once, so a profiling request that arrives while another is being
+profiled runs unprofiled.
+
+Under ASGI the request's work mostly runs in ``run_heavy`` jobs. A job started
+by the profiled request is profiled and sampled on its executor thread, and
+its results are merged into the request's profile; its stacks are prefixed
+with ``heavy-executor``.
+"""
+import cProfile
+import json
+import logging
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE_REQUEST'
+PROFILE_QUERY_FLAG = 'profile=1'
+PROFILED_PATH_PREFIX = '/api/'
+PROFILE_ID_RE = re.compile(r'^[\w.-]+$')
+
+# Held while a request is being profiled
+_profiling = threading.Lock()
+
+# Collects the heavy-executor jobs of the request being profiled
+_job_profiles = ContextVar('library_ai_job_profiles', default=None)
+
+# Root frame of the collapsed stacks sampled in heavy-executor jobs
+JOB_STACK_ROOT = 'heavy-executor'
+
+
+def profiles_dir():
+    return Path(settings.MEDIA_ROOT) / 'profiles'
+
+
+class StackSampler(threading.Thread):
+    """Periodically sample the call stack of one thread into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{Path(code.co_filename).name}:{code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class _JobProfiles:
+    """Profiles of the heavy-executor jobs run for one profiled request"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.profiles = []
+        self.closed = False
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            return list(self.profiles)
+
+
+@contextmanager
+def profile_job():
+    """Profile a heavy-executor job on its own thread if its request is being profiled"""
+    jobs = _job_profiles.get()
+    profiler = None
+    if jobs is not None and not jobs.closed:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            logger.info(f"Heavy job not profiled: {str(e)}")
+            profiler = None
+    if profiler is None:
+        yield
+        return
+
+    sampler = StackSampler(threading.get_ident(), jobs.interval)
+    sampler.start()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        sampler.stop()
+        with jobs.lock:
+            if not jobs.closed:
+                jobs.profiles.append((profiler, sampler))
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile individual API requests when a staff user asks for it
+
+    Works in both WSGI and ASGI stacks. Under ASGI the profiler follows the
+    event loop thread, so the loop part of the profile covers everything the
+    loop ran while the request was in flight, including other requests. Work
+    the request hands to the heavy executor is profiled on its own thread and
+    merged in (see ``profile_job``).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_interval = getattr(settings, 'LIBRARY_AI_PROFILE_SAMPLE_INTERVAL', 0.005)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self._is_requested(request) or not self._is_staff(request):
+            return self.get_response(request)
+        return self._profile(request)
+
+    async def __acall__(self, request):
+        # The lazy user is loaded from the session with a synchronous query
+        if not self._is_requested(request) or not await sync_to_async(self._is_staff)(request):
+            return await self.get_response(request)
+        return await self._aprofile(request)
+
+    def _is_staff(self, request):
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def _is_requested(self, request):
+        meta = request.META
+        if meta.get(PROFILE_HEADER) != '1' and PROFILE_QUERY_FLAG not in meta.get('QUERY_STRING', ''):
+            return False
+        return request.path.startswith(PROFILED_PATH_PREFIX) and (
+            meta.get(PROFILE_HEADER) == '1' or request.GET.get('profile') == '1'
+        )
+
+    def _start(self):
+        """Start cProfile and the stack sampler, or return None if another profile is running"""
+        if not _profiling.acquire(blocking=False):
+            logger.info("Request profile skipped: another request is being profiled")
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError as e:
+            # Another tool's profiler holds the interpreter's profiling hook
+            _profiling.release()
+            logger.info(f"Request profile skipped: {str(e)}")
+            return None
+        sampler = StackSampler(threading.get_ident(), self.sample_interval)
+        sampler.start()
+        return profiler, sampler
+
+    def _stop(self, profiler, sampler):
+        profiler.disable()
+        sampler.stop()
+        _profiling.release()
+
+    def _profile(self, request):
+        started = self._start()
+        if started is None:
+            return self.get_response(request)
+        profiler, sampler = started
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self._stop(profiler, sampler)
+        return self._finish(request, response, profiler, sampler, started_at, time.perf_counter() - start)
+
+    async def _aprofile(self, request):
+        started = self._start()
+        if started is None:
+            return await self.get_response(request)
+        profiler, sampler = started
+        jobs = _JobProfiles(self.sample_interval)
+        token = _job_profiles.set(jobs)
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _job_profiles.reset(token)
+            self._stop(profiler, sampler)
+        return self._finish(
+            request, response, profiler, sampler, started_at, time.perf_counter() - start, jobs.close(),
+        )
+
+    def _finish(self, request, response, profiler, sampler, started_at, duration, jobs=()):
+        try:
+            profile_id = self._store(request, response, profiler, sampler, started_at, duration, jobs)
+            response['X-Profile-Id'] = profile_id
+        except OSError as e:
+            logger.error(f"Error storing request profile: {str(e)}")
+        return response
+
+    def _store(self, request, response, profiler, sampler, started_at, duration, jobs=()):
+        directory = profiles_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+
+        slug = re.sub(r'[^\w]+', '-', request.path).strip('-') or 'root'
+        profile_id = f"{started_at.strftime('%Y%m%dT%H%M%S%f')}-{request.method.lower()}-{slug}"
+
+        stats = pstats.Stats(profiler)
+        stacks = Counter(sampler.stacks)
+        for job_profiler, job_sampler in jobs:
+            stats.add(job_profiler)
+            for stack, count in job_sampler.stacks.items():
+                stacks[f'{JOB_STACK_ROOT};{stack}'] += count
+        stats.dump_stats(directory / f'{profile_id}.prof')
+        (directory / f'{profile_id}.collapsed').write_text(
+            ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+        )
+        (directory / f'{profile_id}.json').write_text(json.dumps({
+            'id': profile_id,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'user': request.user.get_username(),
+            'status': response.status_code,
+            'started_at': started_at.isoformat(),
+            'duration_ms': round(duration * 1000, 2),
+            'samples': sum(stacks.values()),
+            'heavy_jobs': len(jobs),
+            # Under ASGI cProfile saw the whole event loop, not just this request
+            'scope': 'event loop' if self.is_async else 'request',
+        }))
+        logger.info(f"Stored request profile {profile_id} ({duration * 1000:.1f} ms)")
+        return profile_id
+
+
+def list_profiles():
+    """Metadata of stored profiles, newest first"""
+    directory = profiles_dir()
+    if not directory.exists():
+        return []
+    profiles = []
+    for path in directory.glob('*.json'):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda p: p.get('started_at', ''), reverse=True)
+
+
+def profile_file(profile_id, kind):
+    """Path of a stored profile artifact, or None if it does not exist"""
+    if kind not in ('prof', 'collapsed') or not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = profiles_dir() / f'{profile_id}.{kind}'
+    return path if path.exists() else None
@@ -0,0 +1,116 @@
+"""
+Full-text index over book titles, authors and categories for admin search
+
+On SQLite the catalog is mirrored into an FTS5 table (``library_ai_book_fts``,
+external content over ``library_ai_book``). The admin looks up matching books
+by rowid there instead of running ``icontains`` over three columns of every
+row. The table holds only the inverted index. Like the forecast index it is
+rebuilt after operations that replace the catalog: an upload, a clear, or a
+``score_catalog`` run over a file. Admin edits update their own rows.
+
+Search terms match words by prefix ("tolk" finds "Tolkien"), not arbitrary
+substrings. On other databases, or a SQLite build without FTS5,
+``search_index_available`` is False and the admin keeps Django's default
+search.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+
+from .metrics import timed
+from .models import Book
+
+SEARCH_TABLE = 'library_ai_book_fts'
+
+# Book columns mirrored into the index, in index column order
+SEARCH_COLUMNS = ['title', 'author', 'category']
+
+# Per database alias: whether the FTS table exists there
+_available = {}
+
+
+def _connection():
+    return connections[router.db_for_write(Book)]
+
+
+def search_index_available():
+    """Whether book search can use the FTS table on the catalog's database"""
+    connection = _connection()
+    if connection.alias not in _available:
+        _available[connection.alias] = (
+            connection.vendor == 'sqlite' and SEARCH_TABLE in connection.introspection.table_names()
+        )
+    return _available[connection.alias]
+
+
+@timed('rebuild_search_index')
+def rebuild_search_index():
+    """Re-read the whole Book table into the index after the catalog was replaced"""
+    if not search_index_available():
+        return False
+    with _connection().cursor() as cursor:
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def _delete_rows(cursor, rows):
+    # External-content tables need the indexed values to remove a row's tokens
+    cursor.executemany(
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {', '.join(SEARCH_COLUMNS)}) "
+        f"VALUES ('delete', %s, %s, %s, %s)",
+        rows,
+    )
+
+
+def index_book(book, previous=None):
+    """
+    Bring one book's index entry up to date after it was saved
+
+    Args:
+        book: The saved Book
+        previous: Mapping with the title, author and category the book was
+            indexed under (None for a new book)
+    """
+    if not search_index_available():
+        return
+    with _connection().cursor() as cursor:
+        if previous is not None:
+            _delete_rows(cursor, [[book.pk] + [previous[column] for column in SEARCH_COLUMNS]])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (%s, %s, %s, %s)",
+            [book.pk] + [getattr(book, column) for column in SEARCH_COLUMNS],
+        )
+
+
+def unindex_books(books):
+    """Remove books that are about to be deleted from the index"""
+    if not search_index_available():
+        return
+    rows = [list(row) for row in books.values_list('id', *SEARCH_COLUMNS)]
+    with _connection().cursor() as cursor:
+        _delete_rows(cursor, rows)
+
+
+def match_expression(term):
+    """FTS5 query requiring every word of ``term`` as a word prefix, or None"""
+    words = re.findall(r'\w+', term)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_books(books, term):
+    """
+    Narrow a Book queryset to the books matching a search term
+
+    Returns:
+        The filtered queryset, or None when the index cannot answer the term
+        (no index, or a term without any word characters)
+    """
+    expression = match_expression(term)
+    if expression is None or not search_index_available():
+        return None
+    return books.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [expression])
+    )
@@ -0,0 +1,266 @@
+"""
+Library (tenant) partitioning of the catalog
+
+One deployment serves many library systems. Each library registered in the
+``Library`` table of the default database gets its own SQLite file,
+``LIBRARY_AI_LIBRARIES_DIR/<slug>.sqlite3``. That file holds the library's
+books, branch stock, uploads, prediction history and summaries, and its
+forecast and search indexes. An upload or reprocessing run for one library
+therefore never locks, scans or wipes another's data.
+
+The current library is a context variable:
+- ``LibraryMiddleware`` sets it per request, from the ``X-Library`` header or
+  the first label of the host name (``<slug>.example.org``). The header, and
+  changes to a library's data, are limited to staff and the library's
+  ``members``.
+- Commands and scripts set it with ``using_library``.
+- ``run_heavy`` and ``sync_to_async`` copy the context into their threads.
+
+``LibraryRouter`` sends every library_ai model except ``Library`` (and its
+members) to the current library's database. Requests without a library keep using the default
+database, so a single-library deployment behaves as before.
+
+Known libraries are cached in the process. Selecting one per request costs a
+header lookup, a dict lookup and a context variable set, plus one indexed
+membership query for users who are neither anonymous nor staff.
+"""
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_HEADER = 'HTTP_X_LIBRARY'
+
+# Methods anyone may send to a library selected by host name
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Slugs double as file names, database aliases and host name labels
+SLUG_RE = re.compile(r'^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?$')
+
+# Minimum seconds between registry reloads triggered by unknown slugs
+REGISTRY_REFRESH_SECONDS = 5.0
+
+_current = ContextVar('library_ai_library', default=None)
+
+_lock = threading.Lock()
+_known = set()
+_loaded_at = None
+
+
+def current_library():
+    """Slug of the library this context works on, or None for the default database"""
+    return _current.get()
+
+
+def library_alias(slug):
+    return f'library_{slug}'
+
+
+def library_database_path(slug):
+    from django.conf import settings
+
+    directory = getattr(settings, 'LIBRARY_AI_LIBRARIES_DIR', Path(settings.BASE_DIR) / 'var' / 'libraries')
+    return Path(directory) / f'{slug}.sqlite3'
+
+
+def register_library_database(slug):
+    """Add the library's SQLite file to ``connections`` (once per process) and return its alias"""
+    alias = library_alias(slug)
+    if alias in connections.settings:
+        return alias
+    with _lock:
+        if alias not in connections.settings:
+            path = library_database_path(slug)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            config = connections.configure_settings({
+                DEFAULT_DB_ALIAS: dict(connections.settings[DEFAULT_DB_ALIAS]),
+                alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(path)},
+            })[alias]
+            connections.settings[alias] = config
+            logger.info(f"Library '{slug}' uses database {path}")
+    return alias
+
+
+def _load_registry():
+    global _known, _loaded_at
+    from .models import Library
+
+    _known = set(Library.objects.using(DEFAULT_DB_ALIAS).values_list('slug', flat=True))
+    _loaded_at = time.monotonic()
+
+
+def _registry_stale():
+    return _loaded_at is None or time.monotonic() - _loaded_at >= REGISTRY_REFRESH_SECONDS
+
+
+def is_known_library(slug):
+    """
+    Whether ``slug`` is a registered library
+
+    Answered from the process's copy of the registry. An unknown slug reloads
+    the copy, at most every REGISTRY_REFRESH_SECONDS, so libraries created by
+    other processes are picked up without a query per request.
+    """
+    if slug in _known:
+        return True
+    if _registry_stale():
+        with _lock:
+            if _registry_stale():
+                _load_registry()
+    return slug in _known
+
+
+def forget_registry():
+    """Drop the cached registry (after creating or deleting a library)"""
+    global _loaded_at
+    _loaded_at = None
+
+
+@contextmanager
+def using_library(slug):
+    """
+    Route catalog queries in this context to ``slug``'s database (None: default)
+
+    Raises:
+        LookupError: if ``slug`` is not a registered library
+    """
+    if slug is not None:
+        if not is_known_library(slug):
+            raise LookupError(f"Unknown library '{slug}'")
+        register_library_database(slug)
+    token = _current.set(slug)
+    try:
+        yield slug
+    finally:
+        _current.reset(token)
+
+
+def can_access_library(user, slug):
+    """Whether ``user`` is staff or a member of library ``slug``"""
+    from .models import Library
+
+    if user is None or not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+    return Library.members.through.objects.using(DEFAULT_DB_ALIAS).filter(
+        library__slug=slug, user_id=user.pk,
+    ).exists()
+
+
+class LibraryRouter:
+    """Route the catalog models to the current library's database"""
+
+    app_label = 'library_ai'
+    # Models that stay in the default database for every library
+    shared_models = {'library', 'library_members'}
+
+    def _route(self, model):
+        if model._meta.app_label != self.app_label or model._meta.model_name in self.shared_models:
+            return None
+        slug = _current.get()
+        return library_alias(slug) if slug is not None else None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not db.startswith('library_'):
+            return None
+        # Library databases hold the catalog models and nothing else
+        return app_label == self.app_label and model_name not in self.shared_models
+
+
+class LibraryMiddleware:
+    """
+    Select the library a request works on, and check the user may use it
+
+    ``X-Library: <slug>`` wins, but only staff and the library's members may
+    send it: anyone else gets a 403, and a slug naming no registered library a
+    404. Without the header, the first label of the host name is used if it is
+    a registered library; anyone may read it there, while requests that change
+    data (anything but GET, HEAD and OPTIONS) need the same access. Other
+    requests run against the default database.
+
+    Must come after ``AuthenticationMiddleware``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        slug, restricted, error = self._resolve(request)
+        if error is None and restricted and not can_access_library(getattr(request, 'user', None), slug):
+            error = self._forbidden(slug)
+        if error is not None:
+            return error
+        token = self._enter(request, slug)
+        try:
+            return self.get_response(request)
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        candidate = request.META.get(LIBRARY_HEADER) or self._host_label(request)
+        if candidate is not None and candidate not in _known and _registry_stale():
+            # Reload the registry off the event loop; _resolve then answers from memory
+            await sync_to_async(is_known_library)(candidate)
+        slug, restricted, error = self._resolve(request)
+        # Loading the user touches the session and auth tables
+        if error is None and restricted and not await sync_to_async(can_access_library)(
+            getattr(request, 'user', None), slug
+        ):
+            error = self._forbidden(slug)
+        if error is not None:
+            return error
+        token = self._enter(request, slug)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+    def _host_label(self, request):
+        host = request.get_host().split(':', 1)[0]
+        label, dot, _ = host.partition('.')
+        return label if dot and SLUG_RE.match(label) else None
+
+    def _resolve(self, request):
+        """(slug or None, whether the user's access must be checked, error response or None)"""
+        slug = request.META.get(LIBRARY_HEADER)
+        if slug:
+            if not SLUG_RE.match(slug) or not is_known_library(slug):
+                return None, False, JsonResponse({'error': f"Unknown library '{slug}'"}, status=404)
+            return slug, True, None
+        label = self._host_label(request)
+        if label is not None and is_known_library(label):
+            return label, request.method not in SAFE_METHODS, None
+        return None, False, None
+
+    def _forbidden(self, slug):
+        return JsonResponse({'error': f"You do not have access to library '{slug}'"}, status=403)
+
+    def _enter(self, request, slug):
+        request.library = slug
+        if slug is not None:
+            register_library_database(slug)
+        return _current.set(slug)
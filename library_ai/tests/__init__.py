@@ -0,0 +1,41 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from django.test import override_settings
+
+
+def stub_scores(texts, categories, want_embeddings=True):
+    """Deterministic stand-in for ``demand_predictor.score_texts`` (no model downloads)"""
+    return np.full(len(texts), 0.6), np.full(len(texts), 0.4)
+
+
+def isolate_files(test_case):
+    """
+    Point uploads, embedding stores and library databases at a temporary
+    directory and stub out the models for the rest of ``test_case``
+
+    Returns:
+        The temporary directory
+    """
+    from library_ai import embeddings
+    from library_ai.ai_models import demand_predictor
+
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    path = Path(directory.name)
+    settings = override_settings(
+        MEDIA_ROOT=str(path / 'media'),
+        LIBRARY_AI_EMBEDDINGS_DIR=str(path / 'embeddings'),
+        LIBRARY_AI_LIBRARIES_DIR=str(path / 'libraries'),
+    )
+    settings.enable()
+    test_case.addCleanup(settings.disable)
+    for patch in (
+        mock.patch.dict(embeddings._stores, clear=True),
+        mock.patch.object(demand_predictor, 'score_texts', stub_scores),
+    ):
+        patch.start()
+        test_case.addCleanup(patch.stop)
+    return path
@@ -0,0 +1,107 @@
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, SimpleTestCase
+
+from library_ai import api_views
+from library_ai.activity import ActivityMetrics, _Ring, parse_event
+
+# An hour boundary, so minute and hour slots line up
+START = 3600 * 500_000
+
+
+class FakeClock:
+    def __init__(self, now=START):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ActivityRingTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.metrics = ActivityMetrics(clock=self.clock)
+
+    def borrows(self):
+        snapshot = self.metrics.snapshot()
+        return snapshot['last_hour']['borrows'], snapshot['last_day']['borrows']
+
+    def test_events_expire_from_each_window(self):
+        self.metrics.record('borrow', user=1, category='Fiction', title='Dune')
+        self.assertEqual(self.borrows(), (1, 1))
+
+        self.clock.now += 61 * 60
+        self.assertEqual(self.borrows(), (0, 1))
+        self.assertEqual(self.metrics.snapshot()['last_hour']['by_category'], {})
+
+        self.clock.now += 24 * 3600
+        self.assertEqual(self.borrows(), (0, 0))
+        self.assertEqual(self.metrics.snapshot()['last_day']['by_category'], {})
+
+    def test_reused_slot_drops_what_it_held(self):
+        self.metrics.record('borrow', category='Fiction', duration=10)
+        # Same minute slot one hour later
+        self.clock.now += 3600
+        self.metrics.record('borrow', category='History', duration=30)
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['last_hour']['borrows'], 1)
+        self.assertEqual(snapshot['last_hour']['by_category'], {'History': 1})
+        self.assertEqual(snapshot['last_hour']['avg_duration'], 30)
+        self.assertEqual(snapshot['last_day']['borrows'], 2)
+        self.assertEqual(snapshot['last_day']['avg_duration'], 20)
+
+    def test_old_and_future_timestamps(self):
+        self.assertFalse(self.metrics.record('borrow', timestamp=START - 25 * 3600))
+        self.assertTrue(self.metrics.record('borrow', timestamp=START - 2 * 3600))
+        self.assertTrue(self.metrics.record('return', timestamp=START + 3600))
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual((snapshot['last_hour']['borrows'], snapshot['last_hour']['returns']), (0, 1))
+        self.assertEqual(snapshot['last_day']['borrows'], 1)
+        self.assertEqual(snapshot['recent'][0]['timestamp'], START)
+
+    def test_older_period_never_recycles_a_newer_slot(self):
+        ring = _Ring(60, 60)
+        ring.record(100, 'borrow', None, 'Fiction', 'Dune', None)
+
+        # Period 40 maps onto period 100's slot
+        self.assertIsNone(ring.slot(40))
+        self.assertFalse(ring.record(40, 'borrow', None, 'History', '', None))
+        self.assertEqual(ring.events['borrow'], 1)
+        self.assertEqual(ring.categories, {'Fiction': 1})
+        self.assertEqual(ring.slots[100 % 60].period, 100)
+
+    def test_parse_event_validates_type(self):
+        self.assertEqual(parse_event({'type': 'borrow', 'user_id': 7})['user'], 7)
+        with self.assertRaises(ValueError):
+            parse_event({'type': 'renew'})
+
+    def test_parse_event_rejects_non_finite_numbers(self):
+        self.assertEqual(parse_event({'type': 'return', 'duration_minutes': '12.5'})['duration'], 12.5)
+        for event in (
+            {'type': 'return', 'duration_minutes': 'nan'},
+            {'type': 'return', 'duration_minutes': float('inf')},
+            {'type': 'borrow', 'timestamp': float('-inf')},
+        ):
+            with self.subTest(event=event), self.assertRaises(ValueError):
+                parse_event(event)
+
+
+class RecordActivityEventsTests(SimpleTestCase):
+    def test_a_non_finite_event_rejects_the_whole_batch(self):
+        metrics = ActivityMetrics(clock=FakeClock())
+        body = json.dumps({'events': [
+            {'type': 'borrow', 'user_id': 1, 'category': 'Fiction'},
+            {'type': 'return', 'user_id': 1, 'timestamp': float('-inf')},
+        ]})
+        request = AsyncRequestFactory().post('/api/activity-events/', body, content_type='application/json')
+
+        with mock.patch.object(api_views, 'activity_metrics', return_value=metrics):
+            response = async_to_sync(api_views.record_activity_events)(request)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('timestamp', json.loads(response.content)['error'])
+        self.assertEqual(metrics.snapshot()['last_hour']['borrows'], 0)
@@ -0,0 +1,89 @@
+import time
+from unittest import mock
+
+from django.contrib import admin, messages
+from django.test import RequestFactory, TransactionTestCase, override_settings
+
+from library_ai import admission
+from library_ai.admin import BookAdmin
+from library_ai.admission import controller
+from library_ai.models import Book, PredictionHistory, ScoringCheckpoint
+
+from . import isolate_files
+
+
+def wait_for_checkpoint(status, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        checkpoint = ScoringCheckpoint.objects.first()
+        if checkpoint is not None and checkpoint.status == status:
+            return checkpoint
+        time.sleep(0.05)
+    raise AssertionError(f'no checkpoint reached {status!r} within {timeout}s')
+
+
+# The background job reads the books from a pool thread, so it must see committed rows
+class RescoreSelectedTests(TransactionTestCase):
+    def setUp(self):
+        isolate_files(self)
+        admission._controllers.pop(('bulk', None), None)
+        self.addCleanup(admission._controllers.pop, ('bulk', None), None)
+        Book.objects.bulk_create([
+            Book(title=f'Book {i}', author='Author', category='Fiction', demand=0, action='Hold')
+            for i in range(5)
+        ])
+        self.model_admin = BookAdmin(Book, admin.site)
+        self.request = RequestFactory().post('/admin/library_ai/book/')
+        patcher = mock.patch.object(BookAdmin, 'message_user')
+        self.message_user = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rescore(self):
+        self.model_admin.rescore_selected(self.request, Book.objects.all())
+        return self.message_user.call_args.args[1:]
+
+    def test_small_selection_is_rescored_in_the_request(self):
+        message, level = self.rescore()
+
+        self.assertEqual((message, level), ('Rescored 5 books', messages.SUCCESS))
+        self.assertFalse(Book.objects.filter(action='Hold').exists())
+        self.assertEqual(PredictionHistory.objects.filter(source='reprocess').count(), 5)
+        self.assertFalse(ScoringCheckpoint.objects.exists())
+
+    @override_settings(LIBRARY_AI_ADMIN_RESCORE_SYNC_LIMIT=2)
+    def test_large_selection_runs_in_the_background(self):
+        message, level = self.rescore()
+
+        self.assertEqual(level, messages.INFO)
+        self.assertIn('in the background', message)
+        checkpoint = wait_for_checkpoint('finished')
+        self.assertEqual(checkpoint.rows_scored, 5)
+        self.assertEqual(checkpoint.position, Book.objects.order_by('-id').values_list('id', flat=True)[0])
+        self.assertFalse(Book.objects.filter(action='Hold').exists())
+
+    def test_busy_bulk_slot_defers_small_selections_until_it_is_released(self):
+        gate = controller('bulk')
+        upload = gate.acquire(0).result()
+
+        message, level = self.rescore()
+
+        self.assertEqual(level, messages.INFO)
+        time.sleep(0.2)
+        self.assertEqual(ScoringCheckpoint.objects.get().status, 'running')
+        self.assertEqual(Book.objects.filter(action='Hold').count(), 5)
+
+        gate.release(upload)
+        wait_for_checkpoint('finished')
+        self.assertFalse(Book.objects.filter(action='Hold').exists())
+
+    @override_settings(LIBRARY_AI_ADMISSION={'bulk': {'concurrency': 1, 'queue': 0, 'per_library': True}})
+    def test_full_bulk_queue_is_reported(self):
+        gate = controller('bulk')
+        upload = gate.acquire(0).result()
+        self.addCleanup(gate.release, upload)
+
+        message, level = self.rescore()
+
+        self.assertEqual(level, messages.WARNING)
+        self.assertIn('retry in', message)
+        self.assertFalse(ScoringCheckpoint.objects.exists())
@@ -0,0 +1,117 @@
+import asyncio
+
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, SimpleTestCase, override_settings
+
+from library_ai import admission
+from library_ai.admission import AdmissionController, Rejected, admission_controlled, controller
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.gate = AdmissionController('test', concurrency=1, queue=2)
+        self.running = self.gate.acquire(0)
+
+    def test_grants_free_slots_and_queues_the_rest(self):
+        self.assertTrue(self.running.done())
+        waiting = self.gate.acquire(10)
+        self.assertFalse(waiting.done())
+
+        self.gate.release(self.running.result())
+
+        self.assertTrue(waiting.done())
+        self.assertIs(waiting.result().future, waiting)
+
+    def test_smaller_requests_are_admitted_first(self):
+        large = self.gate.acquire(100)
+        small = self.gate.acquire(5)
+
+        self.gate.release(self.running.result())
+
+        self.assertTrue(small.done())
+        self.assertFalse(large.done())
+
+    def test_full_queue_rejects_with_retry_after(self):
+        self.gate.acquire(10)
+        self.gate.acquire(20)
+
+        with self.assertRaises(Rejected) as raised:
+            self.gate.acquire(20)
+        self.assertEqual(raised.exception.reason, 'queue_full')
+        self.assertGreaterEqual(raised.exception.retry_after, 1)
+
+    def test_without_a_queue_busy_slots_reject(self):
+        gate = AdmissionController('test', concurrency=1, queue=0)
+        gate.acquire(10)
+
+        with self.assertRaises(Rejected) as raised:
+            gate.acquire(0)
+        self.assertEqual(raised.exception.reason, 'queue_full')
+
+    def test_smaller_request_sheds_the_largest_waiting_one(self):
+        medium = self.gate.acquire(10)
+        large = self.gate.acquire(20)
+
+        small = self.gate.acquire(1)
+
+        self.assertEqual(large.exception().reason, 'shed')
+        self.assertFalse(medium.done())
+        self.assertFalse(small.done())
+
+    def test_cancelled_waiter_is_skipped(self):
+        waiting = self.gate.acquire(10)
+        self.gate.cancel(waiting)
+        after = self.gate.acquire(20)
+
+        self.gate.release(self.running.result())
+
+        self.assertFalse(waiting.done())
+        self.assertTrue(after.done())
+
+    def test_cancelling_a_granted_slot_releases_it(self):
+        self.gate.cancel(self.running)
+
+        self.assertTrue(self.gate.acquire(0).done())
+
+
+@override_settings(LIBRARY_AI_ADMISSION={'test_view': {'concurrency': 1, 'queue': 1}})
+class AdmissionControlledViewTests(SimpleTestCase):
+    def setUp(self):
+        self.release_view = asyncio.Event()
+
+        @admission_controlled('test_view')
+        async def view(request):
+            await self.release_view.wait()
+            return HttpResponse('done')
+
+        self.view = view
+        self.factory = AsyncRequestFactory()
+
+    def tearDown(self):
+        admission._controllers.pop(('test_view', None), None)
+
+    async def test_busy_endpoint_answers_429_with_retry_after(self):
+        first = asyncio.ensure_future(self.view(self.factory.post('/', b'x' * 10, content_type='text/plain')))
+        queued = asyncio.ensure_future(self.view(self.factory.post('/', b'x' * 10, content_type='text/plain')))
+        await asyncio.sleep(0)
+
+        response = await self.view(self.factory.post('/', b'x' * 100, content_type='text/plain'))
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.release_view.set()
+        self.assertEqual([(await first).status_code, (await queued).status_code], [200, 200])
+
+    async def test_cancelled_request_gives_up_its_place(self):
+        first = asyncio.ensure_future(self.view(self.factory.get('/')))
+        queued = asyncio.ensure_future(self.view(self.factory.get('/')))
+        await asyncio.sleep(0)
+
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+
+        gate = controller('test_view')
+        self.assertEqual(len(gate._waiting), 0)
+        self.release_view.set()
+        await first
+        self.assertEqual(gate._running, 0)
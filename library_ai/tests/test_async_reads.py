@@ -0,0 +1,44 @@
+import asyncio
+import json
+import threading
+
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, TransactionTestCase
+
+from library_ai.ai_models import demand_predictor
+from library_ai.api_views import get_dashboard_data, get_prediction_accuracy
+from library_ai.models import Book
+from library_ai.prediction_history import record_predictions
+
+
+class ReadsDuringSyncViewsTests(TransactionTestCase):
+    """The dashboard and accuracy reads must not queue behind synchronous views"""
+
+    def setUp(self):
+        Book.objects.create(title='Dune', author='Frank Herbert', category='Fiction', demand=80, action='Acquire')
+        record_predictions(
+            pd.DataFrame({'category': ['Fiction'], 'demand': [80.0], 'action': ['Acquire']}),
+            [1], demand_predictor.model_version,
+        )
+
+    async def test_reads_answer_while_the_sync_thread_is_blocked(self):
+        release = threading.Event()
+        # Stands in for a slow sync view holding the thread shared by sync_to_async
+        blocked = asyncio.ensure_future(sync_to_async(release.wait)())
+        await asyncio.sleep(0.05)
+        factory = AsyncRequestFactory()
+        try:
+            dashboard = await asyncio.wait_for(get_dashboard_data(factory.get('/api/get-dashboard-data/')), 5)
+            accuracy = await asyncio.wait_for(get_prediction_accuracy(factory.get('/api/prediction-accuracy/')), 5)
+            self.assertFalse(blocked.done())
+        finally:
+            release.set()
+            await blocked
+
+        self.assertEqual(dashboard.status_code, 200)
+        data = json.loads(dashboard.content)
+        self.assertEqual(data['spotlight_book']['title'], 'Dune')
+        self.assertEqual(data['kpis']['move_rate'], 100.0)
+        self.assertEqual(accuracy.status_code, 200)
+        self.assertEqual(json.loads(accuracy.content)['accuracy'][0]['predictions'], 1)
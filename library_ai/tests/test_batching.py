@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from library_ai.batching import MicroBatcher
+
+
+class RecordingScorer:
+    """Scores each text by its number and records the batches it was called with"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts, categories, **options):
+        with self.lock:
+            self.batches.append((list(texts), options, threading.current_thread().name))
+        if self.error:
+            raise self.error
+        numbers = np.array([float(text) for text in texts])
+        return numbers, numbers * 10
+
+
+def texts(*numbers):
+    return [str(number) for number in numbers]
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def submit_together(self, batcher, requests):
+        """Submit ``(texts, options)`` requests from concurrent callers"""
+        with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+            futures = [
+                pool.submit(batcher.submit, batch, ['Fiction'] * len(batch), **options)
+                for batch, options in requests
+            ]
+        return futures
+
+    def test_concurrent_requests_share_a_batch_and_get_their_own_rows(self):
+        scorer = RecordingScorer()
+        batcher = MicroBatcher(scorer, max_batch_size=4, max_wait=1.0)
+
+        futures = self.submit_together(batcher, [(texts(1, 2), {}), (texts(3, 4), {})])
+
+        self.assertEqual(len(scorer.batches), 1)
+        self.assertEqual(sorted(scorer.batches[0][0]), texts(1, 2, 3, 4))
+        for future, expected in zip(futures, ([1, 2], [3, 4])):
+            sentiment, genre = future.result()
+            self.assertEqual(sentiment.tolist(), expected)
+            self.assertEqual(genre.tolist(), [number * 10 for number in expected])
+
+    def test_queued_requests_are_split_at_the_batch_size(self):
+        scorer = RecordingScorer()
+        batcher = MicroBatcher(scorer, max_batch_size=4, max_wait=0.05)
+
+        futures = self.submit_together(batcher, [(texts(i, i + 1, i + 2), {}) for i in (0, 10, 20)])
+
+        self.assertEqual([len(batch) for batch, _, _ in scorer.batches], [3, 3, 3])
+        self.assertEqual(
+            sorted(future.result()[0].tolist() for future in futures),
+            [[0, 1, 2], [10, 11, 12], [20, 21, 22]],
+        )
+
+    def test_full_requests_are_scored_by_the_caller(self):
+        scorer = RecordingScorer()
+        batcher = MicroBatcher(scorer, max_batch_size=2, max_wait=1.0)
+
+        sentiment, _ = batcher.submit(texts(1, 2, 3), ['Fiction'] * 3)
+
+        self.assertEqual(sentiment.tolist(), [1, 2, 3])
+        self.assertEqual(scorer.batches[0][2], threading.current_thread().name)
+
+    def test_a_failed_batch_fails_every_caller(self):
+        scorer = RecordingScorer(error=RuntimeError('model crashed'))
+        batcher = MicroBatcher(scorer, max_batch_size=4, max_wait=1.0)
+
+        with self.assertLogs('library_ai.batching', 'ERROR'):
+            futures = self.submit_together(batcher, [(texts(1, 2), {}), (texts(3, 4), {})])
+
+        self.assertEqual(len(scorer.batches), 1)
+        for future in futures:
+            with self.assertRaisesMessage(RuntimeError, 'model crashed'):
+                future.result()
+
+    def test_the_dispatcher_survives_a_failed_batch(self):
+        scorer = RecordingScorer(error=RuntimeError('model crashed'))
+        batcher = MicroBatcher(scorer, max_batch_size=4, max_wait=0.001)
+        with self.assertLogs('library_ai.batching', 'ERROR'), self.assertRaises(RuntimeError):
+            batcher.submit(texts(1), ['Fiction'])
+
+        scorer.error = None
+
+        self.assertEqual(batcher.submit(texts(5), ['Fiction'])[0].tolist(), [5])
+
+    def test_requests_with_different_options_are_not_mixed(self):
+        scorer = RecordingScorer()
+        # Long enough for all three to queue; the batch never fills, so it waits it out
+        batcher = MicroBatcher(scorer, max_batch_size=8, max_wait=0.5)
+
+        futures = self.submit_together(batcher, [
+            (texts(1, 2), {'want_embeddings': True}),
+            (texts(3, 4), {'want_embeddings': False}),
+            (texts(5, 6), {'want_embeddings': True}),
+        ])
+
+        self.assertEqual(
+            sorted((sorted(batch), options['want_embeddings']) for batch, options, _ in scorer.batches),
+            [(texts(1, 2, 5, 6), True), (texts(3, 4), False)],
+        )
+        self.assertEqual([future.result()[0].tolist() for future in futures], [[1, 2], [3, 4], [5, 6]])
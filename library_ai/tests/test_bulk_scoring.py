@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from library_ai import bulk_scoring
+from library_ai.bulk_scoring import score_catalog
+from library_ai.models import Book, PredictionHistory, ScoringCheckpoint
+from library_ai.prediction_history import record_actuals
+
+from . import isolate_files
+
+CATALOG = 'title,author,genre\nDune,Frank Herbert,Fiction\nEmma,Jane Austen,Fiction\nSPQR,Mary Beard,History\n'
+
+
+class ScoreCatalogFileTests(TestCase):
+    def setUp(self):
+        self.path = isolate_files(self) / 'catalog.csv'
+        self.path.write_text(CATALOG)
+
+    def test_rescoring_a_file_replaces_the_catalog_with_new_ids(self):
+        score_catalog(path=str(self.path))
+        first_ids = set(Book.objects.values_list('id', flat=True))
+
+        score_catalog(path=str(self.path))
+        second_ids = set(Book.objects.values_list('id', flat=True))
+
+        self.assertEqual(len(second_ids), 3)
+        self.assertFalse(first_ids & second_ids)
+        self.assertEqual(ScoringCheckpoint.objects.get().id_offset, max(first_ids))
+
+    def test_actuals_for_a_new_book_never_close_a_replaced_books_prediction(self):
+        score_catalog(path=str(self.path))
+        score_catalog(path=str(self.path))
+        new_book = Book.objects.order_by('id').first()
+
+        record_actuals([{'book_id': new_book.id, 'actual_demand': 50}])
+
+        closed = PredictionHistory.objects.filter(actual_demand__isnull=False)
+        self.assertEqual(list(closed.values_list('book_id', flat=True)), [new_book.id])
+        self.assertEqual(closed.get().source, 'bulk')
+        self.assertEqual(PredictionHistory.objects.filter(actual_demand__isnull=True).count(), 5)
+
+
+class ScoreCatalogResumeTests(TestCase):
+    def setUp(self):
+        self.path = isolate_files(self) / 'catalog.csv'
+        self.path.write_text(CATALOG)
+        Book.objects.create(title='Old Book', author='Someone', category='Fiction', demand=10)
+
+    def interrupt_after(self, batches):
+        """Run the file one row per batch, failing once ``batches`` have been scored"""
+        calls = []
+        scorer = bulk_scoring._score_batch
+
+        def score_batch(frame):
+            if len(calls) == batches:
+                raise RuntimeError('interrupted')
+            calls.append(frame)
+            return scorer(frame)
+
+        with mock.patch.object(bulk_scoring, '_score_batch', score_batch):
+            with self.assertRaises(RuntimeError):
+                score_catalog(path=str(self.path), batch_rows=1)
+
+    def test_failure_before_the_first_batch_keeps_the_old_catalog(self):
+        self.interrupt_after(0)
+
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['Old Book'])
+        self.assertEqual(ScoringCheckpoint.objects.get().position, 0)
+
+        summary = score_catalog(path=str(self.path), batch_rows=1)
+
+        self.assertEqual(summary['resumed_from'], 0)
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['Dune', 'Emma', 'SPQR'])
+
+    def test_resume_continues_after_the_last_committed_batch(self):
+        self.interrupt_after(1)
+
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['Dune'])
+
+        summary = score_catalog(path=str(self.path), batch_rows=1)
+
+        self.assertEqual(summary['resumed_from'], 1)
+        self.assertEqual(summary['rows_scored'], 2)
+        self.assertEqual(summary['run_rows_scored'], 3)
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['Dune', 'Emma', 'SPQR'])
+        self.assertEqual(PredictionHistory.objects.filter(source='bulk').count(), 3)
+        self.assertEqual(ScoringCheckpoint.objects.get().status, 'finished')
+
+    def test_restart_discards_the_interrupted_run(self):
+        self.interrupt_after(2)
+
+        summary = score_catalog(path=str(self.path), batch_rows=1, restart=True)
+
+        self.assertIsNone(summary['resumed_from'])
+        self.assertEqual(Book.objects.count(), 3)
+        self.assertEqual(ScoringCheckpoint.objects.get().rows_scored, 3)
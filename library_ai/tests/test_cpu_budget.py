@@ -0,0 +1,112 @@
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from library_ai import cpu_budget
+from library_ai.cpu_budget import apply_cpu_budget, plan_cpu_budget, slot_cpus
+
+CPUS = list(range(8))
+
+# Holds the flock on one slot file until stdin closes
+HOLD_SLOT = """
+import fcntl, sys
+handle = open(sys.argv[1], 'a+')
+fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+print('locked', flush=True)
+sys.stdin.read()
+"""
+
+
+class PlanCpuBudgetTests(SimpleTestCase):
+    def test_cores_are_split_evenly_between_workers(self):
+        plan = plan_cpu_budget(workers=3, threads=0, interop_threads=1, cpus=CPUS)
+
+        self.assertEqual(plan, {'cpus': 8, 'workers': 3, 'threads': 2, 'interop_threads': 1})
+
+    def test_every_worker_gets_a_thread_when_oversubscribed(self):
+        self.assertEqual(plan_cpu_budget(workers=16, threads=0, cpus=CPUS)['threads'], 1)
+
+    @override_settings(LIBRARY_AI_CPU_WORKERS=2, LIBRARY_AI_TORCH_THREADS=3, LIBRARY_AI_TORCH_INTEROP_THREADS=0)
+    def test_settings_supply_the_defaults(self):
+        plan = plan_cpu_budget(cpus=CPUS)
+
+        self.assertEqual((plan['workers'], plan['threads'], plan['interop_threads']), (2, 3, 1))
+
+    def test_slots_get_disjoint_cores(self):
+        slices = [slot_cpus(slot, 2, CPUS) for slot in range(4)]
+
+        self.assertEqual(slices, [[0, 1], [2, 3], [4, 5], [6, 7]])
+
+    def test_oversubscribed_slots_wrap_around(self):
+        self.assertEqual(slot_cpus(4, 2, CPUS), [0, 1])
+        self.assertEqual(sorted(slot_cpus(1, 12, CPUS)), CPUS)
+
+
+class CpuSlotTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.slots_dir = Path(directory.name)
+        for patch in (
+            mock.patch.object(cpu_budget, '_applied', None),
+            mock.patch.object(cpu_budget, '_slot_file', None),
+            mock.patch.object(cpu_budget, 'available_cpus', return_value=CPUS),
+            mock.patch.object(cpu_budget, '_set_torch_threads', return_value=None),
+            mock.patch.object(cpu_budget.os, 'sched_setaffinity', create=True),
+        ):
+            patched = patch.start()
+            self.addCleanup(patch.stop)
+        self.setaffinity = patched
+        self.addCleanup(lambda: cpu_budget._slot_file and cpu_budget._slot_file.close())
+        settings = override_settings(LIBRARY_AI_CPU_PINNING=True, LIBRARY_AI_CPU_SLOTS_DIR=str(self.slots_dir))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def hold_slot(self, slot):
+        """Start another process holding ``slot`` and return it"""
+        process = subprocess.Popen(
+            [sys.executable, '-c', HOLD_SLOT, str(self.slots_dir / f'slot-{slot}.lock')],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        self.addCleanup(process.stdout.close)
+        self.addCleanup(process.wait)
+        self.addCleanup(process.stdin.close)
+        self.assertEqual(process.stdout.readline().strip(), 'locked')
+        return process
+
+    def test_first_free_slot_is_claimed_and_pinned(self):
+        self.hold_slot(0)
+
+        plan = apply_cpu_budget(workers=4)
+
+        self.assertEqual((plan['slot'], plan['pinned_cpus']), (1, [2, 3]))
+        self.setaffinity.assert_called_once_with(0, [2, 3])
+        self.assertEqual((self.slots_dir / 'slot-1.lock').read_text(), str(plan['pid']))
+
+    def test_slot_of_an_exited_worker_is_taken_over(self):
+        holder = self.hold_slot(0)
+        holder.stdin.close()
+        holder.wait()
+
+        self.assertEqual(apply_cpu_budget(workers=2)['slot'], 0)
+
+    def test_runs_unpinned_when_every_slot_is_held(self):
+        self.hold_slot(0)
+        self.hold_slot(1)
+
+        with self.assertLogs('library_ai.cpu_budget', 'WARNING'):
+            plan = apply_cpu_budget(workers=2)
+
+        self.assertIsNone(plan['slot'])
+        self.assertIsNone(plan['pinned_cpus'])
+        self.setaffinity.assert_not_called()
+
+    def test_budget_is_applied_once_per_process(self):
+        first = apply_cpu_budget(workers=4)
+
+        self.assertIs(apply_cpu_budget(workers=2), first)
+        self.setaffinity.assert_called_once()
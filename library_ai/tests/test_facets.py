@@ -0,0 +1,84 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+
+from library_ai.facets import DEMAND_BUCKETS, HIGH_DEMAND_THRESHOLD, ainventory_facets
+from library_ai.models import Book
+
+CATEGORIES = ['Fiction', 'History', 'Mystery', 'Poetry']
+ACTIONS = [code for code, _ in Book.ACTIONS]
+
+
+def naive_facets(books, search='', category='', action='', top_n=5):
+    """The facets computed row by row from the whole catalog, as the page used to"""
+    books = [
+        book for book in books
+        if not search or search.lower() in book['title'].lower() or search.lower() in book['author'].lower()
+    ]
+    in_category = [book for book in books if not category or book['category'] == category]
+    in_action = [book for book in books if not action or book['action'] == action]
+    matching = [book for book in in_category if not action or book['action'] == action]
+
+    categories = {}
+    for book in in_action:
+        categories[book['category']] = categories.get(book['category'], 0) + 1
+    actions = {code: 0 for code in ACTIONS}
+    for book in in_category:
+        actions[book['action']] += 1
+    histogram = [0] * DEMAND_BUCKETS
+    for book in matching:
+        histogram[min(int(book['demand'] * DEMAND_BUCKETS / 100), DEMAND_BUCKETS - 1)] += 1
+    high_demand = sorted(
+        (book for book in matching if book['demand'] >= HIGH_DEMAND_THRESHOLD),
+        key=lambda book: (-book['demand'], book['title'], book['id']),
+    )
+    return {
+        'total': len(matching),
+        'average_demand': round(sum(book['demand'] for book in matching) / len(matching), 1) if matching else 0,
+        'categories': [
+            {'category': name, 'count': count}
+            for name, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))
+        ],
+        'actions': actions,
+        'histogram': histogram,
+        'high_demand': high_demand[:top_n],
+    }
+
+
+class InventoryFacetsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Book.objects.bulk_create([
+            Book(
+                title=f'Title {i}', author=f'Author {i % 7}', category=CATEGORIES[i % len(CATEGORIES)],
+                demand=[0, 9.9, 10, 45.5, 89.9, 90, 95, 100][i % 8] if i % 3 else (i * 37) % 101,
+                action=ACTIONS[(i // 2) % len(ACTIONS)],
+            )
+            for i in range(120)
+        ])
+        cls.books = list(Book.objects.values('id', 'title', 'author', 'category', 'demand', 'action'))
+
+    def assertMatchesNaive(self, **filters):
+        facets = async_to_sync(ainventory_facets)(**filters)
+        expected = naive_facets(self.books, **filters)
+
+        self.assertEqual(facets['total'], expected['total'])
+        self.assertEqual(facets['average_demand'], expected['average_demand'])
+        self.assertEqual(facets['categories'], expected['categories'])
+        self.assertEqual(facets['actions'], expected['actions'])
+        self.assertEqual([bucket['count'] for bucket in facets['demand_histogram']], expected['histogram'])
+        self.assertEqual(facets['high_demand'], expected['high_demand'])
+
+    def test_unfiltered(self):
+        self.assertMatchesNaive()
+
+    def test_category_filter(self):
+        self.assertMatchesNaive(category='History')
+
+    def test_action_filter(self):
+        self.assertMatchesNaive(action='Acquire')
+
+    def test_search_with_both_filters(self):
+        self.assertMatchesNaive(search='author 3', category='Mystery', action='Hold', top_n=3)
+
+    def test_filters_matching_nothing(self):
+        self.assertMatchesNaive(search='no such book')
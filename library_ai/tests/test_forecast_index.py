@@ -0,0 +1,103 @@
+from django.contrib import admin
+from django.test import RequestFactory, TestCase
+
+from library_ai.admin import BookAdmin
+from library_ai.bulk_scoring import rescore_books
+from library_ai.forecast_index import (
+    forecast_categories, rebuild_forecast_index, refresh_forecast_index, top_books,
+)
+from library_ai.models import Book, ForecastTopBook
+from library_ai.search_index import rebuild_search_index
+
+from . import isolate_files
+
+
+def index_rows():
+    return list(ForecastTopBook.objects.order_by('category', 'rank').values_list('category', 'rank', 'book_id'))
+
+
+class ForecastIndexTests(TestCase):
+    def setUp(self):
+        isolate_files(self)
+        Book.objects.bulk_create(
+            [Book(title=f'Novel {i:02d}', author='A', category='Fiction', demand=i) for i in range(15)]
+            + [Book(title=f'History {i}', author='B', category='History', demand=50 + i) for i in range(3)]
+        )
+
+    def test_rebuild_keeps_the_top_n_per_category_and_overall(self):
+        rebuild_forecast_index(top_n=5)
+
+        self.assertEqual(
+            [book['title'] for book in top_books('Fiction')],
+            ['Novel 14', 'Novel 13', 'Novel 12', 'Novel 11', 'Novel 10'],
+        )
+        self.assertEqual([book['demand'] for book in top_books()], [52, 51, 50, 14, 13])
+        self.assertEqual(forecast_categories(), ['Fiction', 'History'])
+
+    def test_ties_are_broken_by_title(self):
+        Book.objects.create(title='Aardvark', author='C', category='History', demand=52)
+
+        rebuild_forecast_index()
+
+        self.assertEqual([book['title'] for book in top_books('History')][:2], ['Aardvark', 'History 2'])
+
+    def test_first_read_builds_a_missing_index(self):
+        self.assertFalse(ForecastTopBook.objects.exists())
+
+        self.assertEqual(top_books('History')[0]['title'], 'History 2')
+
+    def test_refresh_matches_a_full_rebuild(self):
+        rebuild_forecast_index()
+        Book.objects.filter(title='Novel 03').update(demand=99)
+        Book.objects.filter(title='History 0').update(category='Fiction')
+        Book.objects.create(title='Atlas', author='D', category='Maps', demand=1)
+
+        refresh_forecast_index({'Fiction', 'History', 'Maps'})
+        refreshed = index_rows()
+        rebuild_forecast_index()
+
+        self.assertEqual(refreshed, index_rows())
+
+
+class AdminForecastRefreshTests(TestCase):
+    def setUp(self):
+        isolate_files(self)
+        self.book = Book.objects.create(title='Dune', author='Frank Herbert', category='Fiction', demand=10)
+        Book.objects.create(title='Emma', author='Jane Austen', category='Fiction', demand=20)
+        rebuild_forecast_index()
+        # Admin edits patch the search index, so it has to exist
+        rebuild_search_index()
+        self.model_admin = BookAdmin(Book, admin.site)
+        self.request = RequestFactory().post('/admin/library_ai/book/')
+
+    def save(self, **changes):
+        form_class = self.model_admin.get_form(self.request, self.book, change=True)
+        data = {
+            'title': self.book.title, 'author': self.book.author, 'category': self.book.category,
+            'demand': self.book.demand, 'action': self.book.action, **changes,
+        }
+        form = form_class(data, instance=self.book)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.model_admin.save_model(self.request, form.save(commit=False), form, change=True)
+
+    def test_demand_edit_reranks_the_category(self):
+        self.save(demand=90)
+
+        self.assertEqual(top_books('Fiction')[0], {'title': 'Dune', 'demand': 90})
+
+    def test_category_edit_moves_the_book(self):
+        self.save(category='Classics')
+
+        self.assertEqual(forecast_categories(), ['Classics', 'Fiction'])
+        self.assertEqual([book['title'] for book in top_books('Fiction')], ['Emma'])
+
+    def test_delete_removes_the_book(self):
+        self.model_admin.delete_queryset(self.request, Book.objects.filter(pk=self.book.pk))
+
+        self.assertEqual([book['title'] for book in top_books()], ['Emma'])
+
+    def test_rescoring_rebuilds_the_index(self):
+        rescore_books(Book.objects.all())
+
+        demand = dict(Book.objects.values_list('title', 'demand'))
+        self.assertEqual({book['title']: book['demand'] for book in top_books()}, demand)
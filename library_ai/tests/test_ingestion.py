@@ -0,0 +1,147 @@
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from library_ai.ingestion import (
+    IngestionError, catalog_format, clean_catalog, count_catalog_rows, iter_catalog, read_catalog,
+    standardize_columns,
+)
+
+# Row 3 has an empty title, row 4 a missing category (trailing comma), row 5 a
+# blank author and row 6 no category cell at all; rows 2 and 7 are the same
+# book spelled differently
+CATALOG = """Book Title,Writer,Genre,Demand
+Dune,Frank Herbert,Science Fiction,80
+ dune ,frank  herbert,science fiction,
+,Nobody,Mystery,10
+Emma,Jane Austen,,20
+Ulysses,   ,Classic,30
+Beloved,Toni Morrison
+Dune,Frank Herbert,Science Fiction,90
+"""
+
+
+class CleanCatalogTests(SimpleTestCase):
+    def read(self, text, filename='catalog.csv'):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / filename
+            path.write_text(text)
+            df, _ = read_catalog(path, filename)
+        return df
+
+    def test_missing_and_blank_cells_drop_the_row(self):
+        books, rows, codes, report = clean_catalog(self.read(CATALOG))
+
+        self.assertEqual(rows['title'].tolist(), ['Dune', 'dune', 'Dune'])
+        self.assertNotIn('nan', rows['category'].astype(str).tolist())
+        self.assertEqual(report['incomplete_rows'], 4)
+        self.assertEqual(report['columns']['title']['missing'], 1)
+        self.assertEqual(report['columns']['author']['missing'], 1)
+        self.assertEqual(report['columns']['category']['missing'], 2)
+
+    def test_duplicates_collapse_and_take_the_first_demand(self):
+        books, rows, codes, report = clean_catalog(self.read(CATALOG))
+
+        self.assertEqual(len(books), 1)
+        self.assertEqual(codes.tolist(), [0, 0, 0])
+        self.assertEqual(books['demand'].tolist(), [80.0])
+        self.assertEqual(report['duplicate_rows'], 2)
+        self.assertEqual(list(books['category'].cat.categories), ['Science Fiction'])
+
+    def test_none_values_in_object_columns_are_missing(self):
+        df = pd.DataFrame({
+            'title': ['Emma', None, 'Beloved'],
+            'author': ['Jane Austen', 'Nobody', None],
+            'category': [None, 'Mystery', 'Fiction'],
+        }, dtype=object)
+
+        self.assertEqual(len(standardize_columns(df)), 0)
+
+    def test_missing_required_column_is_reported(self):
+        with self.assertRaises(IngestionError):
+            clean_catalog(self.read('Book Title,Writer\nDune,Frank Herbert\n'))
+
+
+class CatalogFormatTests(SimpleTestCase):
+    BOOKS = pd.DataFrame({
+        'title': ['Dune', 'Emma', 'SPQR'],
+        'author': ['Frank Herbert', 'Jane Austen', 'Mary Beard'],
+        'genre': ['Fiction', 'Fiction', 'History'],
+    })
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, filename):
+        """Write BOOKS in the format the file name implies"""
+        path = self.directory / filename
+        writers = {
+            'csv': lambda: self.BOOKS.to_csv(path, index=False),
+            'excel': lambda: self.BOOKS.to_excel(path, index=False),
+            'json': lambda: self.BOOKS.to_json(path, orient='records'),
+            'jsonl': lambda: self.BOOKS.to_json(path, orient='records', lines=True),
+            'parquet': lambda: self.BOOKS.to_parquet(path, index=False),
+            'arrow': lambda: self.BOOKS.to_feather(path),
+        }
+        writers[catalog_format(filename)]()
+        return path
+
+    def test_format_follows_the_extension_in_any_case(self):
+        for filename, expected in [
+            ('catalog.csv', 'csv'), ('CATALOG.XLSX', 'excel'), ('books.xls', 'excel'),
+            ('books.json', 'json'), ('books.jsonl', 'jsonl'), ('books.ndjson', 'jsonl'),
+            ('books.parquet', 'parquet'), ('books.pq', 'parquet'),
+            ('books.arrow', 'arrow'), ('Books.Feather', 'arrow'),
+        ]:
+            with self.subTest(filename=filename):
+                self.assertEqual(catalog_format(filename), expected)
+
+    def test_unsupported_extensions_are_rejected(self):
+        for filename in ('catalog.txt', 'catalog', 'catalog.csv.gz'):
+            with self.subTest(filename=filename), self.assertRaises(IngestionError):
+                catalog_format(filename)
+
+    def test_every_format_reads_the_same_rows(self):
+        for filename in ('books.csv', 'books.xlsx', 'books.json', 'books.jsonl', 'books.parquet', 'books.feather'):
+            with self.subTest(filename=filename):
+                df, report = read_catalog(self.write(filename), filename)
+
+                self.assertEqual(report['format'], catalog_format(filename))
+                self.assertEqual(report['bad_rows'], 0)
+                pd.testing.assert_frame_equal(
+                    df[list(self.BOOKS.columns)].astype(str), self.BOOKS.astype(str), check_dtype=False,
+                )
+
+    def test_json_lines_labelled_as_json_are_read(self):
+        path = self.write('books.jsonl').rename(self.directory / 'books.json')
+
+        df, report = read_catalog(path, 'books.json')
+
+        self.assertEqual(df['title'].tolist(), ['Dune', 'Emma', 'SPQR'])
+        self.assertEqual(report['format'], 'json')
+
+    def test_malformed_json_lines_are_skipped_and_counted(self):
+        path = self.directory / 'books.jsonl'
+        path.write_text('{"title": "Dune", "author": "Frank Herbert"}\nnot json\n[1, 2]\n{"title": "Emma"}\n')
+
+        with self.assertLogs('library_ai.ingestion', 'WARNING'):
+            df, report = read_catalog(path, 'books.jsonl')
+
+        self.assertEqual(df['title'].tolist(), ['Dune', 'Emma'])
+        self.assertEqual(report['bad_rows'], 2)
+
+    def test_streamed_chunks_keep_file_positions(self):
+        for filename in ('books.csv', 'books.jsonl', 'books.parquet', 'books.feather', 'books.xlsx'):
+            with self.subTest(filename=filename):
+                path = self.write(filename)
+
+                chunks = list(iter_catalog(path, filename, 2))
+
+                self.assertEqual([chunk.index.tolist() for chunk in chunks], [[0, 1], [2]])
+                self.assertEqual(pd.concat(chunks)['title'].tolist(), ['Dune', 'Emma', 'SPQR'])
+                # Excel has to be parsed in full to be counted
+                self.assertEqual(count_catalog_rows(path, filename), None if filename.endswith('.xlsx') else 3)
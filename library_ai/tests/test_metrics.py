@@ -0,0 +1,90 @@
+import json
+import math
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from library_ai import metrics
+from library_ai.metrics import AGGREGATE_NAME, Counter, Gauge, Histogram, collect, compact_snapshots
+
+REQUESTS = Counter('library_ai_test_requests_total', 'Test counter')
+IN_FLIGHT = Gauge('library_ai_test_in_flight', 'Test live gauge', multiprocess_mode='livesum')
+LATENCY = Histogram('library_ai_test_latency_seconds', 'Test histogram', buckets=(1.0, math.inf))
+
+
+def exited_pid():
+    """Pid of a process that has already exited"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class MetricsTestCase(SimpleTestCase):
+    def setUp(self):
+        patch = mock.patch.object(metrics.registry, 'values', {})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+
+class HistogramTests(MetricsTestCase):
+    def test_nan_observations_are_ignored(self):
+        LATENCY.observe(0.5)
+        LATENCY.observe(float('nan'))
+
+        self.assertEqual(collect()[(LATENCY.name, ())], [1, 0, 0.5, 1])
+
+
+class SnapshotCompactionTests(MetricsTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(LIBRARY_AI_METRICS_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write_snapshot(self, name, pid, requests, in_flight=0):
+        (self.directory / name).write_text(json.dumps({
+            'pid': pid,
+            'modes': {REQUESTS.name: 'sum', IN_FLIGHT.name: 'livesum'},
+            'samples': [[REQUESTS.name, [], requests], [IN_FLIGHT.name, [], in_flight]],
+        }))
+
+    def test_exited_processes_are_folded_into_the_aggregate(self):
+        dead = exited_pid()
+        self.write_snapshot(f'{dead}-1.json', dead, 3, in_flight=2)
+        self.write_snapshot(f'{dead}-2.json', dead, 4, in_flight=1)
+
+        self.assertEqual(compact_snapshots(self.directory), 2)
+
+        self.assertEqual(sorted(path.name for path in self.directory.glob('*.json')), [AGGREGATE_NAME])
+        merged = collect()
+        self.assertEqual(merged[(REQUESTS.name, ())], 7)
+        self.assertNotIn((IN_FLIGHT.name, ()), merged)
+
+    def test_folding_again_adds_to_the_aggregate(self):
+        dead = exited_pid()
+        self.write_snapshot(f'{dead}-1.json', dead, 3)
+        compact_snapshots(self.directory)
+        self.write_snapshot(f'{dead}-2.json', dead, 5)
+
+        compact_snapshots(self.directory)
+
+        self.assertEqual(collect()[(REQUESTS.name, ())], 8)
+
+    def test_live_processes_are_left_alone(self):
+        live = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        self.addCleanup(live.wait)
+        self.addCleanup(live.kill)
+        self.write_snapshot(f'{live.pid}-1.json', live.pid, 3, in_flight=2)
+
+        self.assertEqual(compact_snapshots(self.directory), 0)
+
+        merged = collect()
+        self.assertEqual(merged[(REQUESTS.name, ())], 3)
+        self.assertEqual(merged[(IN_FLIGHT.name, ())], 2)
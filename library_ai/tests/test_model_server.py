@@ -0,0 +1,112 @@
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase, override_settings
+
+from library_ai import model_server
+from library_ai.ai_models import LibraryDemandPredictor
+from library_ai.model_server import ModelServer, ModelServerClient, ModelServerUnavailable
+
+EMBEDDING_DIM = 16
+
+
+def text_scores(texts):
+    """Score each text by its checksum so results can be matched to inputs"""
+    return np.array([zlib.crc32(text.encode()) % 1000 / 1000 for text in texts])
+
+
+def stub_pipelines(predictor):
+    """Replace the pipelines of ``predictor`` with deterministic stand-ins"""
+    predictor.is_initialized = True
+    predictor._analyze_sentiment_batch = text_scores
+    predictor._classify_genre_relevance_batch = lambda texts, categories: 1 - text_scores(texts)
+    predictor._embed_batch = mock.Mock(
+        side_effect=lambda texts: np.repeat(text_scores(texts)[:, None], EMBEDDING_DIM, axis=1).astype(np.float16)
+    )
+    return predictor
+
+
+class ModelServerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.socket_path = Path(directory.name) / 'model-server.sock'
+        self.served = stub_pipelines(LibraryDemandPredictor(use_model_server=False))
+        server = ModelServer(self.socket_path, self.served, max_wait=0.001)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.client = ModelServerClient(self.socket_path, timeout=10)
+        self.addCleanup(self.client._reset)
+
+    def texts(self, count):
+        return [f'Book {i}' for i in range(count)], ['Fiction'] * count
+
+    def test_round_trip(self):
+        texts, categories = self.texts(5)
+
+        sentiment, genre, embeddings = self.client.score(texts, categories)
+
+        np.testing.assert_allclose(sentiment, text_scores(texts))
+        np.testing.assert_allclose(genre, 1 - text_scores(texts))
+        self.assertEqual(embeddings.shape, (5, EMBEDDING_DIM))
+        self.assertEqual(embeddings.dtype, np.float16)
+
+    def test_embeddings_are_skipped_when_not_wanted(self):
+        texts, categories = self.texts(5)
+
+        _, _, embeddings = self.client.score(texts, categories, want_embeddings=False)
+
+        self.assertEqual(embeddings.shape, (5, 0))
+        self.served._embed_batch.assert_not_called()
+
+    def test_batches_over_the_message_cap_are_sent_in_chunks(self):
+        texts, categories = self.texts(1000)
+        with mock.patch.object(model_server, 'MAX_MESSAGE_BYTES', 32 * 1024):
+            # In one request the response alone exceeds the cap
+            with mock.patch.object(model_server, 'CLIENT_CHUNK_TEXTS', len(texts)):
+                with self.assertRaises(ModelServerUnavailable):
+                    self.client.score(texts, categories)
+
+            with mock.patch.object(model_server, 'CLIENT_CHUNK_TEXTS', 100):
+                sentiment, genre, embeddings = self.client.score(texts, categories)
+
+        np.testing.assert_allclose(sentiment, text_scores(texts))
+        np.testing.assert_allclose(genre, 1 - text_scores(texts))
+        np.testing.assert_allclose(embeddings[:, 0], text_scores(texts), atol=1e-3)
+        self.assertEqual(embeddings.shape, (1000, EMBEDDING_DIM))
+
+    def test_predictions_without_embeddings_skip_the_encoder(self):
+        worker = LibraryDemandPredictor()
+        books = pd.DataFrame({'title': ['Book 1', 'Book 2'], 'author': ['A', 'B'], 'category': ['Fiction'] * 2})
+
+        with override_settings(LIBRARY_AI_MODEL_SERVER_SOCKET=str(self.socket_path)):
+            worker.predict_demand_frame(books)
+            _, (_, embeddings) = worker.predict_demand_frame(books, return_embeddings=True)
+
+        self.assertEqual(self.served._embed_batch.call_count, 1)
+        self.assertEqual(embeddings.shape, (2, EMBEDDING_DIM))
+
+
+class ModelServerFallbackTests(SimpleTestCase):
+    def test_unreachable_server_falls_back_to_local_models(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        worker = stub_pipelines(LibraryDemandPredictor())
+        texts = ['Book 1', 'Book 2']
+
+        with override_settings(LIBRARY_AI_MODEL_SERVER_SOCKET=str(Path(directory.name) / 'missing.sock')):
+            with self.assertLogs('library_ai.ai_models', 'WARNING'):
+                sentiment, _, embeddings = worker.score_texts(texts, ['Fiction'] * 2, want_embeddings=False)
+
+            np.testing.assert_allclose(sentiment, text_scores(texts))
+            self.assertEqual(embeddings.shape, (2, 0))
+            worker._embed_batch.assert_not_called()
+            # Later calls stay local until the retry interval has passed
+            self.assertIsNone(worker._model_server_client())
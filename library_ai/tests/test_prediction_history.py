@@ -0,0 +1,74 @@
+from unittest import mock
+
+import pandas as pd
+from django.test import TestCase
+
+from library_ai import prediction_history
+from library_ai.models import PredictionHistory, PredictionSummary
+from library_ai.prediction_history import accuracy_report, dashboard_kpis, record_actuals, record_predictions
+
+
+def predictions(rows):
+    return pd.DataFrame(rows, columns=['category', 'demand', 'action'])
+
+
+class RecordPredictionsTests(TestCase):
+    def test_appends_history_and_upserts_daily_summaries(self):
+        frame = predictions([('Fiction', 80.0, 'Acquire'), ('Fiction', 40.0, 'Hold'), ('History', 10.0, 'Deaccession')])
+
+        self.assertEqual(record_predictions(frame, [1, 2, 3], 'v1'), 3)
+        record_predictions(frame, [1, 2, 3], 'v1', source='reprocess')
+
+        self.assertEqual(PredictionHistory.objects.count(), 6)
+        summaries = {row.category: row for row in PredictionSummary.objects.filter(model_version='v1')}
+        self.assertEqual(set(summaries), {'Fiction', 'History'})
+        self.assertEqual((summaries['Fiction'].predictions, summaries['Fiction'].moves), (4, 2))
+        self.assertEqual((summaries['History'].predictions, summaries['History'].moves), (2, 2))
+
+    def test_move_rate_is_share_of_non_hold_predictions(self):
+        record_predictions(predictions([('Fiction', 80.0, 'Acquire'), ('Fiction', 40.0, 'Hold')]), [1, 2], 'v1')
+
+        self.assertEqual(dashboard_kpis('v1')['move_rate'], 50.0)
+        self.assertEqual(dashboard_kpis('v2'), {'accuracy': 0, 'move_rate': 0, 'equity': 0})
+
+
+class RecordActualsTests(TestCase):
+    def test_closes_latest_open_prediction_and_updates_accuracy(self):
+        record_predictions(predictions([('Fiction', 50.0, 'Hold')]), [1], 'v1')
+        record_predictions(predictions([('Fiction', 80.0, 'Acquire'), ('Fiction', 30.0, 'Hold')]), [1, 2], 'v1')
+
+        result = record_actuals([
+            {'book_id': 1, 'actual_demand': 100, 'actual_action': 'Acquire'},
+            {'book_id': 2, 'actual_demand': 60},
+            {'book_id': 99, 'actual_demand': 10},
+            {'book_id': 'not a number', 'actual_demand': 10},
+        ])
+
+        self.assertEqual(result, {'matched': 2, 'unmatched': 2})
+        latest = PredictionHistory.objects.filter(book_id=1).order_by('-id')
+        self.assertEqual([row.actual_demand for row in latest], [100.0, None])
+        self.assertEqual(latest[0].actual_action, 'Acquire')
+
+        [report] = accuracy_report(model_version='v1')
+        self.assertEqual(report['actuals'], 2)
+        # |80 - 100| and |30 - 60|
+        self.assertEqual(report['mae'], 25.0)
+        self.assertEqual(report['mape'], 35.0)
+        self.assertEqual(report['action_hit_rate'], 50.0)
+
+    def test_recorded_prediction_is_not_matched_twice(self):
+        record_predictions(predictions([('Fiction', 50.0, 'Hold')]), [1], 'v1')
+
+        self.assertEqual(record_actuals([{'book_id': 1, 'actual_demand': 40}])['matched'], 1)
+        self.assertEqual(record_actuals([{'book_id': 1, 'actual_demand': 45}]), {'matched': 0, 'unmatched': 1})
+        self.assertEqual(PredictionSummary.objects.get().actuals, 1)
+
+    def test_large_batches_are_looked_up_in_chunks(self):
+        book_ids = list(range(1, 11))
+        record_predictions(predictions([('Fiction', 50.0, 'Hold')] * len(book_ids)), book_ids, 'v1')
+
+        with mock.patch.object(prediction_history, 'HISTORY_BATCH_SIZE', 3):
+            result = record_actuals([{'book_id': book_id, 'actual_demand': 50} for book_id in book_ids])
+
+        self.assertEqual(result, {'matched': 10, 'unmatched': 0})
+        self.assertFalse(PredictionHistory.objects.filter(actual_demand__isnull=True).exists())
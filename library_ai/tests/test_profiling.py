@@ -0,0 +1,61 @@
+import json
+import pstats
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TransactionTestCase
+
+from library_ai import api_views
+from library_ai.concurrency import run_heavy
+from library_ai.profiling import JOB_STACK_ROOT, RequestProfilingMiddleware, profiles_dir
+
+from . import isolate_files
+
+CATALOG = b'title,author,genre\nDune,Frank Herbert,Fiction\nEmma,Jane Austen,Fiction\nSPQR,Mary Beard,History\n'
+
+
+def profiled_functions(profile_id):
+    stats = pstats.Stats(str(profiles_dir() / f'{profile_id}.prof'))
+    return {name for _, _, name in stats.stats}
+
+
+# The upload runs in a heavy-executor thread, which must see committed rows
+class AsyncProfilingTests(TransactionTestCase):
+    def setUp(self):
+        isolate_files(self)
+        self.staff = User.objects.create_user('librarian', is_staff=True)
+        self.factory = AsyncRequestFactory()
+
+    def profile(self, view, request):
+        request.user = self.staff
+        response = async_to_sync(RequestProfilingMiddleware(view))(request)
+        self.assertIn('X-Profile-Id', response)
+        return response, response['X-Profile-Id']
+
+    def test_profiled_upload_includes_the_heavy_executor_work(self):
+        request = self.factory.post(
+            '/api/upload-file/', {'file': SimpleUploadedFile('catalog.csv', CATALOG)},
+            headers={'X-Profile-Request': '1'},
+        )
+
+        response, profile_id = self.profile(api_views.upload_file, request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('predict_demand_frame', profiled_functions(profile_id))
+        metadata = json.loads((profiles_dir() / f'{profile_id}.json').read_text())
+        self.assertEqual(metadata['heavy_jobs'], 1)
+
+    def test_job_stacks_are_sampled_under_their_own_root(self):
+        async def view(request):
+            await run_heavy(time.sleep, 0.1)
+            return HttpResponse()
+
+        request = self.factory.get('/api/slow/', headers={'X-Profile-Request': '1'})
+
+        _, profile_id = self.profile(view, request)
+
+        collapsed = (profiles_dir() / f'{profile_id}.collapsed').read_text()
+        self.assertIn(f'{JOB_STACK_ROOT};', collapsed)
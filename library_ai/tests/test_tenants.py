@@ -0,0 +1,123 @@
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management import call_command
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase
+
+from library_ai.models import Book, Library
+from library_ai.tenants import (
+    LibraryMiddleware, current_library, forget_registry, library_alias, library_database_path, using_library,
+)
+
+from . import isolate_files
+
+
+def create_library(test_case, slug):
+    """Register ``slug`` with its database in the test's directory, dropped again after the test"""
+    call_command('create_library', slug, verbosity=0, stdout=StringIO())
+    alias = library_alias(slug)
+
+    def drop():
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+        forget_registry()
+
+    test_case.addCleanup(drop)
+    return Library.objects.get(slug=slug)
+
+
+def catalog_view(request):
+    """Reports the library the request was routed to and how many books it sees"""
+    return HttpResponse(f'{current_library()}:{Book.objects.count()}')
+
+
+class TenantTestCase(TestCase):
+    def setUp(self):
+        self.directory = isolate_files(self)
+        self.north = create_library(self, 'north')
+        self.south = create_library(self, 'south')
+        with using_library('north'):
+            Book.objects.create(title='Dune', author='Frank Herbert', category='Fiction', demand=50)
+
+
+class DatabaseIsolationTests(TenantTestCase):
+    def test_each_library_has_its_own_database_file(self):
+        self.assertTrue(library_database_path('north').is_relative_to(self.directory))
+        self.assertTrue(library_database_path('north').exists())
+        self.assertTrue(library_database_path('south').exists())
+
+    def test_books_stay_in_their_library(self):
+        with using_library('south'):
+            self.assertEqual(Book.objects.count(), 0)
+        with using_library('north'):
+            self.assertEqual(Book.objects.count(), 1)
+        self.assertEqual(Book.objects.count(), 0)
+
+    def test_registry_and_members_stay_in_the_default_database(self):
+        with using_library('north'):
+            self.assertEqual(router.db_for_read(Library), 'default')
+            self.assertEqual(router.db_for_write(Library.members.through), 'default')
+            self.assertEqual(router.db_for_read(Book), library_alias('north'))
+
+    def test_unknown_library_is_refused(self):
+        with self.assertRaises(LookupError):
+            with using_library('west'):
+                pass
+
+
+class LibraryMiddlewareTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.middleware = LibraryMiddleware(catalog_view)
+        self.factory = RequestFactory()
+        self.member = User.objects.create_user('reader')
+        self.north.members.add(self.member)
+        self.staff = User.objects.create_user('librarian', is_staff=True)
+
+    def request(self, method='get', user=None, **headers):
+        request = getattr(self.factory, method)('/api/get-books/', **headers)
+        request.user = user or AnonymousUser()
+        return self.middleware(request)
+
+    def test_no_library_uses_the_default_database(self):
+        response = self.request()
+
+        self.assertEqual(response.content, b'None:0')
+
+    def test_header_needs_staff_or_membership(self):
+        self.assertEqual(self.request(HTTP_X_LIBRARY='north').status_code, 403)
+        self.assertEqual(self.request(user=self.member, HTTP_X_LIBRARY='south').status_code, 403)
+        self.assertEqual(self.request(user=self.member, HTTP_X_LIBRARY='north').content, b'north:1')
+        self.assertEqual(self.request(user=self.staff, HTTP_X_LIBRARY='south').content, b'south:0')
+
+    def test_unknown_header_is_not_found(self):
+        self.assertEqual(self.request(user=self.staff, HTTP_X_LIBRARY='west').status_code, 404)
+        self.assertEqual(self.request(user=self.staff, HTTP_X_LIBRARY='Not A Slug').status_code, 404)
+
+    def test_host_name_allows_reads_and_limits_changes(self):
+        self.assertEqual(self.request(HTTP_HOST='north.example.org').content, b'north:1')
+        self.assertEqual(self.request('post', HTTP_HOST='north.example.org').status_code, 403)
+        self.assertEqual(self.request('post', user=self.member, HTTP_HOST='north.example.org').status_code, 200)
+        self.assertEqual(self.request('post', user=self.member, HTTP_HOST='south.example.org').status_code, 403)
+
+    def test_unregistered_host_label_uses_the_default_database(self):
+        self.assertEqual(self.request(HTTP_HOST='www.example.org').content, b'None:0')
+
+    def test_async_requests_check_access_too(self):
+        async def async_view(request):
+            return HttpResponse(current_library())
+
+        middleware = LibraryMiddleware(async_view)
+        factory = AsyncRequestFactory()
+
+        anonymous = factory.get('/api/get-books/', headers={'X-Library': 'north'})
+        anonymous.user = AnonymousUser()
+        member = factory.get('/api/get-books/', headers={'X-Library': 'north'})
+        member.user = self.member
+
+        self.assertEqual(async_to_sync(middleware)(anonymous).status_code, 403)
+        self.assertEqual(async_to_sync(middleware)(member).content, b'north')
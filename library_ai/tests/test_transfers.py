@@ -0,0 +1,103 @@
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from library_ai.api_views import MAX_TRANSFERS
+from library_ai.models import Book, BranchStock
+from library_ai.transfers import plan_transfers, solve_transfers, target_allocation, transfer_costs
+
+BRANCHES = ['D1', 'D2', 'S1', 'S2']
+
+# Copies at S1 and S2, borrowed at D1 and D2: serving D1 from S1 first (the
+# cheapest pair) leaves S2 -> D2 at 100, while crossing over costs 2 + 2
+COSTS = {'S1': {'D1': 1, 'D2': 2}, 'S2': {'D1': 2, 'D2': 100}}
+
+
+def plan_cost(costs, moves):
+    _, sources, destinations, copies = moves
+    return float((costs[sources, destinations] * copies).sum())
+
+
+class SolveTransfersTests(TestCase):
+    def test_target_allocation_follows_demand_and_keeps_totals(self):
+        holdings = np.array([[6, 0, 0], [1, 1, 1], [2, 2, 0]])
+        demand = np.array([[1, 1, 1], [0, 0, 9], [0, 0, 0]])
+
+        target = target_allocation(holdings, demand)
+
+        np.testing.assert_array_equal(target, [[2, 2, 2], [0, 0, 3], [2, 2, 0]])
+
+    def test_greedy_and_exact_agree_on_uniform_costs(self):
+        rng = np.random.default_rng(7)
+        holdings = rng.integers(0, 5, size=(50, 4))
+        demand = rng.integers(0, 20, size=(50, 4))
+        costs = np.ones((4, 4)) - np.eye(4)
+
+        greedy, target = solve_transfers(holdings, demand, costs, 'greedy')
+        exact, _ = solve_transfers(holdings, demand, costs, 'exact')
+
+        self.assertEqual(plan_cost(costs, greedy), plan_cost(costs, exact))
+        for titles, sources, destinations, copies in (greedy, exact):
+            moved = holdings.copy()
+            np.subtract.at(moved, (titles, sources), copies)
+            np.add.at(moved, (titles, destinations), copies)
+            np.testing.assert_array_equal(moved, target)
+
+    @override_settings(LIBRARY_AI_BRANCH_TRANSFER_COSTS=COSTS)
+    def test_exact_beats_greedy_on_uneven_costs(self):
+        holdings = np.array([[0, 0, 1, 1]])
+        demand = np.array([[1, 1, 0, 0]])
+        costs = transfer_costs(BRANCHES)
+
+        greedy, _ = solve_transfers(holdings, demand, costs, 'greedy')
+        exact, _ = solve_transfers(holdings, demand, costs, 'exact')
+
+        self.assertEqual(plan_cost(costs, greedy), 101.0)
+        self.assertEqual(plan_cost(costs, exact), 4.0)
+
+
+class PlanTransfersTests(TestCase):
+    def setUp(self):
+        book = Book.objects.create(title='Dune', author='Frank Herbert', category='Fiction', demand=50)
+        BranchStock.objects.bulk_create([
+            BranchStock(book=book, branch='S1', copies=1, borrows=0),
+            BranchStock(book=book, branch='S2', copies=1, borrows=0),
+            BranchStock(book=book, branch='D1', copies=0, borrows=5),
+            BranchStock(book=book, branch='D2', copies=0, borrows=5),
+        ])
+
+    def test_uniform_costs_use_greedy(self):
+        plan = plan_transfers()
+
+        self.assertEqual(plan['method'], 'greedy')
+        self.assertEqual(plan['copies_moved'], 2)
+
+    @override_settings(LIBRARY_AI_BRANCH_TRANSFER_COSTS=COSTS)
+    def test_configured_costs_use_exact(self):
+        plan = plan_transfers()
+
+        self.assertEqual(plan['method'], 'exact')
+        self.assertEqual(plan['total_cost'], 4.0)
+        self.assertEqual(plan_transfers(method='greedy')['total_cost'], 101.0)
+
+    def test_limit_only_shortens_the_listing(self):
+        plan = plan_transfers(limit=1)
+
+        self.assertEqual(len(plan['transfers']), 1)
+        self.assertEqual(plan['copies_moved'], 2)
+
+    def test_negative_limit_is_rejected(self):
+        for limit in ('-1', 'many'):
+            response = self.client.get(reverse('transfer_plan'), {'limit': limit})
+            self.assertEqual(response.status_code, 400)
+        with self.assertRaises(ValueError):
+            plan_transfers(limit=-1)
+
+    def test_large_limit_is_capped(self):
+        with mock.patch('library_ai.api_views.plan_transfers', return_value={}) as plan:
+            response = self.client.get(reverse('transfer_plan'), {'limit': '10000000'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(plan.call_args.kwargs['limit'], MAX_TRANSFERS)
@@ -0,0 +1,344 @@
+"""
+Cross-branch transfer planning
+
+For every title, the copies held across branches are re-allocated in
+proportion to the borrowing demand seen at each branch (largest-remainder
+rounding, so totals are preserved). Branches holding more than their share
+have a surplus, the others a deficit, and surplus copies are routed to
+deficits at minimum transfer cost.
+
+All titles are solved together on dense (titles x branches) NumPy arrays: the
+default solver walks branch pairs from cheapest to most expensive and moves
+``min(surplus, deficit)`` for every title at once, so the Python loop runs over
+branch pairs, never over titles. It is optimal when all transfers cost the
+same (the default). When ``LIBRARY_AI_BRANCH_TRANSFER_COSTS`` makes some
+pairs cheaper than others, plans default to ``method='exact'``, which solves
+the transportation LP with SciPy's HiGHS, and fall back to the greedy pass
+only if SciPy is not installed.
+"""
+import logging
+
+from .metrics import ROWS_PROCESSED, timed
+
+logger = logging.getLogger(__name__)
+
+TRANSFER_METHODS = ('greedy', 'exact')
+
+# Cost of moving one copy between two branches without a configured cost
+DEFAULT_TRANSFER_COST = 1.0
+
+
+def branch_stock_frame(books, book_ids):
+    """
+    Per-branch holdings and borrows for an uploaded catalog
+
+    A borrowing log has one row per loan, so borrows are the rows seen for a
+    title at a branch. Copies come from the ``copies`` column (the largest
+    value seen, since logs repeat it on every loan); without one, each branch
+    that lends a title is assumed to hold one copy.
+
+    Args:
+        books: Standardized upload DataFrame with a ``branch`` column
+        book_ids: Book primary keys aligned with ``books``
+
+    Returns:
+        DataFrame with book_id, branch, copies and borrows columns
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame({
+        'title': books['title'].to_numpy(),
+        'author': books['author'].to_numpy(),
+        'branch': books['branch'].to_numpy(),
+        'book_id': book_ids,
+        'copies': (
+            pd.to_numeric(books['copies'], errors='coerce').fillna(0).clip(lower=0).to_numpy()
+            if 'copies' in books else 1
+        ),
+    })
+    frame = frame.dropna(subset=['branch'])
+    frame['branch'] = frame['branch'].astype(str).str.strip()
+    frame = frame[frame['branch'] != '']
+
+    # Duplicate catalog rows for one title all map onto its first book
+    frame['book_id'] = frame.groupby(['title', 'author'], sort=False)['book_id'].transform('first')
+    stock = frame.groupby(['book_id', 'branch'], sort=False).agg(
+        copies=('copies', 'max'),
+        borrows=('title', 'size'),
+    ).reset_index()
+    stock['copies'] = stock['copies'].astype('int64')
+    return stock
+
+
+def target_allocation(holdings, demand):
+    """
+    Split each title's copies across branches in proportion to demand
+
+    Args:
+        holdings: (titles, branches) integer array of copies held
+        demand: (titles, branches) array of borrowing demand
+
+    Returns:
+        (titles, branches) integer array with the same row totals as
+        ``holdings``; titles without demand keep their current holdings
+    """
+    import numpy as np
+
+    totals = holdings.sum(axis=1)
+    demand_totals = demand.sum(axis=1)
+    has_demand = demand_totals > 0
+    shares = np.divide(demand, demand_totals[:, None], out=np.zeros(demand.shape), where=has_demand[:, None])
+    quotas = shares * totals[:, None]
+    target = np.floor(quotas).astype(np.int64)
+
+    # Hand the copies lost to rounding to the largest fractional remainders
+    shortfall = totals - target.sum(axis=1)
+    order = np.argsort(-(quotas - target), axis=1, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(demand.shape[1])[None, :], axis=1)
+    target += ranks < shortfall[:, None]
+
+    return np.where(has_demand[:, None], target, holdings)
+
+
+def transfer_costs(branches):
+    """
+    (branches x branches) cost matrix from ``LIBRARY_AI_BRANCH_TRANSFER_COSTS``
+
+    The setting maps branch -> {branch: cost}; a pair configured in one
+    direction only is treated as symmetric and unconfigured pairs cost
+    ``DEFAULT_TRANSFER_COST``.
+    """
+    import numpy as np
+    from django.conf import settings
+
+    configured = getattr(settings, 'LIBRARY_AI_BRANCH_TRANSFER_COSTS', {}) or {}
+    costs = np.full((len(branches), len(branches)), DEFAULT_TRANSFER_COST)
+    np.fill_diagonal(costs, 0.0)
+    index = {branch: i for i, branch in enumerate(branches)}
+    for source, destinations in configured.items():
+        for destination, cost in destinations.items():
+            if source in index and destination in index and source != destination:
+                costs[index[source], index[destination]] = cost
+                if destination not in configured or source not in configured[destination]:
+                    costs[index[destination], index[source]] = cost
+    return costs
+
+
+def default_transfer_method(costs):
+    """'exact' for non-uniform transfer costs when SciPy is installed, otherwise 'greedy'"""
+    import numpy as np
+
+    off_diagonal = costs[~np.eye(len(costs), dtype=bool)]
+    if np.unique(off_diagonal).size <= 1:
+        return 'greedy'
+    try:
+        import scipy.optimize  # noqa: F401
+    except ImportError:
+        logger.warning("SciPy is not installed; planning transfers with the greedy solver despite non-uniform costs")
+        return 'greedy'
+    return 'exact'
+
+
+def _solve_greedy(surplus, deficit, costs):
+    import numpy as np
+
+    # Branch-major copies keep each branch's titles contiguous in memory
+    surplus = np.ascontiguousarray(surplus.T)
+    deficit = np.ascontiguousarray(deficit.T)
+    sources, destinations = np.nonzero(~np.eye(len(costs), dtype=bool))
+    order = np.argsort(costs[sources, destinations], kind='stable')
+    # Titles that still have copies to give, per source branch
+    open_titles = [np.flatnonzero(row) for row in surplus]
+    deficit_left = deficit.sum(axis=1)
+
+    moves = []
+    for source, destination in zip(sources[order].tolist(), destinations[order].tolist()):
+        titles = open_titles[source]
+        if not titles.size or not deficit_left[destination]:
+            continue
+        amount = np.minimum(surplus[source, titles], deficit[destination, titles])
+        moving = amount > 0
+        if not moving.any():
+            continue
+        titles, amount = titles[moving], amount[moving]
+        surplus[source, titles] -= amount
+        deficit[destination, titles] -= amount
+        deficit_left[destination] -= int(amount.sum())
+        open_titles[source] = open_titles[source][surplus[source, open_titles[source]] > 0]
+        moves.append((titles, np.full(titles.size, source), np.full(titles.size, destination), amount))
+    return moves
+
+
+def _solve_exact(surplus, deficit, costs):
+    import numpy as np
+    from scipy.optimize import linprog
+    from scipy.sparse import coo_matrix
+
+    # One variable per (title, surplus branch, deficit branch) combination
+    source_titles, sources = np.nonzero(surplus)
+    deficit_titles, destinations = np.nonzero(deficit)
+    if not source_titles.size:
+        return []
+    pairs_per_title = np.bincount(source_titles, minlength=len(surplus)) * np.bincount(deficit_titles, minlength=len(deficit))
+    titles = np.repeat(np.arange(len(surplus)), pairs_per_title)
+
+    source_start = np.searchsorted(source_titles, titles)
+    deficit_start = np.searchsorted(deficit_titles, titles)
+    deficit_count = np.bincount(deficit_titles, minlength=len(deficit))[titles]
+    offset = np.arange(titles.size) - np.repeat(np.cumsum(pairs_per_title) - pairs_per_title, pairs_per_title)
+    source_rows = source_start + offset // deficit_count
+    deficit_rows = deficit_start + offset % deficit_count
+
+    variables = np.arange(titles.size)
+    constraints = coo_matrix(
+        (
+            np.ones(2 * titles.size),
+            (np.concatenate([source_rows, source_titles.size + deficit_rows]), np.concatenate([variables, variables])),
+        ),
+        shape=(source_titles.size + deficit_titles.size, titles.size),
+    ).tocsr()
+    bounds = np.concatenate([surplus[source_titles, sources], deficit[deficit_titles, destinations]])
+
+    result = linprog(
+        costs[sources[source_rows], destinations[deficit_rows]],
+        A_eq=constraints, b_eq=bounds, bounds=(0, None), method='highs',
+    )
+    if not result.success:
+        raise ValueError(f'Transfer LP failed: {result.message}')
+
+    amount = np.rint(result.x).astype(np.int64)
+    keep = amount > 0
+    return [(titles[keep], sources[source_rows][keep], destinations[deficit_rows][keep], amount[keep])]
+
+
+@timed('solve_transfers')
+def solve_transfers(holdings, demand, costs, method='greedy'):
+    """
+    Minimum-cost moves that bring every title to its demand-based allocation
+
+    Args:
+        holdings: (titles, branches) integer array of copies held
+        demand: (titles, branches) array of borrowing demand
+        costs: (branches, branches) transfer cost matrix
+        method: 'greedy' (vectorized least-cost-first) or 'exact' (LP)
+
+    Returns:
+        Tuple of (title, source, destination, copies) integer arrays and the
+        target allocation
+    """
+    import numpy as np
+
+    if method not in TRANSFER_METHODS:
+        raise ValueError(f"Unknown transfer method '{method}'")
+
+    holdings = np.asarray(holdings, dtype=np.int64)
+    target = target_allocation(holdings, np.asarray(demand, dtype=np.float64))
+    surplus = np.maximum(holdings - target, 0)
+    deficit = np.maximum(target - holdings, 0)
+
+    solver = _solve_exact if method == 'exact' else _solve_greedy
+    moves = solver(surplus, deficit, costs)
+    if not moves:
+        empty = np.empty(0, dtype=np.int64)
+        return (empty, empty, empty, empty), target
+    return tuple(np.concatenate(column).astype(np.int64) for column in zip(*moves)), target
+
+
+def plan_transfers(category=None, action=None, method=None, limit=500):
+    """
+    Transfer plan for the current catalog's branch stock
+
+    Args:
+        category: Only plan titles in this category
+        action: Only plan titles with this recommended action (e.g. 'Transfer')
+        method: Solver, see ``solve_transfers``; None picks
+            ``default_transfer_method`` for the configured costs
+        limit: Largest number of transfers to list (all totals cover the full plan)
+
+    Returns:
+        Dictionary with per-branch holdings/demand/target/inbound/outbound,
+        the largest transfers and the plan totals
+    """
+    import numpy as np
+    import pandas as pd
+
+    from .models import Book, BranchStock
+
+    if limit < 0:
+        raise ValueError('limit must not be negative')
+
+    stock = BranchStock.objects.all()
+    if category:
+        stock = stock.filter(book__category=category)
+    if action:
+        stock = stock.filter(book__action=action)
+
+    columns = ['book_id', 'branch', 'copies', 'borrows']
+    frame = pd.DataFrame.from_records(stock.values_list(*columns), columns=columns)
+    ROWS_PROCESSED.inc(len(frame), stage='plan_transfers')
+    if frame.empty:
+        return {'method': method or 'greedy', 'branches': [], 'transfers': [], 'copies_moved': 0, 'total_cost': 0.0}
+
+    title_codes, book_ids = pd.factorize(frame['book_id'])
+    branch_codes, branches = pd.factorize(frame['branch'], sort=True)
+    shape = (len(book_ids), len(branches))
+    holdings = np.zeros(shape, dtype=np.int64)
+    demand = np.zeros(shape)
+    # (book, branch) pairs are unique, so plain fancy assignment fills the matrices
+    holdings[title_codes, branch_codes] = frame['copies'].to_numpy()
+    demand[title_codes, branch_codes] = frame['borrows'].to_numpy()
+
+    branches = branches.tolist()
+    costs = transfer_costs(branches)
+    method = method or default_transfer_method(costs)
+    (titles, sources, destinations, copies), target = solve_transfers(holdings, demand, costs, method)
+    move_costs = costs[sources, destinations] * copies
+
+    outbound = np.bincount(sources, weights=copies, minlength=len(branches))
+    inbound = np.bincount(destinations, weights=copies, minlength=len(branches))
+    branch_summary = [
+        {
+            'branch': branch,
+            'holdings': int(held),
+            'demand': int(borrowed),
+            'target': int(wanted),
+            'inbound': int(received),
+            'outbound': int(sent),
+        }
+        for branch, held, borrowed, wanted, received, sent in zip(
+            branches, holdings.sum(axis=0).tolist(), demand.sum(axis=0).tolist(),
+            target.sum(axis=0).tolist(), inbound.tolist(), outbound.tolist(),
+        )
+    ]
+
+    largest = np.argsort(-copies, kind='stable')[:limit]
+    listed_ids = book_ids.to_numpy()[titles[largest]]
+    books = {
+        book['id']: book
+        for book in Book.objects.filter(id__in=np.unique(listed_ids).tolist()).values('id', 'title', 'author', 'category')
+    }
+    transfers = [
+        {
+            'book_id': int(book_id),
+            'title': books.get(book_id, {}).get('title', ''),
+            'author': books.get(book_id, {}).get('author', ''),
+            'category': books.get(book_id, {}).get('category', ''),
+            'from_branch': branches[source],
+            'to_branch': branches[destination],
+            'copies': int(count),
+            'cost': float(cost),
+        }
+        for book_id, source, destination, count, cost in zip(
+            listed_ids.tolist(), sources[largest].tolist(), destinations[largest].tolist(),
+            copies[largest].tolist(), move_costs[largest].tolist(),
+        )
+    ]
+
+    return {
+        'method': method,
+        'branches': branch_summary,
+        'transfers': transfers,
+        'copies_moved': int(copies.sum()),
+        'total_cost': round(float(move_costs.sum()), 2),
+    }
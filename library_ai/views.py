@@ -1,6 +1,10 @@
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
 from .models import Book, UploadedFile
+from .forecast_index import forecast_categories
+from .profiling import list_profiles, profile_file
 
 
 def dashboard(request):
@@ -23,9 +27,8 @@ def data_management(request):
 
 def demand_forecasting(request):
     """Demand forecasting view with charts"""
-    categories = Book.objects.values_list('category', flat=True).distinct()
     context = {
-        'categories': list(categories),
+        'categories': forecast_categories(),
         'page_title': 'Demand Forecasting'
     }
     return render(request, 'library_ai/demand_forecasting.html', context)
@@ -44,4 +47,24 @@ def real_time_monitoring(request):
     context = {
         'page_title': 'Real-time Monitoring'
     }
-    return render(request, 'library_ai/real_time_monitoring.html', context)
\ No newline at end of file
+    return render(request, 'library_ai/real_time_monitoring.html', context)
+
+
+@staff_member_required
+def profile_list(request):
+    """Admin list of stored request profiles"""
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': list_profiles(),
+    }
+    return render(request, 'admin/library_ai/profiles.html', context)
+
+
+@staff_member_required
+def profile_download(request, profile_id, kind):
+    """Download a stored pstats or collapsed-stack profile"""
+    path = profile_file(profile_id, kind)
+    if path is None:
+        raise Http404('Profile not found')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
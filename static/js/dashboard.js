@@ -79,7 +79,7 @@ async function loadDashboardData() {
 
 function updateKPIs(kpis) {
     animateValue(document.getElementById('kpi-accuracy'), 0, kpis.accuracy, 1500, '%');
-    animateValue(document.getElementById('kpi-turnover'), 0, kpis.turnover, 1500, '%');
+    animateValue(document.getElementById('kpi-move-rate'), 0, kpis.move_rate, 1500, '%');
     animateValue(document.getElementById('kpi-equity'), 0, kpis.equity, 1500, '%');
     animateValue(document.getElementById('kpi-satisfaction'), 0, kpis.satisfaction, 1500, '%');
 }
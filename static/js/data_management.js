@@ -48,7 +48,9 @@ function setupFileUpload() {
 
             if (response.ok) {
                 progressBar.style.width = '100%';
-                uploadStatus.textContent = result.message;
+                uploadStatus.textContent = result.bad_rows
+                    ? `${result.message} (${result.bad_rows} malformed rows skipped)`
+                    : result.message;
                 uploadStatus.className = 'mt-4 text-green-400';
                 
                 // Add clear button if not exists
@@ -1,9 +1,13 @@
 // Inventory Management specific JavaScript
 
 let currentBooks = [];
-let filteredBooks = [];
 let currentPage = 1;
+let totalPages = 0;
 const itemsPerPage = 20;
+// Facets are aggregated over every matching book, so they reload once the filters settle
+const facetReloadDelay = 250;
+let facetTimeout;
+let facetRequest = 0;
 
 document.addEventListener('DOMContentLoaded', function() {
     initializeInventoryManagement();
@@ -41,80 +45,107 @@ function setupSearch() {
     });
 }
 
+function filterParams() {
+    const params = new URLSearchParams();
+    const search = document.getElementById('inventory-search')?.value.trim() || '';
+    const category = document.getElementById('category-filter')?.value || '';
+    const action = document.getElementById('action-filter')?.value || '';
+    
+    if (search) params.set('search', search);
+    if (category) params.set('category', category);
+    if (action) params.set('action', action);
+    return params;
+}
+
 async function loadInventoryData() {
     try {
-        const data = await apiCall('/api/get-books/');
-        currentBooks = data.books || [];
-        
-        updateCategoryFilter();
-        applyFilters();
-        updateActionSummary();
-        updateHighDemandBooks();
-        updateAIRecommendations();
-        
+        // Summaries are aggregated server-side; only the visible page of rows is fetched
+        await Promise.all([loadFacets(), loadPage(1)]);
     } catch (error) {
-        console.error('Error loading inventory data:', error);
-        showNotification('Error loading inventory data', 'error');
-        
-        const tableBody = document.getElementById('inventory-table-body');
-        if (tableBody) {
-            tableBody.innerHTML = `
-                <tr>
-                    <td colspan="6" class="text-center p-4 text-red-400">
-                        Error loading data. Please try again.
-                    </td>
-                </tr>
-            `;
-        }
+        showLoadError(error);
+    }
+}
+
+async function loadFacets() {
+    const request = ++facetRequest;
+    const facets = await apiCall(`/api/inventory-facets/?${filterParams()}`);
+    // A later filter change has already asked for newer facets
+    if (request !== facetRequest) return;
+    
+    updateCategoryFilter(facets.categories || []);
+    updateActionSummary(facets.actions || {});
+    updateHighDemandBooks(facets.high_demand || []);
+    updateAIRecommendations(facets.recommendations || []);
+}
+
+function showLoadError(error) {
+    console.error('Error loading inventory data:', error);
+    showNotification('Error loading inventory data', 'error');
+    
+    const tableBody = document.getElementById('inventory-table-body');
+    if (tableBody) {
+        tableBody.innerHTML = `
+            <tr>
+                <td colspan="6" class="text-center p-4 text-red-400">
+                    Error loading data. Please try again.
+                </td>
+            </tr>
+        `;
     }
 }
 
-function updateCategoryFilter() {
+async function loadPage(page) {
+    const params = filterParams();
+    params.set('page', page);
+    params.set('page_size', itemsPerPage);
+    
+    const data = await apiCall(`/api/get-books/?${params}`);
+    currentBooks = data.books || [];
+    currentPage = data.page || page;
+    totalPages = data.pages || 0;
+    
+    renderInventoryTable();
+    renderPagination();
+}
+
+function updateCategoryFilter(categories) {
     const categoryFilter = document.getElementById('category-filter');
     if (!categoryFilter) return;
     
-    const categories = [...new Set(currentBooks.map(book => book.category))];
     const currentValue = categoryFilter.value;
     
     categoryFilter.innerHTML = '<option value="">All Categories</option>';
-    categories.forEach(category => {
+    categories.forEach(({ category, count }) => {
         const option = document.createElement('option');
         option.value = category;
-        option.textContent = category;
+        option.textContent = `${category} (${count})`;
         categoryFilter.appendChild(option);
     });
     
-    if (currentValue && categories.includes(currentValue)) {
+    if (currentValue) {
+        // Keep the selection even when the other filters leave it empty
+        if (!categories.some(({ category }) => category === currentValue)) {
+            const option = document.createElement('option');
+            option.value = currentValue;
+            option.textContent = `${currentValue} (0)`;
+            categoryFilter.appendChild(option);
+        }
         categoryFilter.value = currentValue;
     }
 }
 
 function applyFilters() {
-    const searchTerm = document.getElementById('inventory-search')?.value.toLowerCase() || '';
-    const categoryFilter = document.getElementById('category-filter')?.value || '';
-    const actionFilter = document.getElementById('action-filter')?.value || '';
-    
-    filteredBooks = currentBooks.filter(book => {
-        const matchesSearch = !searchTerm || 
-            book.title.toLowerCase().includes(searchTerm) ||
-            book.author.toLowerCase().includes(searchTerm);
-        
-        const matchesCategory = !categoryFilter || book.category === categoryFilter;
-        const matchesAction = !actionFilter || book.action === actionFilter;
-        
-        return matchesSearch && matchesCategory && matchesAction;
-    });
-    
-    currentPage = 1;
-    renderInventoryTable();
-    renderPagination();
+    // The matching rows show at once; quick successive changes share one facet reload
+    loadPage(1).catch(showLoadError);
+    clearTimeout(facetTimeout);
+    facetTimeout = setTimeout(() => loadFacets().catch(showLoadError), facetReloadDelay);
 }
 
 function renderInventoryTable() {
     const tableBody = document.getElementById('inventory-table-body');
     if (!tableBody) return;
     
-    if (filteredBooks.length === 0) {
+    if (currentBooks.length === 0) {
         tableBody.innerHTML = `
             <tr>
                 <td colspan="6" class="text-center p-4 text-gray-500">
@@ -125,11 +156,7 @@ function renderInventoryTable() {
         return;
     }
     
-    const startIndex = (currentPage - 1) * itemsPerPage;
-    const endIndex = startIndex + itemsPerPage;
-    const booksToShow = filteredBooks.slice(startIndex, endIndex);
-    
-    const tableHTML = booksToShow.map(book => {
+    const tableHTML = currentBooks.map(book => {
         const tagClass = getActionTagClass(book.action);
         return `
             <tr class="table-row border-b border-transparent hover:bg-gray-700/20">
@@ -168,8 +195,6 @@ function renderPagination() {
     const paginationDiv = document.getElementById('pagination');
     if (!paginationDiv) return;
     
-    const totalPages = Math.ceil(filteredBooks.length / itemsPerPage);
-    
     if (totalPages <= 1) {
         paginationDiv.innerHTML = '';
         return;
@@ -215,32 +240,23 @@ function renderPagination() {
 }
 
 function changePage(page) {
-    currentPage = page;
-    renderInventoryTable();
-    renderPagination();
+    loadPage(page).catch(error => {
+        console.error('Error loading page:', error);
+        showNotification('Error loading inventory data', 'error');
+    });
 }
 
-function updateActionSummary() {
-    const actionCounts = currentBooks.reduce((acc, book) => {
-        acc[book.action] = (acc[book.action] || 0) + 1;
-        return acc;
-    }, {});
-    
+function updateActionSummary(actionCounts) {
     document.getElementById('acquire-count').textContent = actionCounts.Acquire || 0;
     document.getElementById('hold-count').textContent = actionCounts.Hold || 0;
     document.getElementById('transfer-count').textContent = actionCounts.Transfer || 0;
     document.getElementById('deaccession-count').textContent = actionCounts.Deaccession || 0;
 }
 
-function updateHighDemandBooks() {
+function updateHighDemandBooks(highDemandBooks) {
     const highDemandDiv = document.getElementById('high-demand-books');
     if (!highDemandDiv) return;
     
-    const highDemandBooks = currentBooks
-        .filter(book => book.demand >= 90)
-        .sort((a, b) => b.demand - a.demand)
-        .slice(0, 5);
-    
     if (highDemandBooks.length === 0) {
         highDemandDiv.innerHTML = '<p class="text-gray-400">No high demand books found</p>';
         return;
@@ -259,16 +275,14 @@ function updateHighDemandBooks() {
     highDemandDiv.innerHTML = booksHTML;
 }
 
-function updateAIRecommendations() {
+function updateAIRecommendations(recommendations) {
     const recommendationsDiv = document.getElementById('ai-recommendations');
     if (!recommendationsDiv) return;
     
-    const recommendations = [
-        'Focus on acquiring Science Fiction titles - showing 15% increase in demand',
-        'Consider transferring low-demand Classic literature to other branches',
-        'Romance category shows seasonal peak - increase inventory by 20%',
-        'Children\'s books have consistent demand - maintain current levels'
-    ];
+    if (recommendations.length === 0) {
+        recommendationsDiv.innerHTML = '<p class="text-gray-400">No recommendations for the current filters</p>';
+        return;
+    }
     
     const recommendationsHTML = recommendations.map(rec => `
         <div class="py-2 border-b border-gray-700/50">
@@ -300,7 +314,6 @@ window.updateBookAction = function(bookId) {
         // In a real application, you would make an API call to update the book
         book.action = newAction;
         renderInventoryTable();
-        updateActionSummary();
         showNotification(`Updated action for "${book.title}" to ${newAction}`, 'success');
     }
 };
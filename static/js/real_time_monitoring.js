@@ -4,6 +4,13 @@ let activityChart;
 let activityFeedInterval;
 let metricsInterval;
 
+// Seconds between polls of /api/activity-snapshot/
+const SNAPSHOT_POLL_SECONDS = 15;
+
+// Newest event already shown in the activity feed
+let lastFeedTimestamp = 0;
+let lastMetrics = { activeUsers: 0, booksBorrowed: 0, avgDuration: 0, alerts: 0 };
+
 document.addEventListener('DOMContentLoaded', function() {
     initializeRealTimeMonitoring();
     startRealTimeUpdates();
@@ -19,27 +26,20 @@ function setupActivityChart() {
     const ctx = document.getElementById('activityChart');
     if (!ctx) return;
 
-    const hours = [];
-    const now = new Date();
-    for (let i = 23; i >= 0; i--) {
-        const hour = new Date(now.getTime() - i * 60 * 60 * 1000);
-        hours.push(hour.getHours() + ':00');
-    }
-
     activityChart = new Chart(ctx.getContext('2d'), {
         type: 'line',
         data: {
-            labels: hours,
+            labels: [],
             datasets: [{
                 label: 'Active Users',
-                data: generateRandomData(24, 10, 50),
+                data: [],
                 borderColor: 'rgb(34, 211, 238)',
                 backgroundColor: 'rgba(34, 211, 238, 0.1)',
                 tension: 0.4,
                 fill: true
             }, {
                 label: 'Books Borrowed',
-                data: generateRandomData(24, 5, 25),
+                data: [],
                 borderColor: 'rgb(16, 185, 129)',
                 backgroundColor: 'rgba(16, 185, 129, 0.1)',
                 tension: 0.4,
@@ -69,42 +69,30 @@ function setupActivityChart() {
     });
 }
 
-function generateRandomData(count, min, max) {
-    return Array.from({ length: count }, () => 
-        Math.floor(Math.random() * (max - min + 1)) + min
-    );
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
 }
 
 function loadInitialData() {
-    // Initialize with some sample data
-    updateMetrics({
-        activeUsers: 42,
-        booksBorrowed: 18,
-        avgDuration: 35,
-        alerts: 2
-    });
-    
-    loadPopularBooks();
+    refreshSnapshot();
     addActivityFeedItem('System initialized and monitoring started', 'info');
 }
 
 function startRealTimeUpdates() {
-    // Listen for data update events instead of automatic intervals
+    // Poll the live activity metrics and refresh on data update events
+    metricsInterval = setInterval(refreshSnapshot, SNAPSHOT_POLL_SECONDS * 1000);
     window.addEventListener('dataUpdated', handleDataUpdate);
 
-    // Add activity feed item for system initialization
-    addActivityFeedItem('Real-time monitoring initialized - waiting for data updates', 'info');
+    addActivityFeedItem('Real-time monitoring initialized - polling live activity', 'info');
 }
 
 function handleDataUpdate(event) {
     const detail = event.detail;
     console.log('Data updated:', detail);
 
-    // Update all monitoring components
-    updateRealTimeMetrics();
-    addRandomActivityFeedItem();
-    updateActivityChart();
-    loadPopularBooks();
+    refreshSnapshot();
 
     // Add activity feed item for data update
     addActivityFeedItem(`Data updated from ${detail.source} - ${detail.recordsCount} records processed`, 'success');
@@ -113,63 +101,76 @@ function handleDataUpdate(event) {
 function setupManualRefresh() {
     const refreshBtn = document.getElementById('manual-refresh-btn');
     if (refreshBtn) {
-        refreshBtn.addEventListener('click', () => {
+        refreshBtn.addEventListener('click', async () => {
             // Add loading state to button
             refreshBtn.innerHTML = '<i class="fas fa-spinner fa-spin mr-2"></i>Refreshing...';
             refreshBtn.disabled = true;
 
-            // Update all monitoring components
-            updateRealTimeMetrics();
-            addRandomActivityFeedItem();
-            updateActivityChart();
-            loadPopularBooks();
-
-            // Add activity feed item for manual refresh
+            await refreshSnapshot();
             addActivityFeedItem('Manual data refresh completed', 'info');
 
-            // Reset button after 2 seconds
-            setTimeout(() => {
-                refreshBtn.innerHTML = '<i class="fas fa-sync-alt mr-2"></i>Refresh Data';
-                refreshBtn.disabled = false;
-            }, 2000);
+            refreshBtn.innerHTML = '<i class="fas fa-sync-alt mr-2"></i>Refresh Data';
+            refreshBtn.disabled = false;
         });
     }
 }
 
-function updateRealTimeMetrics() {
-    // Simulate real-time metrics updates
-    const metrics = {
-        activeUsers: Math.floor(Math.random() * 20) + 30,
-        booksBorrowed: Math.floor(Math.random() * 10) + 15,
-        avgDuration: Math.floor(Math.random() * 20) + 25,
-        alerts: Math.floor(Math.random() * 3)
-    };
-    
-    updateMetrics(metrics);
+async function refreshSnapshot() {
+    try {
+        const snapshot = await apiCall('/api/activity-snapshot/');
+
+        updateMetrics({
+            activeUsers: snapshot.last_hour.active_users,
+            booksBorrowed: snapshot.last_day.borrows,
+            avgDuration: snapshot.last_hour.avg_duration,
+            alerts: snapshot.alerts.length
+        });
+        updateActivityFeed(snapshot.recent);
+        updateActivityChart(snapshot.per_hour);
+        updateAlerts(snapshot.alerts);
+
+        if (snapshot.hot_titles.length > 0) {
+            renderPopularBooks(snapshot.hot_titles.slice(0, 5).map(book => ({
+                title: book.title,
+                subtitle: `${book.borrows} borrows in the last hour`
+            })));
+        } else {
+            // No live borrows yet: fall back to the highest predicted demand
+            loadPopularBooks();
+        }
+    } catch (error) {
+        console.error('Error loading activity snapshot:', error);
+    }
 }
 
 function updateMetrics(metrics) {
-    animateValue(document.getElementById('active-users'), 0, metrics.activeUsers, 1000);
-    animateValue(document.getElementById('books-borrowed'), 0, metrics.booksBorrowed, 1000);
-    animateValue(document.getElementById('avg-duration'), 0, metrics.avgDuration, 1000, 'm');
-    animateValue(document.getElementById('alerts-count'), 0, metrics.alerts, 1000);
+    animateValue(document.getElementById('active-users'), lastMetrics.activeUsers, metrics.activeUsers, 1000);
+    animateValue(document.getElementById('books-borrowed'), lastMetrics.booksBorrowed, metrics.booksBorrowed, 1000);
+    animateValue(document.getElementById('avg-duration'), lastMetrics.avgDuration, metrics.avgDuration, 1000, 'm');
+    animateValue(document.getElementById('alerts-count'), lastMetrics.alerts, metrics.alerts, 1000);
+    lastMetrics = metrics;
 }
 
-function addRandomActivityFeedItem() {
-    const activities = [
-        { message: 'New user registered', type: 'success' },
-        { message: 'Book "The Great Gatsby" borrowed', type: 'info' },
-        { message: 'High demand detected for Science Fiction', type: 'warning' },
-        { message: 'System backup completed', type: 'success' },
-        { message: 'New book added to inventory', type: 'info' },
-        { message: 'User session expired', type: 'warning' }
-    ];
-    
-    const activity = activities[Math.floor(Math.random() * activities.length)];
-    addActivityFeedItem(activity.message, activity.type);
+function updateActivityFeed(recent) {
+    // Events arrive newest first; add the unseen ones oldest first
+    recent
+        .filter(event => event.timestamp > lastFeedTimestamp)
+        .reverse()
+        .forEach(event => {
+            const verb = event.type === 'borrow' ? 'borrowed' : 'returned';
+            const category = event.category ? ` (${event.category})` : '';
+            addActivityFeedItem(
+                `Book "${escapeHtml(event.title || 'Untitled')}"${escapeHtml(category)} ${verb}`,
+                event.type === 'borrow' ? 'info' : 'success',
+                new Date(event.timestamp * 1000)
+            );
+        });
+    if (recent.length > 0) {
+        lastFeedTimestamp = Math.max(lastFeedTimestamp, recent[0].timestamp);
+    }
 }
 
-function addActivityFeedItem(message, type = 'info') {
+function addActivityFeedItem(message, type = 'info', time = null) {
     const activityFeed = document.getElementById('activity-feed');
     if (!activityFeed) return;
     
@@ -186,7 +187,7 @@ function addActivityFeedItem(message, type = 'info') {
         <i class="${iconClass} mr-3"></i>
         <div class="flex-1">
             <p class="text-sm">${message}</p>
-            <p class="text-xs text-gray-400">Just now</p>
+            <p class="text-xs text-gray-400">${time ? time.toLocaleTimeString() : 'Just now'}</p>
         </div>
     `;
     
@@ -199,59 +200,63 @@ function addActivityFeedItem(message, type = 'info') {
     }
 }
 
-function updateActivityChart() {
+function updateActivityChart(perHour) {
     if (!activityChart) return;
-    
-    // Shift data and add new point
-    const activeUsersData = activityChart.data.datasets[0].data;
-    const booksBorrowedData = activityChart.data.datasets[1].data;
-    
-    activeUsersData.shift();
-    activeUsersData.push(Math.floor(Math.random() * 40) + 10);
-    
-    booksBorrowedData.shift();
-    booksBorrowedData.push(Math.floor(Math.random() * 20) + 5);
-    
-    // Update time labels
-    const now = new Date();
-    const labels = activityChart.data.labels;
-    labels.shift();
-    labels.push(now.getHours() + ':' + String(now.getMinutes()).padStart(2, '0'));
-    
+
+    activityChart.data.labels = perHour.map(slot => new Date(slot.start * 1000).getHours() + ':00');
+    activityChart.data.datasets[0].data = perHour.map(slot => slot.active_users);
+    activityChart.data.datasets[1].data = perHour.map(slot => slot.borrows);
     activityChart.update();
 }
 
+function updateAlerts(alerts) {
+    const alertsDiv = document.getElementById('recent-alerts');
+    if (!alertsDiv) return;
+
+    if (alerts.length === 0) {
+        alertsDiv.innerHTML = '<p class="text-gray-400">No recent alerts</p>';
+        return;
+    }
+
+    alertsDiv.innerHTML = alerts.map(alert => `
+        <div class="flex items-center p-2 bg-yellow-500/10 rounded-lg">
+            <i class="fas fa-exclamation-triangle text-yellow-400 mr-3"></i>
+            <p class="text-sm">High demand for ${escapeHtml(alert.category)}: ${alert.last_hour} borrows in the last hour
+                (${alert.hourly_average}/hour today)</p>
+        </div>
+    `).join('');
+}
+
+function renderPopularBooks(books) {
+    const popularBooksDiv = document.getElementById('popular-books');
+    if (!popularBooksDiv) return;
+
+    if (books.length === 0) {
+        popularBooksDiv.innerHTML = '<p class="text-gray-400">No books data available</p>';
+        return;
+    }
+
+    popularBooksDiv.innerHTML = books.map((book, index) => `
+        <div class="flex justify-between items-center py-2 border-b border-gray-700/50">
+            <div class="flex-1">
+                <p class="text-sm font-medium">${escapeHtml(book.title.substring(0, 25))}${book.title.length > 25 ? '...' : ''}</p>
+            </div>
+            <div class="text-right">
+                <span class="text-xs text-cyan-300">#${index + 1}</span>
+                <p class="text-xs text-gray-400">${escapeHtml(book.subtitle)}</p>
+            </div>
+        </div>
+    `).join('');
+}
+
 async function loadPopularBooks() {
     try {
-        const data = await apiCall('/api/get-books/?limit=5');
-        const books = data.books || [];
-        
-        const popularBooksDiv = document.getElementById('popular-books');
-        if (!popularBooksDiv) return;
-        
-        if (books.length === 0) {
-            popularBooksDiv.innerHTML = '<p class="text-gray-400">No books data available</p>';
-            return;
-        }
-        
-        const booksHTML = books
-            .sort((a, b) => b.demand - a.demand)
-            .slice(0, 5)
-            .map((book, index) => `
-                <div class="flex justify-between items-center py-2 border-b border-gray-700/50">
-                    <div class="flex-1">
-                        <p class="text-sm font-medium">${book.title.substring(0, 25)}${book.title.length > 25 ? '...' : ''}</p>
-                        <p class="text-xs text-gray-400">${book.author}</p>
-                    </div>
-                    <div class="text-right">
-                        <span class="text-xs text-cyan-300">#${index + 1}</span>
-                        <p class="text-xs text-gray-400">${book.demand}% demand</p>
-                    </div>
-                </div>
-            `).join('');
-        
-        popularBooksDiv.innerHTML = booksHTML;
-        
+        // get-books is ordered by demand, so the first page is the top five
+        const data = await apiCall('/api/get-books/?page_size=5');
+        renderPopularBooks((data.books || []).map(book => ({
+            title: book.title,
+            subtitle: `${book.author} - ${book.demand}% demand`
+        })));
     } catch (error) {
         console.error('Error loading popular books:', error);
         const popularBooksDiv = document.getElementById('popular-books');
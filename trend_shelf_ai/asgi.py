@@ -0,0 +1,15 @@
+"""
+ASGI config for trend_shelf_ai project.
+
+Serve with an ASGI server, e.g. ``uvicorn trend_shelf_ai.asgi:application``.
+Read endpoints run on the event loop; uploads and inference run in the
+bounded executor from ``library_ai.concurrency``.
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'trend_shelf_ai.settings')
+
+application = get_asgi_application()
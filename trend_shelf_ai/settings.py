@@ -34,6 +34,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # After authentication: selecting a library checks the user's access
+    'library_ai.tenants.LibraryMiddleware',
+    'library_ai.profiling.RequestProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -57,6 +60,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'trend_shelf_ai.wsgi.application'
+ASGI_APPLICATION = 'trend_shelf_ai.asgi.application'
 
 # Database
 DATABASES = {
@@ -66,6 +70,15 @@ DATABASES = {
     }
 }
 
+# Each library registered with `manage.py create_library` keeps its catalog in
+# its own SQLite file in LIBRARY_AI_LIBRARIES_DIR; requests pick the library
+# with the X-Library header (staff and the library's members only) or a
+# <library>.<domain> host name. Users, sessions, the library registry and its
+# members stay in the default database, which also holds the catalog of
+# requests that name no library.
+DATABASE_ROUTERS = ['library_ai.tenants.LibraryRouter']
+LIBRARY_AI_LIBRARIES_DIR = os.environ.get('LIBRARY_AI_LIBRARIES_DIR', BASE_DIR / 'var' / 'libraries')
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -113,4 +126,78 @@ REST_FRAMEWORK = {
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
-DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
\ No newline at end of file
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Metrics: by default /metrics reports the samples of the process serving it.
+# With several worker processes, set PROMETHEUS_MULTIPROC_DIR to a directory
+# shared by the workers: each worker snapshots its samples there, /metrics
+# merges them, and new workers fold the snapshots of exited ones into one file.
+LIBRARY_AI_METRICS_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR') or None
+
+# Request profiling (staff only, X-Profile-Request: 1 or ?profile=1)
+LIBRARY_AI_PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+
+# Shared model server (manage.py run_model_server). When set, workers score
+# through this Unix socket instead of loading their own copies of the models,
+# falling back to in-process models if the server is not running.
+LIBRARY_AI_MODEL_SERVER_SOCKET = os.environ.get('LIBRARY_AI_MODEL_SERVER_SOCKET', '')
+
+# Micro-batching: small concurrent scoring requests are coalesced and flushed
+# once LIBRARY_AI_BATCH_MAX_SIZE texts are queued or the oldest request has
+# waited LIBRARY_AI_BATCH_MAX_WAIT_MS. Off by default, since without concurrent
+# predictions every request would wait out the window alone; set
+# LIBRARY_AI_MICRO_BATCHING=1 for concurrent traffic. The model server, which
+# serves every worker, always coalesces with the same limits.
+LIBRARY_AI_MICRO_BATCHING = os.environ.get('LIBRARY_AI_MICRO_BATCHING', '0') == '1'
+LIBRARY_AI_BATCH_MAX_SIZE = int(os.environ.get('LIBRARY_AI_BATCH_MAX_SIZE', 64))
+LIBRARY_AI_BATCH_MAX_WAIT_MS = float(os.environ.get('LIBRARY_AI_BATCH_MAX_WAIT_MS', 5))
+
+# Threads per process that run uploads, reprocessing and inference off the
+# ASGI event loop; further heavy requests queue while reads keep being served.
+# Keep it at least the sum of the admission concurrencies below, counting
+# `per_library` classes once per library expected to ingest at the same time.
+LIBRARY_AI_HEAVY_WORKERS = int(os.environ.get('LIBRARY_AI_HEAVY_WORKERS', 6))
+
+# Admission control per endpoint class: at most `concurrency` requests run
+# inference at once and `queue` more wait, smallest first; the rest get 429.
+# predict: /api/predict-demand/; bulk: /api/upload-file/ and /api/process-data/
+# `per_library` classes are limited per library rather than per process.
+LIBRARY_AI_ADMISSION = {
+    'predict': {'concurrency': 4, 'queue': 16},
+    'bulk': {'concurrency': 1, 'queue': 4, 'per_library': True},
+}
+
+# CPU budget for torch inference: the node's cores are split between the
+# LIBRARY_AI_CPU_WORKERS processes that load models (WSGI/ASGI workers, or
+# 1 with the model server). LIBRARY_AI_TORCH_THREADS=0 gives each cores/workers
+# intra-op threads. With LIBRARY_AI_CPU_PINNING=1 each process is also pinned to
+# its own slice of cores (see `manage.py cpu_budget`).
+LIBRARY_AI_CPU_WORKERS = int(os.environ.get('LIBRARY_AI_CPU_WORKERS', os.environ.get('WEB_CONCURRENCY', 1)))
+LIBRARY_AI_TORCH_THREADS = int(os.environ.get('LIBRARY_AI_TORCH_THREADS', 0))
+LIBRARY_AI_TORCH_INTEROP_THREADS = int(os.environ.get('LIBRARY_AI_TORCH_INTEROP_THREADS', 1))
+LIBRARY_AI_CPU_PINNING = os.environ.get('LIBRARY_AI_CPU_PINNING', '0') == '1'
+LIBRARY_AI_CPU_SLOTS_DIR = os.environ.get('LIBRARY_AI_CPU_SLOTS_DIR', BASE_DIR / 'var' / 'cpu-slots')
+
+# Transfer planning: cost of moving one copy between branches, as
+# {'Downtown': {'Suburbs': 2.5, ...}, ...}. Pairs configured in one direction
+# are treated as symmetric; unconfigured pairs cost 1.
+LIBRARY_AI_BRANCH_TRANSFER_COSTS = {}
+
+# Book-text embeddings: computed alongside sentiment scores during uploads and
+# reprocessing, stored as a memory-mapped float16 matrix in this directory and
+# searched by /api/similar-books/. Set LIBRARY_AI_EMBEDDINGS=0 to skip them.
+LIBRARY_AI_EMBEDDINGS = os.environ.get('LIBRARY_AI_EMBEDDINGS', '1') == '1'
+LIBRARY_AI_EMBEDDINGS_DIR = os.environ.get('LIBRARY_AI_EMBEDDINGS_DIR', BASE_DIR / 'var' / 'embeddings')
+
+# Admin changelists: counts up to LIBRARY_AI_ADMIN_COUNT_LIMIT rows are exact,
+# larger unfiltered tables show an estimate from the primary key range and
+# larger filtered results stop paging at the limit. Filter choices are cached
+# for LIBRARY_AI_ADMIN_FILTER_CACHE_SECONDS. The "Rescore" action scores up to
+# LIBRARY_AI_ADMIN_RESCORE_SYNC_LIMIT books within the request and larger
+# selections in the background, under the library's bulk admission slot; it
+# refuses selections above LIBRARY_AI_ADMIN_RESCORE_LIMIT (use
+# `manage.py score_catalog`).
+LIBRARY_AI_ADMIN_COUNT_LIMIT = int(os.environ.get('LIBRARY_AI_ADMIN_COUNT_LIMIT', 100_000))
+LIBRARY_AI_ADMIN_FILTER_CACHE_SECONDS = int(os.environ.get('LIBRARY_AI_ADMIN_FILTER_CACHE_SECONDS', 300))
+LIBRARY_AI_ADMIN_RESCORE_SYNC_LIMIT = int(os.environ.get('LIBRARY_AI_ADMIN_RESCORE_SYNC_LIMIT', 200))
+LIBRARY_AI_ADMIN_RESCORE_LIMIT = int(os.environ.get('LIBRARY_AI_ADMIN_RESCORE_LIMIT', 50_000))
@@ -5,11 +5,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from library_ai import api_views, views as library_views
 
 urlpatterns = [
+    path('admin/profiles/', library_views.profile_list, name='profile_list'),
+    path('admin/profiles/<str:profile_id>.<str:kind>', library_views.profile_download, name='profile_download'),
     path('admin/', admin.site.urls),
     path('', include('library_ai.urls')),
     path('api/', include('library_ai.api_urls')),
+    path('metrics', api_views.metrics, name='metrics'),
 ]
 
 if settings.DEBUG: